@@ -115,6 +115,29 @@ def test_cant_create_paciente_with_existing_dni():
     print(response_create_duplicate.text)  # para ver más info en caso de error
     assert response_create_duplicate.status_code == 400
 
+def test_can_importar_pacientes():
+    """Importacion CSV: las filas validas se crean y las invalidas se informan sin cortar el resto."""
+    archivo = (
+        "dni,nombre,apellido,genero,email\n"
+        "55001001,Lucia,Sosa,mujer,lucia.sosa@example.com\n"
+        "55001002,Pedro,Ruiz,hombre,pedro.ruiz@example.com\n"
+        "55001002,Pedro,Repetido,hombre,\n"
+        "55001003,Sin,Genero,,\n"
+    )
+    response = requests.post(ENDPOINT_PACIENTES + "/pacientes/importar", data=archivo.encode(), headers={**HEADERS_SECRETARIA, "Content-Type": "text/csv"})
+    print(response.text)  # para ver más info en caso de error
+    assert response.status_code == 200
+    data = response.json()
+    assert data['total'] == 4
+    assert data['creados'] == 2
+    assert [f['id_usuario'] is not None for f in data['filas']] == [True, True, False, False]
+
+    response_get_paciente = get_paciente(data['filas'][0]['id_usuario'])
+    assert response_get_paciente.status_code == 200
+    assert response_get_paciente.json()['dni'] == "55001001"
+
+    refresh_users()
+
 
 def test_can_get_paciente():
     id_usuario = 8  # Asegurarse de que este ID exista en la base de datos de prueba
@@ -132,6 +155,25 @@ def test_cant_get_nonexistent_paciente():
     print(response.text)  # para ver más info en caso de error
     assert response.status_code == 404
 
+def test_can_lookup_pacientes():
+    """POST /pacientes/lookup respeta el orden pedido e informa los ids que no son pacientes."""
+    response = requests.post(ENDPOINT_PACIENTES + "/pacientes/lookup", json={"ids_usuario": [9, -99, 8]}, headers=HEADERS_SECRETARIA)
+    print(response.text)  # para ver más info en caso de error
+    assert response.status_code == 200
+    data = response.json()
+    assert [p['id_usuario'] for p in data['pacientes']] == [9, 8]
+    assert data['faltantes'] == [-99]
+    assert 'email' in data['pacientes'][0]
+
+def test_can_get_pacientes_por_ids():
+    """GET /pacientes?ids=... devuelve lo mismo que el lookup, en el orden pedido."""
+    response = requests.get(ENDPOINT_PACIENTES + "/pacientes", params={"ids": "8,-99,9"}, headers=HEADERS_SECRETARIA)
+    print(response.text)  # para ver más info en caso de error
+    assert response.status_code == 200
+    data = response.json()
+    assert [p['id_usuario'] for p in data['pacientes']] == [8, 9]
+    assert data['faltantes'] == [-99]
+
 def test_can_update_paciente():
     payload = {
         "dni": "95432321",
@@ -207,6 +249,23 @@ def test_can_list_pacientes(): #se podria mejorar testeando los parametros de bu
     assert len(pacientes) > n
     print (data)
 
+def test_can_list_pacientes_con_modos_de_conteo():
+    """El total exacto coincide entre paginas; con conteo=hay_mas no se devuelve total."""
+    exacto = requests.get(ENDPOINT_PACIENTES + "/pacientes", params={"limit": 2, "conteo": "exacto"}, headers=HEADERS_SECRETARIA)
+    assert exacto.status_code == 200
+    total = exacto.json()['total']
+    assert exacto.json()['hay_mas'] == (total > 2)
+
+    sin_total = requests.get(ENDPOINT_PACIENTES + "/pacientes", params={"limit": 2, "conteo": "hay_mas"}, headers=HEADERS_SECRETARIA)
+    print(sin_total.text)
+    assert sin_total.status_code == 200
+    assert sin_total.json()['total'] is None
+    assert sin_total.json()['hay_mas'] == (total > 2)
+
+    estimado = requests.get(ENDPOINT_PACIENTES + "/pacientes", params={"limit": 2, "conteo": "estimado"}, headers=HEADERS_SECRETARIA)
+    assert estimado.status_code == 200
+    assert isinstance(estimado.json()['total'], int)
+
 def test_can_delete_paciente():
     payload =  {
         "dni": "99887766",
@@ -236,6 +295,29 @@ def test_can_delete_paciente():
     data_after_delete = get_response_after_delete.json()
     assert data_after_delete['baja']['motivo'] == delete_payload['motivo']
 
+def test_can_buscar_pacientes_activos():
+    """El filtro activo usa la baja de la copia local de usuarios, que se actualiza al dar de baja."""
+    payload =  {
+        "dni": "66554433",
+        "nombre": "Marta",
+        "apellido": "Quiroga",
+        "genero": "mujer",
+        "email": "marta.quiroga@example.com"
+    }
+    id_usuario_paciente = create_paciente(payload).json()['id_usuario']
+    params = {"nom_ap_dni": payload['dni']}
+
+    response = requests.get(ENDPOINT_PACIENTES + "/pacientes", params={**params, "activo": True}, headers=HEADERS_SECRETARIA)
+    assert [p['id_usuario'] for p in response.json()['pacientes']] == [id_usuario_paciente]
+
+    assert delete_paciente(id_usuario_paciente, {"motivo": "egreso"}).status_code == 200
+    response = requests.get(ENDPOINT_PACIENTES + "/pacientes", params={**params, "activo": True}, headers=HEADERS_SECRETARIA)
+    assert response.json()['pacientes'] == []
+    response = requests.get(ENDPOINT_PACIENTES + "/pacientes", params={**params, "activo": False}, headers=HEADERS_SECRETARIA)
+    assert [p['id_usuario'] for p in response.json()['pacientes']] == [id_usuario_paciente]
+
+    refresh_users()
+
 def test_cant_delete_nonexistent_paciente():
     """Intentar eliminar un paciente inexistente debe devolver 404."""
     id_usuario = -99  # ID que no existe
@@ -401,6 +483,126 @@ def test_can_list_evoluciones():
     data = response.json()
     assert isinstance(data, list)
 
+def test_can_list_evoluciones_con_cursor():
+    """Recorrer las evoluciones con X-Next-Cursor devuelve lo mismo que pedirlas todas juntas."""
+    id_usuario = 9
+    todas = requests.get(ENDPOINT_PACIENTES + f"/pacientes/{id_usuario}/evoluciones", params={"limit": 100}, headers=HEADERS_PSIQUIATRA)
+    assert todas.status_code == 200
+    ids_esperados = [e['id_evolucion'] for e in todas.json()]
+
+    ids = []
+    params = {"limit": 1}
+    while True:
+        resp = requests.get(ENDPOINT_PACIENTES + f"/pacientes/{id_usuario}/evoluciones", params=params, headers=HEADERS_PSIQUIATRA)
+        print(resp.text)
+        assert resp.status_code == 200
+        ids += [e['id_evolucion'] for e in resp.json()]
+        cursor = resp.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+        params = {"limit": 1, "cursor": cursor}
+    assert ids == ids_esperados
+
+def test_can_list_evoluciones_con_etag():
+    """Con el ETag de la respuesta anterior, la misma pagina responde 304 sin cuerpo."""
+    id_usuario = 9
+    resp = requests.get(ENDPOINT_PACIENTES + f"/pacientes/{id_usuario}/evoluciones", headers=HEADERS_PSIQUIATRA)
+    assert resp.status_code == 200
+    etag = resp.headers.get('ETag')
+    assert etag
+
+    resp_304 = requests.get(ENDPOINT_PACIENTES + f"/pacientes/{id_usuario}/evoluciones", headers={**HEADERS_PSIQUIATRA, "If-None-Match": etag})
+    assert resp_304.status_code == 304
+    assert resp_304.content == b''
+
+    resp_sots = requests.get(ENDPOINT_PACIENTES + f"/pacientes/{id_usuario}/sots", headers={**HEADERS_PSIQUIATRA, "If-None-Match": etag})
+    assert resp_sots.status_code == 200
+
+def test_can_export_historia():
+    """La exportacion NDJSON trae el paciente, todas sus evoluciones y cierra con una linea 'fin'."""
+    import json
+    id_usuario = 9
+    todas = requests.get(ENDPOINT_PACIENTES + f"/pacientes/{id_usuario}/evoluciones", params={"limit": 100}, headers=HEADERS_PSIQUIATRA)
+    assert todas.status_code == 200
+
+    resp = requests.get(ENDPOINT_PACIENTES + f"/pacientes/{id_usuario}/historia/export", headers=HEADERS_PSIQUIATRA, stream=True)
+    assert resp.status_code == 200
+    assert resp.headers['content-type'].startswith('application/x-ndjson')
+    lineas = [json.loads(l) for l in resp.iter_lines() if l]
+    assert lineas[0]['tipo_registro'] == 'paciente'
+    assert lineas[-1]['tipo_registro'] == 'fin'
+    evoluciones = [l for l in lineas if l['tipo_registro'] == 'evolucion']
+    assert {e['id_evolucion'] for e in evoluciones} == {e['id_evolucion'] for e in todas.json()}
+    assert lineas[-1]['evoluciones'] == len(evoluciones)
+
+def test_cant_export_historia_wrong_patient():
+    resp = requests.get(ENDPOINT_PACIENTES + "/pacientes/-99/historia/export", headers=HEADERS_PSIQUIATRA)
+    assert resp.status_code == 404
+
+def test_can_buscar_evoluciones_por_texto():
+    """q filtra por texto completo: una evolucion recien cargada aparece buscando una forma de sus palabras."""
+    id_usuario = 9
+    payload = {"observacion": "El paciente relata pesadillas recurrentes desde la mudanza"}
+    resp = requests.post(ENDPOINT_PACIENTES + f"/pacientes/{id_usuario}/evoluciones", json=payload, headers=HEADERS_PSIQUIATRA)
+    assert resp.status_code == 201
+    id_evolucion = resp.json()['id_evolucion']
+
+    resp = requests.get(ENDPOINT_PACIENTES + f"/pacientes/{id_usuario}/evoluciones", params={"q": "pesadilla mudanza"}, headers=HEADERS_PSIQUIATRA)
+    print(resp.text)
+    assert resp.status_code == 200
+    assert id_evolucion in [e['id_evolucion'] for e in resp.json()]
+
+    resp = requests.get(ENDPOINT_PACIENTES + "/evoluciones/buscar", params={"q": "pesadilla mudanza"}, headers=HEADERS_PSIQUIATRA)
+    print(resp.text)
+    assert resp.status_code == 200
+    assert id_evolucion in [e['id_evolucion'] for e in resp.json()['evoluciones']]
+
+def test_cant_get_actividad_evoluciones_sin_rol():
+    """El tablero de actividad es solo para Director y Coordinador."""
+    resp = requests.get(ENDPOINT_PACIENTES + "/actividad/evoluciones", headers=HEADERS_PSIQUIATRA)
+    print(resp.text)
+    assert resp.status_code == 403
+
+def test_resumen_paciente_cuenta_evoluciones():
+    """El resumen clinico de GET /pacientes/{id} se actualiza con cada evolucion nueva."""
+    id_usuario = 9
+    antes = get_paciente(id_usuario).json().get('resumen') or {'cantidad_evoluciones': 0}
+    resp = requests.post(ENDPOINT_PACIENTES + f"/pacientes/{id_usuario}/evoluciones", json={"observacion": "Control de resumen"}, headers=HEADERS_PSIQUIATRA)
+    assert resp.status_code == 201
+    response = get_paciente(id_usuario)
+    print(response.text)
+    assert response.status_code == 200
+    resumen = response.json()['resumen']
+    assert resumen['cantidad_evoluciones'] == antes['cantidad_evoluciones'] + 1
+    assert resumen['fecha_ultima_evolucion'] is not None
+
+def test_can_get_trayectoria_diagnostico():
+    """La trayectoria termina con las dos evoluciones cargadas aca, y la segunda marca los ejes que cambiaron."""
+    id_usuario = 9
+    antes = ["E1-001", "E2-001", "E3-001", "E4-001", "E5-001"]
+    despues = ["E1-002", "E2-001", "E3-001", "E4-001", "E5-002"]
+    ids_evolucion = []
+    for items in (antes, despues):
+        payload = {"observacion": "Control de trayectoria", **{f"id_item{eje}": item for eje, item in enumerate(items, start=1)}}
+        response = create_evolucion(id_usuario, payload)
+        assert response.status_code == 201
+        ids_evolucion.append(response.json()['id_evolucion'])
+    resp = requests.get(ENDPOINT_PACIENTES + f"/pacientes/{id_usuario}/diagnosticos/trayectoria", headers=HEADERS_PSIQUIATRA)
+    print(resp.text)
+    assert resp.status_code == 200
+    pasos = resp.json()
+    assert pasos[0]['ejes_cambiados'] == []
+    assert all(len(p['items']) == 5 for p in pasos)
+    assert [p['id_evolucion'] for p in pasos[-2:]] == ids_evolucion
+    assert pasos[-2]['items'] == antes
+    assert pasos[-1]['items'] == despues
+    assert pasos[-1]['ejes_cambiados'] == [1, 5]
+
+def test_cant_get_analitica_diagnosticos_sin_rol():
+    resp = requests.get(ENDPOINT_PACIENTES + "/diagnosticos/analitica", headers=HEADERS_PSIQUIATRA)
+    print(resp.text)
+    assert resp.status_code == 403
+
 def test_cant_list_evoluciones_wrong_patient():
     id_usuario = -99
     response = list_evoluciones(id_usuario)
@@ -541,7 +743,30 @@ def test_can_create_evoluciones_grupales():
         detalle = resp_get.json()
         assert detalle['id_evolucion'] == id_evolucion
         assert detalle['id_usuario'] == id_usuario
-    
+        assert detalle['observacion'] == payload['observacion']
+
+def test_can_get_sesion_grupal():
+    """La sesion grupal guarda la observacion una vez y lista a todos sus pacientes."""
+    payload = {
+        "ids_usuario": [9, 8],
+        "observacion": "Sesion grupal de prueba"
+    }
+    resp = create_evoluciones_grupales(payload)
+    assert resp.status_code == 201
+    data = resp.json()
+    assert data['id_sesion_grupal'] is not None
+
+    resp_get = requests.get(ENDPOINT_PACIENTES + f"/evoluciones/grupal/{data['id_sesion_grupal']}", headers=HEADERS_PSIQUIATRA)
+    print(resp_get.text)
+    assert resp_get.status_code == 200
+    sesion = resp_get.json()
+    assert sesion['observacion'] == payload['observacion']
+    assert {i['id_evolucion'] for i in sesion['integrantes']} == {c['id_evolucion'] for c in data['creadas']}
+
+def test_cant_get_nonexistent_sesion_grupal():
+    resp = requests.get(ENDPOINT_PACIENTES + "/evoluciones/grupal/-1", headers=HEADERS_PSIQUIATRA)
+    assert resp.status_code == 404
+
 #SOT helpers
 
 def create_sot(id_usuario, payload):
@@ -268,3 +268,16 @@ def test_cant_patch_personal_wrong_id():
 	print(resp_patch.text)
 	assert resp_patch.status_code == 404
 
+
+def test_can_consultar_usuarios_en_lote():
+	"""POST /personal/usuario_base/consulta devuelve en una sola respuesta los usuarios pedidos, en orden y sin los inexistentes."""
+	resp = requests.post(ENDPOINT + "/personal/usuario_base/consulta", json={"ids_usuario": [2, 1, -99]}, headers=HEADERS_DIRECTOR)
+	print(resp.text)
+	assert resp.status_code == 200
+	data = resp.json()
+	assert [u['id_usuario'] for u in data] == [2, 1]
+	assert data[1]['admin'] is True
+	assert data[1]['nombre_completo'] == 'Administrador'
+	assert data[0]['admin'] is False
+	assert data[0]['nombre_completo'] is not None
+	assert 'alta' in data[0] and 'baja' in data[0]
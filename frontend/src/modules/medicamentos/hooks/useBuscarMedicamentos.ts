@@ -3,7 +3,6 @@ import axios from 'axios';
 import { Medicamento } from '../types/Medicamento';
 import { BUSCAR_MEDICAMENTOS_ENDPOINT, BuscarMedicamentosParams } from '../services/buscarMedicamentosEndpoint';
 import errorHandler from '@/globals/utils/errorHandler';
-import sortData from '@/globals/utils/sortData';
 import getToken from '@/globals/utils/getToken';
 
 export interface UseBuscarMedicamentosReturn {
@@ -40,36 +39,23 @@ export const useBuscarMedicamentos = (): UseBuscarMedicamentosReturn => {
         url: BUSCAR_MEDICAMENTOS_ENDPOINT.URL(params)
       });
 
-      const data = response.data;
-      const requestedLimit = params.limit && params.limit > 0 ? params.limit : undefined;
-      const requestedPage = params.page && params.page > 0 ? params.page : 1;
+      // El backend ya devuelve la pagina pedida, ordenada por sort/order:
+      // { medicamentos: [...], total: number | null, limit: number, hay_mas: boolean }
+      const {
+        medicamentos: medicamentosData = [],
+        total,
+        hay_mas: hayMas = false,
+        limit: serverLimit,
+      } = response.data ?? {};
+      setMedicamentos(medicamentosData);
 
-      if (Array.isArray(data)) {
-        const sorted = sortData<Medicamento>(data, params.sort, params.order as 'asc' | 'desc');
-        const paginated = requestedLimit
-          ? sorted.slice((requestedPage - 1) * requestedLimit, requestedPage * requestedLimit)
-          : sorted;
-
-        setMedicamentos(paginated);
-        setTotalMedicamentos(data.length);
+      if (typeof total === "number") {
+        setTotalMedicamentos(total);
       } else {
-        // El backend devuelve un objeto con: { medicamentos: [...], total: number, limit: number }
-        const {
-          medicamentos: medicamentosData = [],
-          total = 0,
-          limit: serverLimit,
-        } = data ?? {};
-
-        const sorted = sortData<Medicamento>(medicamentosData, params.sort, params.order as 'asc' | 'desc');
-        const effectiveLimit = requestedLimit ?? (typeof serverLimit === "number" ? serverLimit : undefined);
-        const paginated = effectiveLimit
-          ? sorted.slice((requestedPage - 1) * effectiveLimit, requestedPage * effectiveLimit)
-          : sorted;
-
-        setMedicamentos(paginated);
-        setTotalMedicamentos(
-          typeof total === "number" ? total : medicamentosData?.length ?? 0
-        );
+        // Sin total (conteo=hay_mas): alcanza con saber si existe una pagina siguiente
+        const page = params.page && params.page > 0 ? params.page : 1;
+        const limit = params.limit ?? serverLimit ?? medicamentosData.length;
+        setTotalMedicamentos((page - 1) * limit + medicamentosData.length + (hayMas ? 1 : 0));
       }
     } catch (err) {
       console.error('Error al buscar medicamentos:', err);
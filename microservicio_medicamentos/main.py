@@ -11,6 +11,7 @@ from services.medicamento_service import MedicamentoService
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.database import get_db, init_db, close_db
 from core.auth import verify_role, verify_role_is_in, get_user_id_authless
+from core.paginacion import ModoConteo
 
 app = FastAPI(
     title="API Medicamentos",
@@ -122,7 +123,11 @@ async def obtener_medicamentos(
     concentracion: str | None = Query(None, description="Filtrar por concentración"),
     forma_farmaceutica: str | None = Query(None, description="Filtrar por forma farmacéutica"),
     presentacion: str | None = Query(None, description="Filtrar por presentación"),
-    limit: int = Query(20, description="Cantidad de resultados a devolver"),
+    limit: int = Query(20, ge=1, le=100, description="Cantidad de resultados a devolver"),
+    page: int = Query(1, ge=1, description="Pagina a devolver"),
+    conteo: ModoConteo = Query(ModoConteo.exacto, description="Como calcular el total: exacto, estimado o hay_mas (sin total)"),
+    sort: str | None = Query(None, description="Columna de orden: nombre_comercial, nombre_generico, laboratorio_titular, concentracion, stock o fecha_creacion"),
+    order: str = Query("asc", pattern="^(asc|desc)$", description="Sentido del orden"),
     db: AsyncSession = Depends(get_db),
     _token_payload: dict = Depends(verify_role_is_in(["Psicologo", "Psiquiatra", "Director", "Coordinador", "Enfermera"]))
 ) -> ResultadoBusquedaMedicamentos:
@@ -138,12 +143,8 @@ async def obtener_medicamentos(
             presentacion=presentacion
         )
         
-        # Si no hay filtros, usar el método original
-        if all(v is None for v in filtros.dict().values()):
-            medicamentos = await MedicamentoService.obtener_medicamentos(db)
-            return {"medicamentos": medicamentos, "total": len(medicamentos), "limit": limit}
-        else:
-            resultado = await MedicamentoService.buscar_medicamentos(filtros, db)
-            return {**resultado, "limit": limit}
+        # Sin filtros tambien se pagina; con conteo=estimado el total sale de las estadisticas de la tabla
+        resultado = await MedicamentoService.buscar_medicamentos(filtros, db, limit=limit, page=page, conteo=conteo, sort=sort, order=order)
+        return {**resultado, "limit": limit}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
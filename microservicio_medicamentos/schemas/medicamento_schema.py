@@ -50,5 +50,6 @@ class MedicamentoBuscar(BaseModel):
 
 class ResultadoBusquedaMedicamentos(BaseModel):
     medicamentos: list[MedicamentoLeer]
-    total: int
+    total: int | None = None  # None cuando se pidio conteo=hay_mas
     limit: int
+    hay_mas: bool = False
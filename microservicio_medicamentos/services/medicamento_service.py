@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import and_, or_
 from datetime import datetime
+from core.paginacion import ModoConteo, paginar
 
 class MedicamentoService:
     @staticmethod
@@ -24,10 +25,9 @@ class MedicamentoService:
         return [MedicamentoLeer.from_orm(medicamento) for medicamento in medicamentos]
 
     @staticmethod
-    async def buscar_medicamentos(filtros: MedicamentoBuscar, db: AsyncSession):
+    async def buscar_medicamentos(filtros: MedicamentoBuscar, db: AsyncSession, limit: int = 20, page: int = 1, conteo: ModoConteo = ModoConteo.exacto, sort: str | None = None, order: str = "asc"):
         from sqlalchemy import func
         query = select(Medicamento)
-        count = select(func.count()).select_from(Medicamento)
         condiciones = []
         condiciones_nomCom_NomGene = []
         
@@ -53,13 +53,23 @@ class MedicamentoService:
         
         if condiciones_nomCom_NomGene:
             query = query.where(or_(*condiciones_nomCom_NomGene).self_group())
-            count = count.where(or_(*condiciones_nomCom_NomGene).self_group())
         
         if condiciones:
             query = query.where(and_(*condiciones))
-            count = count.where(and_(*condiciones))
         
-        total = await db.scalar(count)
-        result = await db.execute(query)
-        medicamentos = result.scalars().all()
-        return {"medicamentos": [MedicamentoLeer.from_orm(medicamento) for medicamento in medicamentos], "total": total}
\ No newline at end of file
+        # Solo se ordena por columnas conocidas; el id al final deja el orden estable entre paginas
+        sort_map = {
+            'nombre_comercial': Medicamento.nombre_comercial,
+            'nombre_generico': Medicamento.nombre_generico,
+            'laboratorio_titular': Medicamento.laboratorio_titular,
+            'concentracion': Medicamento.concentracion,
+            'stock': Medicamento.stock,
+            'fecha_creacion': Medicamento.fecha_creacion,
+        }
+        if sort in sort_map:
+            sort_col = sort_map[sort]
+            query = query.order_by(sort_col.desc() if order == "desc" else sort_col.asc(), Medicamento.id_medicamento)
+        else:
+            query = query.order_by(Medicamento.id_medicamento)
+        medicamentos, total, hay_mas = await paginar(db, query, limit, (page - 1) * limit, conteo)
+        return {"medicamentos": [MedicamentoLeer.from_orm(medicamento) for medicamento in medicamentos], "total": total, "hay_mas": hay_mas}
\ No newline at end of file
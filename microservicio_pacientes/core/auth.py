@@ -4,6 +4,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt
 import httpx
+import time
 from functools import lru_cache
 from typing import Optional
 from cryptography.hazmat.primitives.asymmetric import rsa
@@ -186,3 +187,29 @@ def verify_role_is_in(rol_requerido: List[str]):
 def get_token():
     return token
 
+# Token propio del MS (Auth0 client credentials) para pedidos internos que no salen de un pedido
+# de usuario, como la sincronizacion de la copia de usuarios. Se pide una vez y se reusa hasta
+# poco antes de que venza.
+_token_servicio = {"token": None, "vence": 0.0}
+
+async def get_token_servicio() -> str:
+    if _token_servicio["token"] and time.monotonic() < _token_servicio["vence"]:
+        return _token_servicio["token"]
+    client_id = os.getenv("AUTH0_SERVICIO_CLIENT_ID")
+    client_secret = os.getenv("AUTH0_SERVICIO_CLIENT_SECRET")
+    if not client_id or not client_secret:
+        raise ValueError("AUTH0_SERVICIO_CLIENT_ID y AUTH0_SERVICIO_CLIENT_SECRET deben estar configurados en las variables de entorno")
+    AUTH0_DOMAIN, AUTH0_AUDIENCE = _get_auth0_config()
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"https://{AUTH0_DOMAIN}/oauth/token", json={
+            "grant_type": "client_credentials",
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "audience": AUTH0_AUDIENCE
+        })
+    if response.status_code != 200:
+        raise ValueError(f"Auth0 no entrego el token de servicio: {response.text}")
+    datos = response.json()
+    _token_servicio["token"] = datos["access_token"]
+    _token_servicio["vence"] = time.monotonic() + datos.get("expires_in", 3600) - 60
+    return _token_servicio["token"]
@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+
+# Marca para distinguir "no esta en cache" de un valor cacheado en None
+AUSENTE = object()
+
+class CacheTTL:
+    """
+    Cache en memoria, compartida por todo el proceso, con vencimiento por tiempo (TTL)
+    y desalojo del elemento usado hace mas tiempo (LRU) cuando se llena.
+    Se puede guardar None como valor (cache negativa).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._datos: OrderedDict = OrderedDict()
+
+    def get(self, clave, default=AUSENTE):
+        entrada = self._datos.get(clave)
+        if entrada is None or entrada[1] < time.monotonic():
+            if entrada is not None:
+                del self._datos[clave]
+            self.misses += 1
+            return default
+        self._datos.move_to_end(clave)
+        self.hits += 1
+        return entrada[0]
+
+    def set(self, clave, valor, ttl: float | None = None):
+        vence = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._datos[clave] = (valor, vence)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.maxsize:
+            self._datos.popitem(last=False)
+
+    def invalidar(self, clave):
+        self._datos.pop(clave, None)
+
+    def limpiar(self):
+        self._datos.clear()
+
+    def __contains__(self, clave) -> bool:
+        entrada = self._datos.get(clave)
+        return entrada is not None and entrada[1] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+    def estadisticas(self) -> dict:
+        consultas = self.hits + self.misses
+        return {
+            "tamanio": len(self._datos),
+            "maximo": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / consultas if consultas else 0.0
+        }
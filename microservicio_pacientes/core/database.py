@@ -71,10 +71,25 @@ async def init_db():
     # Ensure the database exists before creating tables
     await create_database_if_not_exists()
     async with engine.begin() as conn:
-        from models import paciente, evolucion, sot, item_dm, diagnostico_multiaxial  # importar todos los modelos
+        from models import paciente, evolucion, sot, item_dm, diagnostico_multiaxial, sesion_grupal, actividad_clinica, paciente_resumen, usuario_replica  # importar todos los modelos
         await conn.run_sync(Base.metadata.create_all)
         print("📦 Tables created successfully.")
+    # Cambios sobre tablas existentes (indices, columnas) que create_all no aplica
+    from core.migraciones import aplicar_migraciones
+    await aplicar_migraciones(engine)
+    # Particionado opcional de evolucion por fecha (EVOLUCION_PARTICIONES)
+    from core.particiones import mantener_particiones
+    await mantener_particiones(engine)
     await seed_initial_data()
+    await cargar_catalogos()
+
+
+async def cargar_catalogos():
+    # Tablas de referencia que se sirven desde memoria
+    from services.item_dm_service import ItemDMService
+    async with async_session() as session:
+        version = await ItemDMService.refrescar_catalogo(session)
+        print(f"📚 Catalogo ItemDM cargado ({len(ItemDMService.catalogo)} items, version {version})")
 
 
 async def seed_initial_data():
@@ -83,6 +98,7 @@ async def seed_initial_data():
     from services.paciente_service import PacienteService
     from services.evolucion_service import EvolucionService
     from services.sot_service import SotService
+    from services.item_dm_service import ItemDMService
     from schemas.paciente_schema import PacienteCrear, Genero
     from schemas.evolucion_schema import EvolucionCrear, EvolucionGrupalCrear
     from schemas.sot_schema import SotCrear
@@ -115,6 +131,8 @@ async def seed_initial_data():
         if to_create:
             session.add_all(to_create)
             await session.commit()
+            # La tabla de items cambio: recargamos el catalogo en memoria
+            await ItemDMService.refrescar_catalogo(session)
             # Cargamos Pacientes listos para usar
             sofia = await PacienteService.crear_paciente(PacienteCrear(
                 dni="63245321",
@@ -0,0 +1,20 @@
+import hashlib
+from fastapi import Request, Response
+
+# GET condicionales: el validador sale de un agregado barato sobre las filas del paciente
+# (cantidad, ultimas fechas) y se combina con la query string, porque cada pagina/filtro es
+# una representacion distinta. Si el cliente ya la tiene (If-None-Match) se responde 304
+# sin armar la respuesta completa.
+
+def calcular_etag(version: str, request: Request) -> str:
+    digest = hashlib.sha1(f"{version}|{request.url.query}".encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def respuesta_no_modificada(request: Request, response: Response, etag: str) -> Response | None:
+    response.headers["ETag"] = etag
+    # El navegador guarda la respuesta pero revalida siempre antes de usarla
+    response.headers["Cache-Control"] = "private, no-cache"
+    enviados = request.headers.get("if-none-match")
+    if enviados and (enviados.strip() == "*" or etag in [e.strip() for e in enviados.split(",")]):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    return None
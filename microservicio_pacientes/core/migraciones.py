@@ -0,0 +1,283 @@
+import asyncio
+import re
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# ============================================================
+# MIGRACIONES VERSIONADAS DEL ESQUEMA
+# ============================================================
+# create_all solo crea tablas que no existen; todo cambio sobre tablas ya creadas
+# (indices, columnas nuevas, etc.) va como una migracion con version creciente.
+# Las migraciones "concurrentes" corren fuera de una transaccion (AUTOCOMMIT) porque
+# CREATE INDEX CONCURRENTLY no bloquea escrituras pero no se puede usar dentro de una.
+# Postgres no admite CONCURRENTLY sobre tablas particionadas (evolucion con EVOLUCION_PARTICIONES):
+# ahi la sentencia corre sin CONCURRENTLY y bloquea las escrituras de la tabla mientras dura.
+# Los "lotes" son sentencias que completan datos de a LOTE_MIGRACIONES filas, cada lote en su
+# propia transaccion corta: reciben :desde/:tamanio y devuelven la ultima clave procesada
+# (NULL cuando no queda nada). La version se registra recien al terminar los lotes; si el proceso
+# se corta, la migracion se repite: la parte de esquema es idempotente y los lotes saltean lo ya completado.
+
+MIGRACIONES = [
+    {
+        "version": 1,
+        "descripcion": "Indices de evoluciones y SOTs por paciente y fecha",
+        "concurrente": True,
+        "sentencias": [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_evolucion_paciente_fecha ON evolucion (id_usuario, fecha_creacion DESC, id_evolucion DESC)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_evolucion_creada_por ON evolucion (creada_por)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sot_paciente_fecha ON sot (id_usuario_paciente, fecha_creacion, id_sot)",
+        ],
+    },
+    {
+        "version": 2,
+        "descripcion": "Columna normalizada para la busqueda de pacientes",
+        "concurrente": False,
+        "sentencias": [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            "ALTER TABLE paciente ADD COLUMN IF NOT EXISTS busqueda TEXT",
+            # Unica normalizacion de la busqueda (minusculas, sin acentos; la ñ queda como n): la usan el
+            # trigger, la carga de las filas existentes y los terminos buscados (PacienteService.buscar_pacientes)
+            "CREATE OR REPLACE FUNCTION normalizar_busqueda(texto text) RETURNS text LANGUAGE sql IMMUTABLE AS $$ "
+            "SELECT btrim(regexp_replace(normalize(lower(texto), NFKD), '[\\u0300-\\u036f]', '', 'g')) $$",
+            "CREATE OR REPLACE FUNCTION paciente_busqueda() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+            "NEW.busqueda := normalizar_busqueda(NEW.nombre || ' ' || NEW.apellido || ' ' || NEW.dni); RETURN NEW; END $$",
+            "DROP TRIGGER IF EXISTS paciente_busqueda ON paciente",
+            "CREATE TRIGGER paciente_busqueda BEFORE INSERT OR UPDATE OF nombre, apellido, dni ON paciente "
+            "FOR EACH ROW EXECUTE FUNCTION paciente_busqueda()",
+            "UPDATE paciente SET busqueda = normalizar_busqueda(nombre || ' ' || apellido || ' ' || dni) WHERE busqueda IS NULL",
+        ],
+    },
+    {
+        "version": 3,
+        "descripcion": "Indices de trigramas y de fecha de ingreso para la busqueda de pacientes",
+        "concurrente": True,
+        "sentencias": [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_paciente_busqueda_trgm ON paciente USING gin (busqueda gin_trgm_ops)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_paciente_fecha_ingreso ON paciente (fecha_ingreso)",
+        ],
+    },
+    {
+        "version": 4,
+        "descripcion": "Sesiones grupales: la observacion compartida se guarda una sola vez",
+        "concurrente": False,
+        "sentencias": [
+            "ALTER TABLE evolucion ADD COLUMN IF NOT EXISTS id_sesion_grupal INTEGER REFERENCES sesion_grupal (id_sesion_grupal)",
+            "ALTER TABLE evolucion ALTER COLUMN observacion DROP NOT NULL",
+            # Las copias existentes de una misma grupal comparten texto, autor y fecha de creacion
+            "INSERT INTO sesion_grupal (observacion, creada_por, fecha_creacion) "
+            "SELECT observacion, creada_por, fecha_creacion FROM evolucion "
+            "WHERE tipo = 'grupal' AND id_sesion_grupal IS NULL "
+            "GROUP BY observacion, creada_por, fecha_creacion",
+            "UPDATE evolucion e SET id_sesion_grupal = s.id_sesion_grupal, observacion = NULL "
+            "FROM sesion_grupal s "
+            "WHERE e.tipo = 'grupal' AND e.id_sesion_grupal IS NULL "
+            "AND e.observacion = s.observacion AND e.creada_por = s.creada_por AND e.fecha_creacion = s.fecha_creacion",
+        ],
+    },
+    {
+        "version": 5,
+        "descripcion": "Indice de evoluciones por sesion grupal",
+        "concurrente": True,
+        "sentencias": [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_evolucion_sesion_grupal ON evolucion (id_sesion_grupal) WHERE id_sesion_grupal IS NOT NULL",
+        ],
+    },
+    {
+        "version": 6,
+        "descripcion": "Vectores de busqueda de texto completo en evoluciones, sesiones grupales y SOTs",
+        "concurrente": False,
+        # Columna comun (ADD COLUMN sin default no reescribe la tabla) que mantiene un trigger en cada
+        # INSERT/UPDATE; las filas existentes se completan despues por lotes (ver "lotes")
+        "sentencias": [
+            "ALTER TABLE evolucion ADD COLUMN IF NOT EXISTS busqueda_ts tsvector",
+            "ALTER TABLE sesion_grupal ADD COLUMN IF NOT EXISTS busqueda_ts tsvector",
+            "ALTER TABLE sot ADD COLUMN IF NOT EXISTS busqueda_ts tsvector",
+            "CREATE OR REPLACE FUNCTION evolucion_busqueda_ts() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+            "NEW.busqueda_ts := to_tsvector('spanish', coalesce(NEW.observacion, '')); RETURN NEW; END $$",
+            "CREATE OR REPLACE FUNCTION sesion_grupal_busqueda_ts() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+            "NEW.busqueda_ts := to_tsvector('spanish', NEW.observacion); RETURN NEW; END $$",
+            "CREATE OR REPLACE FUNCTION sot_busqueda_ts() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+            "NEW.busqueda_ts := setweight(to_tsvector('spanish', coalesce(NEW.motivo, '')), 'A') || "
+            "setweight(to_tsvector('spanish', coalesce(NEW.observacion, '')), 'B'); RETURN NEW; END $$",
+            "DROP TRIGGER IF EXISTS evolucion_busqueda_ts ON evolucion",
+            "CREATE TRIGGER evolucion_busqueda_ts BEFORE INSERT OR UPDATE OF observacion ON evolucion "
+            "FOR EACH ROW EXECUTE FUNCTION evolucion_busqueda_ts()",
+            "DROP TRIGGER IF EXISTS sesion_grupal_busqueda_ts ON sesion_grupal",
+            "CREATE TRIGGER sesion_grupal_busqueda_ts BEFORE INSERT OR UPDATE OF observacion ON sesion_grupal "
+            "FOR EACH ROW EXECUTE FUNCTION sesion_grupal_busqueda_ts()",
+            "DROP TRIGGER IF EXISTS sot_busqueda_ts ON sot",
+            "CREATE TRIGGER sot_busqueda_ts BEFORE INSERT OR UPDATE OF motivo, observacion ON sot "
+            "FOR EACH ROW EXECUTE FUNCTION sot_busqueda_ts()",
+        ],
+        "lotes": [
+            "WITH lote AS (SELECT id_evolucion FROM evolucion WHERE id_evolucion > :desde ORDER BY id_evolucion LIMIT :tamanio), "
+            "completadas AS (UPDATE evolucion e SET busqueda_ts = to_tsvector('spanish', coalesce(e.observacion, '')) "
+            "  FROM lote WHERE e.id_evolucion = lote.id_evolucion AND e.busqueda_ts IS NULL) "
+            "SELECT max(id_evolucion) FROM lote",
+            "WITH lote AS (SELECT id_sesion_grupal FROM sesion_grupal WHERE id_sesion_grupal > :desde ORDER BY id_sesion_grupal LIMIT :tamanio), "
+            "completadas AS (UPDATE sesion_grupal s SET busqueda_ts = to_tsvector('spanish', s.observacion) "
+            "  FROM lote WHERE s.id_sesion_grupal = lote.id_sesion_grupal AND s.busqueda_ts IS NULL) "
+            "SELECT max(id_sesion_grupal) FROM lote",
+            "WITH lote AS (SELECT id_sot FROM sot WHERE id_sot > :desde ORDER BY id_sot LIMIT :tamanio), "
+            "completadas AS (UPDATE sot s SET busqueda_ts = setweight(to_tsvector('spanish', coalesce(s.motivo, '')), 'A') || "
+            "  setweight(to_tsvector('spanish', coalesce(s.observacion, '')), 'B') "
+            "  FROM lote WHERE s.id_sot = lote.id_sot AND s.busqueda_ts IS NULL) "
+            "SELECT max(id_sot) FROM lote",
+        ],
+    },
+    {
+        "version": 7,
+        "descripcion": "Indices GIN de busqueda de texto completo",
+        "concurrente": True,
+        "sentencias": [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_evolucion_busqueda_ts ON evolucion USING gin (busqueda_ts)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sesion_grupal_busqueda_ts ON sesion_grupal USING gin (busqueda_ts)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sot_busqueda_ts ON sot USING gin (busqueda_ts)",
+        ],
+    },
+    {
+        "version": 8,
+        "descripcion": "Carga inicial del rollup actividad_clinica_semanal",
+        "concurrente": False,
+        # De aca en adelante lo mantienen las altas y marcadas erroneas (ActividadService.registrar)
+        "sentencias": [
+            "INSERT INTO actividad_clinica_semanal (semana, id_profesional, tipo, evoluciones, erroneas) "
+            "SELECT date_trunc('week', fecha_creacion)::date, creada_por, tipo, count(*), count(*) FILTER (WHERE marcada_erronea) "
+            "FROM evolucion GROUP BY 1, 2, 3 "
+            "ON CONFLICT DO NOTHING",
+        ],
+    },
+    {
+        "version": 9,
+        "descripcion": "Hash de contenido para deduplicar diagnostico_multiaxial",
+        "concurrente": False,
+        "sentencias": [
+            "ALTER TABLE diagnostico_multiaxial ADD COLUMN IF NOT EXISTS hash_contenido varchar(64)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS diagnostico_multiaxial_hash_contenido_key ON diagnostico_multiaxial (hash_contenido)",
+            # Mismo hash que DiagnosticoMultiaxialService.hash_contenido; de cada grupo de repetidos
+            # solo el primero lo recibe, asi los diagnosticos viejos tambien se reutilizan
+            "UPDATE diagnostico_multiaxial d SET hash_contenido = p.hash FROM ("
+            "  SELECT min(id_diagnostico_multiaxial) AS id, encode(sha256(convert_to("
+            "    concat_ws('|', id_item1, id_item2, id_item3, id_item4, id_item5, creado_por), 'UTF8')), 'hex') AS hash"
+            "  FROM diagnostico_multiaxial GROUP BY 2"
+            ") p "
+            "WHERE d.id_diagnostico_multiaxial = p.id AND d.hash_contenido IS NULL "
+            "AND NOT EXISTS (SELECT 1 FROM diagnostico_multiaxial e WHERE e.hash_contenido = p.hash)",
+        ],
+    },
+    {
+        "version": 10,
+        "descripcion": "Carga inicial de paciente_resumen",
+        "concurrente": False,
+        # De aca en adelante lo mantienen las escrituras (PacienteResumenService)
+        "sentencias": [
+            "INSERT INTO paciente_resumen (id_usuario, cantidad_evoluciones, fecha_ultima_evolucion, "
+            "id_ultimo_diagnostico_multiaxial, fecha_ultimo_diagnostico, cantidad_sots, fecha_ultima_sot) "
+            "SELECT p.id_usuario, coalesce(e.cantidad, 0), e.ultima, dm.id_diagnostico_multiaxial, dm.fecha_creacion, "
+            "coalesce(s.cantidad, 0), s.ultima "
+            "FROM paciente p "
+            "LEFT JOIN (SELECT id_usuario, count(*) AS cantidad, max(fecha_creacion) AS ultima FROM evolucion "
+            "  WHERE NOT marcada_erronea GROUP BY id_usuario) e ON e.id_usuario = p.id_usuario "
+            "LEFT JOIN (SELECT DISTINCT ON (id_usuario) id_usuario, id_diagnostico_multiaxial, fecha_creacion FROM evolucion "
+            "  WHERE NOT marcada_erronea AND id_diagnostico_multiaxial IS NOT NULL "
+            "  ORDER BY id_usuario, fecha_creacion DESC, id_evolucion DESC) dm ON dm.id_usuario = p.id_usuario "
+            "LEFT JOIN (SELECT id_usuario_paciente, count(*) AS cantidad, max(fecha_creacion) AS ultima FROM sot "
+            "  GROUP BY id_usuario_paciente) s ON s.id_usuario_paciente = p.id_usuario "
+            "WHERE e.id_usuario IS NOT NULL OR s.id_usuario_paciente IS NOT NULL "
+            "ON CONFLICT DO NOTHING",
+        ],
+    },
+]
+
+# Clave del advisory lock: evita que dos procesos apliquen migraciones a la vez
+LOCK_MIGRACIONES = 7410001
+LOTE_MIGRACIONES = 5000
+
+
+async def _aplicar_lotes(engine: AsyncEngine, sentencias: list[str]):
+    for sentencia in sentencias:
+        desde = 0
+        while True:
+            async with engine.begin() as conn:
+                ultima = await conn.scalar(text(sentencia), {"desde": desde, "tamanio": LOTE_MIGRACIONES})
+            if ultima is None:
+                break
+            desde = ultima
+
+
+async def _sin_concurrently_si_particionada(conn, sentencia: str) -> str:
+    m = re.search(r"INDEX CONCURRENTLY IF NOT EXISTS \w+ ON (\w+)", sentencia)
+    if not m:
+        return sentencia
+    particionada = await conn.scalar(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:tabla)"), {"tabla": m.group(1)}
+    )
+    if not particionada:
+        return sentencia
+    print(f"⚠️ {m.group(1)} esta particionada: el indice se crea sin CONCURRENTLY (bloquea escrituras mientras dura)")
+    return sentencia.replace("INDEX CONCURRENTLY", "INDEX", 1)
+
+
+async def _borrar_indices_invalidos(conn, sentencias: list[str]):
+    # Un CREATE INDEX CONCURRENTLY que fallo deja el indice creado pero INVALID, y el
+    # IF NOT EXISTS lo saltearia. Se borran para que el reintento los construya de nuevo.
+    nombres = [m.group(1) for s in sentencias if (m := re.search(r"INDEX CONCURRENTLY IF NOT EXISTS (\w+)", s))]
+    if not nombres:
+        return
+    result = await conn.execute(
+        text("SELECT c.relname, c.relkind = 'I' FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+             "WHERE NOT i.indisvalid AND c.relname = ANY(:nombres)"),
+        {"nombres": nombres}
+    )
+    for nombre, particionado in result.all():
+        # Un indice de tabla particionada tampoco se puede borrar con CONCURRENTLY
+        await conn.execute(text(f'DROP INDEX {"" if particionado else "CONCURRENTLY "}IF EXISTS "{nombre}"'))
+
+
+async def aplicar_migraciones(engine: AsyncEngine):
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        await lock_conn.execute(text("SELECT pg_advisory_lock(:clave)"), {"clave": LOCK_MIGRACIONES})
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS schema_migracion ("
+                    "version INTEGER PRIMARY KEY, "
+                    "descripcion TEXT NOT NULL, "
+                    "aplicada_en TIMESTAMP NOT NULL DEFAULT now())"
+                ))
+                result = await conn.execute(text("SELECT version FROM schema_migracion"))
+                aplicadas = {row[0] for row in result.all()}
+
+            for migracion in sorted(MIGRACIONES, key=lambda m: m["version"]):
+                if migracion["version"] in aplicadas:
+                    continue
+                registro = text("INSERT INTO schema_migracion (version, descripcion) VALUES (:version, :descripcion)")
+                datos = {"version": migracion["version"], "descripcion": migracion["descripcion"]}
+                if migracion["concurrente"]:
+                    async with engine.connect() as conn:
+                        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                        await _borrar_indices_invalidos(conn, migracion["sentencias"])
+                        for sentencia in migracion["sentencias"]:
+                            await conn.execute(text(await _sin_concurrently_si_particionada(conn, sentencia)))
+                        await conn.execute(registro, datos)
+                elif migracion.get("lotes"):
+                    async with engine.begin() as conn:
+                        for sentencia in migracion["sentencias"]:
+                            await conn.execute(text(sentencia))
+                    await _aplicar_lotes(engine, migracion["lotes"])
+                    async with engine.begin() as conn:
+                        await conn.execute(registro, datos)
+                else:
+                    async with engine.begin() as conn:
+                        for sentencia in migracion["sentencias"]:
+                            await conn.execute(text(sentencia))
+                        await conn.execute(registro, datos)
+                print(f"🛠️ Migracion {migracion['version']} aplicada: {migracion['descripcion']}")
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:clave)"), {"clave": LOCK_MIGRACIONES})
+
+
+if __name__ == "__main__":
+    from core.database import engine
+    asyncio.run(aplicar_migraciones(engine))
@@ -0,0 +1,96 @@
+import base64
+import json
+from datetime import datetime
+from enum import Enum
+from fastapi import HTTPException
+from sqlalchemy import Select, func, literal_column, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Cursores opacos para paginar por clave (fecha_creacion, id) en lugar de OFFSET:
+# el costo de cada pagina no crece con la cantidad de filas ya recorridas
+
+def codificar_cursor(fecha: datetime, id: int) -> str:
+    crudo = json.dumps([fecha.isoformat(), id]).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        fecha, id = json.loads(crudo)
+        return datetime.fromisoformat(fecha), int(id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginacion invalido")
+
+
+# ============================================================
+# PAGINA + TOTAL EN UNA SOLA CONSULTA
+# ============================================================
+
+class ModoConteo(str, Enum):
+    exacto = "exacto"      # count(*) over () sobre la misma consulta de la pagina
+    estimado = "estimado"  # estimacion del planner: pg_class.reltuples sin filtros, EXPLAIN con filtros
+    hay_mas = "hay_mas"    # no cuenta: trae limit + 1 filas para saber si hay otra pagina
+
+async def estimar_filas(db: AsyncSession, query: Select) -> int | None:
+    """Filas que el planner espera para la consulta (EXPLAIN, no la ejecuta); None si no se pudo estimar."""
+    compilada = query.order_by(None).compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+    conn = await db.connection()
+    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compilada}")
+    plan = result.scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    try:
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+
+async def paginar(db: AsyncSession, query: Select, limit: int, offset: int = 0, modo: ModoConteo = ModoConteo.exacto):
+    """
+    Ejecuta la consulta paginada y devuelve (filas, total, hay_mas) en un solo viaje a la BD.
+    En modo hay_mas el total es None.
+    """
+    if modo == ModoConteo.hay_mas:
+        result = await db.execute(query.offset(offset).limit(limit + 1))
+        filas = list(result.scalars().all())
+        return filas[:limit], None, len(filas) > limit
+
+    if modo == ModoConteo.estimado and query.whereclause is None:
+        tabla = query.get_final_froms()[0]
+        estimacion = (
+            select(func.max(literal_column("reltuples")))
+            .select_from(text("pg_class"))
+            .where(text("oid = CAST(:tabla AS regclass)").bindparams(tabla=tabla.name))
+            .scalar_subquery()
+        )
+        result = await db.execute(query.add_columns(estimacion).offset(offset).limit(limit))
+        filas = result.all()
+        if filas and filas[0][1] is not None and filas[0][1] >= 0:
+            total = int(filas[0][1])
+            # La estimacion puede quedar por debajo de lo que ya se vio
+            total = max(total, offset + len(filas))
+            return [fila[0] for fila in filas], total, offset + len(filas) < total
+        # Tabla nunca analizada (reltuples = -1) o pagina vacia: se cuenta exacto
+
+    if modo == ModoConteo.estimado and query.whereclause is not None:
+        # Con filtros reltuples no sirve: se usa la estimacion del plan. Se trae una fila de mas
+        # para que hay_mas sea exacto; en la ultima pagina el total tambien lo es
+        estimacion = await estimar_filas(db, query)
+        result = await db.execute(query.offset(offset).limit(limit + 1))
+        filas = list(result.scalars().all())
+        hay_mas = len(filas) > limit
+        filas = filas[:limit]
+        vistas = offset + len(filas)
+        if estimacion is not None and (filas or offset == 0):
+            total = max(estimacion, vistas + 1) if hay_mas else vistas
+            return filas, total, hay_mas
+        # Pagina vacia mas alla del final (o plan sin estimacion): se cuenta exacto
+
+    result = await db.execute(query.add_columns(func.count().over()).offset(offset).limit(limit))
+    filas = result.all()
+    if filas:
+        total = filas[0][1]
+    elif offset == 0:
+        total = 0
+    else:
+        # Pagina vacia: el window function no devuelve filas, el total se pide aparte
+        total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+    return [fila[0] for fila in filas], total, offset + len(filas) < total
@@ -0,0 +1,235 @@
+import asyncio
+import os
+import re
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# ============================================================
+# PARTICIONADO DE EVOLUCION POR FECHA
+# ============================================================
+# Opcional (EVOLUCION_PARTICIONES=mensual|anual). evolucion pasa a ser una tabla particionada por
+# rango de fecha_creacion: las consultas por paciente con rango de fechas (o con cursor) solo tocan
+# las particiones de ese rango, y vacuum/reindex trabajan sobre particiones de tamanio acotado.
+# - La conversion se hace una vez y a mano, con "python -m core.particiones convertir", copiando las
+#   filas a la tabla nueva dentro de una transaccion (bloquea evolucion mientras dura: va en una
+#   ventana de mantenimiento). El arranque nunca convierte; si falta, solo avisa.
+# - En cada arranque (y con "python -m core.particiones mantener", p. ej. desde cron) se crean las
+#   particiones de los proximos EVOLUCION_PARTICIONES_ADELANTE periodos. Lo que caiga fuera va a
+#   evolucion_p_default y se mueve a su particion cuando esta se crea.
+# - "python -m core.particiones archivar --antes AAAA-MM-DD" desengancha las particiones enteramente
+#   anteriores a esa fecha y las mueve al esquema "archivo" (dejan de verse desde la API).
+# La granularidad queda fija desde la conversion. Sobre una evolucion ya particionada no se puede
+# usar CREATE INDEX CONCURRENTLY: aplicar_migraciones corre esas sentencias sin CONCURRENTLY.
+
+EVOLUCION_PARTICIONES = os.getenv("EVOLUCION_PARTICIONES", "").lower()
+EVOLUCION_PARTICIONES_ADELANTE = int(os.getenv("EVOLUCION_PARTICIONES_ADELANTE", "3"))
+GRANULARIDADES = ("mensual", "anual")
+PARTICION_DEFAULT = "evolucion_p_default"
+ESQUEMA_ARCHIVO = "archivo"
+
+# Clave del advisory lock: una sola instancia convierte o crea particiones a la vez
+LOCK_PARTICIONES = 7410002
+
+
+def inicio_periodo(fecha: date, granularidad: str) -> date:
+    return date(fecha.year, fecha.month, 1) if granularidad == "mensual" else date(fecha.year, 1, 1)
+
+def siguiente_periodo(inicio: date, granularidad: str) -> date:
+    if granularidad == "anual":
+        return date(inicio.year + 1, 1, 1)
+    return date(inicio.year + (inicio.month == 12), inicio.month % 12 + 1, 1)
+
+def nombre_particion(inicio: date, granularidad: str) -> str:
+    return f"evolucion_p{inicio.year}_{inicio.month:02d}" if granularidad == "mensual" else f"evolucion_p{inicio.year}"
+
+def periodo_de_nombre(nombre: str) -> tuple[date, date] | None:
+    """Rango [inicio, fin) de una particion a partir de su nombre; None para la default u otras tablas."""
+    if m := re.fullmatch(r"evolucion_p(\d{4})_(\d{2})", nombre):
+        inicio = date(int(m.group(1)), int(m.group(2)), 1)
+        return inicio, siguiente_periodo(inicio, "mensual")
+    if m := re.fullmatch(r"evolucion_p(\d{4})", nombre):
+        inicio = date(int(m.group(1)), 1, 1)
+        return inicio, siguiente_periodo(inicio, "anual")
+    return None
+
+
+async def esta_particionada(conn) -> bool:
+    return await conn.scalar(text("SELECT relkind = 'p' FROM pg_class WHERE oid = 'evolucion'::regclass"))
+
+async def particiones_existentes(conn) -> set[str]:
+    result = await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'evolucion'::regclass"
+    ))
+    return {row[0] for row in result.all()}
+
+async def columnas_copiables(conn) -> list[str]:
+    # Si hubiera columnas generadas las recalcula Postgres, no se copian (busqueda_ts la mantiene un trigger y si se copia)
+    result = await conn.execute(text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = 'evolucion' AND is_generated = 'NEVER' "
+        "ORDER BY ordinal_position"
+    ))
+    return [row[0] for row in result.all()]
+
+
+async def crear_particion(conn, inicio: date, granularidad: str, tabla: str = "evolucion"):
+    nombre = nombre_particion(inicio, granularidad)
+    fin = siguiente_periodo(inicio, granularidad)
+    rango = f"FROM ('{inicio.isoformat()}') TO ('{fin.isoformat()}')"
+    filas_en_default = await conn.scalar(text(
+        f"SELECT EXISTS (SELECT 1 FROM {PARTICION_DEFAULT} WHERE fecha_creacion >= :inicio AND fecha_creacion < :fin)"
+    ), {"inicio": inicio, "fin": fin})
+    if not filas_en_default:
+        await conn.execute(text(f"CREATE TABLE {nombre} PARTITION OF {tabla} FOR VALUES {rango}"))
+        return
+    # Postgres no deja crear la particion si la default ya tiene filas de ese rango: se desengancha
+    # la default, se crea la particion, se mudan las filas y se vuelve a enganchar
+    columnas = ", ".join(await columnas_copiables(conn))
+    await conn.execute(text(f"ALTER TABLE {tabla} DETACH PARTITION {PARTICION_DEFAULT}"))
+    await conn.execute(text(f"CREATE TABLE {nombre} PARTITION OF {tabla} FOR VALUES {rango}"))
+    await conn.execute(text(
+        f"WITH movidas AS (DELETE FROM {PARTICION_DEFAULT} WHERE fecha_creacion >= :inicio AND fecha_creacion < :fin RETURNING {columnas}) "
+        f"INSERT INTO {tabla} ({columnas}) SELECT {columnas} FROM movidas"
+    ), {"inicio": inicio, "fin": fin})
+    await conn.execute(text(f"ALTER TABLE {tabla} ATTACH PARTITION {PARTICION_DEFAULT} DEFAULT"))
+
+
+async def asegurar_particiones(conn, granularidad: str, desde: date | None = None, adelante: int = EVOLUCION_PARTICIONES_ADELANTE) -> list[str]:
+    """Crea las particiones que falten desde `desde` (por defecto hoy) hasta `adelante` periodos despues de hoy."""
+    existentes = await particiones_existentes(conn)
+    hasta = inicio_periodo(date.today(), granularidad)
+    for _ in range(adelante):
+        hasta = siguiente_periodo(hasta, granularidad)
+    periodo = inicio_periodo(desde or date.today(), granularidad)
+    creadas = []
+    while periodo <= hasta:
+        if nombre_particion(periodo, granularidad) not in existentes:
+            await crear_particion(conn, periodo, granularidad)
+            creadas.append(nombre_particion(periodo, granularidad))
+        periodo = siguiente_periodo(periodo, granularidad)
+    return creadas
+
+
+async def convertir_evolucion(conn, granularidad: str):
+    """Reemplaza la evolucion comun por una particionada con las mismas columnas, indices y FKs."""
+    await conn.execute(text("LOCK TABLE evolucion IN ACCESS EXCLUSIVE MODE"))
+    columnas = ", ".join(await columnas_copiables(conn))
+    indices = (await conn.execute(text(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = 'evolucion' "
+        "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = 'evolucion'::regclass AND contype = 'p')"
+    ))).scalars().all()
+    fks = (await conn.execute(text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = 'evolucion'::regclass AND contype = 'f'"
+    ))).all()
+    triggers = (await conn.execute(text(
+        "SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = 'evolucion'::regclass AND NOT tgisinternal"
+    ))).scalars().all()
+    secuencia = await conn.scalar(text("SELECT pg_get_serial_sequence('evolucion', 'id_evolucion')"))
+    primera = await conn.scalar(text("SELECT min(fecha_creacion) FROM evolucion"))
+
+    # La clave de particion tiene que estar en la PK
+    await conn.execute(text(
+        "CREATE TABLE evolucion_particionada (LIKE evolucion INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED) "
+        "PARTITION BY RANGE (fecha_creacion)"
+    ))
+    await conn.execute(text("ALTER TABLE evolucion_particionada ADD CONSTRAINT evolucion_particionada_pkey PRIMARY KEY (id_evolucion, fecha_creacion)"))
+    await conn.execute(text(f"CREATE TABLE {PARTICION_DEFAULT} PARTITION OF evolucion_particionada DEFAULT"))
+    periodo = inicio_periodo(primera.date() if primera else date.today(), granularidad)
+    hasta = inicio_periodo(date.today(), granularidad)
+    for _ in range(EVOLUCION_PARTICIONES_ADELANTE):
+        hasta = siguiente_periodo(hasta, granularidad)
+    while periodo <= hasta:
+        await crear_particion(conn, periodo, granularidad, tabla="evolucion_particionada")
+        periodo = siguiente_periodo(periodo, granularidad)
+    await conn.execute(text(f"INSERT INTO evolucion_particionada ({columnas}) SELECT {columnas} FROM evolucion"))
+
+    # La secuencia de id_evolucion se conserva (la default de la tabla nueva ya apunta a ella)
+    if secuencia:
+        await conn.execute(text(f"ALTER SEQUENCE {secuencia} OWNED BY NONE"))
+    await conn.execute(text("DROP TABLE evolucion"))
+    await conn.execute(text("ALTER TABLE evolucion_particionada RENAME TO evolucion"))
+    await conn.execute(text("ALTER TABLE evolucion RENAME CONSTRAINT evolucion_particionada_pkey TO evolucion_pkey"))
+    if secuencia:
+        await conn.execute(text(f"ALTER SEQUENCE {secuencia} OWNED BY evolucion.id_evolucion"))
+    for nombre, definicion in fks:
+        await conn.execute(text(f'ALTER TABLE evolucion ADD CONSTRAINT "{nombre}" {definicion}'))
+    # Cada indice se crea en la tabla madre y Postgres lo replica en todas las particiones
+    for definicion in indices:
+        await conn.execute(text(definicion))
+    # Triggers de fila (busqueda_ts): en la madre tambien se aplican a todas las particiones
+    for definicion in triggers:
+        await conn.execute(text(definicion))
+
+
+def validar_granularidad(granularidad: str):
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f"EVOLUCION_PARTICIONES debe ser uno de {GRANULARIDADES}, no '{granularidad}'")
+
+
+async def convertir_particiones(engine: AsyncEngine, granularidad: str = EVOLUCION_PARTICIONES):
+    validar_granularidad(granularidad)
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": LOCK_PARTICIONES})
+        if await esta_particionada(conn):
+            print("🗂️ evolucion ya estaba particionada")
+            return
+        await convertir_evolucion(conn, granularidad)
+        print(f"🗂️ evolucion convertida a tabla particionada ({granularidad})")
+
+
+async def mantener_particiones(engine: AsyncEngine, granularidad: str = EVOLUCION_PARTICIONES):
+    if not granularidad:
+        return
+    validar_granularidad(granularidad)
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": LOCK_PARTICIONES})
+        if not await esta_particionada(conn):
+            print("⚠️ EVOLUCION_PARTICIONES esta configurado pero evolucion no esta particionada: "
+                  "correr 'python -m core.particiones convertir' en una ventana de mantenimiento")
+            return
+        creadas = await asegurar_particiones(conn, granularidad)
+        if creadas:
+            print(f"🗂️ Particiones de evolucion creadas: {', '.join(creadas)}")
+
+
+async def archivar_particiones(engine: AsyncEngine, antes: date) -> list[str]:
+    """Desengancha las particiones que terminan antes de `antes` y las mueve al esquema de archivo."""
+    archivadas = []
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": LOCK_PARTICIONES})
+        if not await esta_particionada(conn):
+            raise ValueError("evolucion no esta particionada")
+        await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ESQUEMA_ARCHIVO}"))
+        for nombre in sorted(await particiones_existentes(conn)):
+            periodo = periodo_de_nombre(nombre)
+            if periodo is None or periodo[1] > antes:
+                continue
+            await conn.execute(text(f"ALTER TABLE evolucion DETACH PARTITION {nombre}"))
+            await conn.execute(text(f"ALTER TABLE {nombre} SET SCHEMA {ESQUEMA_ARCHIVO}"))
+            archivadas.append(nombre)
+    return archivadas
+
+
+if __name__ == "__main__":
+    # python -m core.particiones convertir [--granularidad mensual]
+    # python -m core.particiones mantener
+    # python -m core.particiones archivar --antes 2020-01-01
+    import argparse
+    from core.database import engine
+    parser = argparse.ArgumentParser(description="Mantenimiento de las particiones de evolucion")
+    parser.add_argument("accion", choices=["convertir", "mantener", "archivar"])
+    parser.add_argument("--antes", type=date.fromisoformat, default=None)
+    parser.add_argument("--granularidad", choices=GRANULARIDADES, default=EVOLUCION_PARTICIONES or None)
+    args = parser.parse_args()
+    if args.accion == "convertir":
+        if args.granularidad is None:
+            parser.error("convertir requiere --granularidad o EVOLUCION_PARTICIONES")
+        asyncio.run(convertir_particiones(engine, args.granularidad))
+    elif args.accion == "mantener":
+        asyncio.run(mantener_particiones(engine))
+    else:
+        if args.antes is None:
+            parser.error("archivar requiere --antes")
+        print(asyncio.run(archivar_particiones(engine, args.antes)))
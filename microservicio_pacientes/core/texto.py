@@ -0,0 +1,11 @@
+from sqlalchemy import func, literal_column
+
+# Busqueda de texto completo en castellano (stemming: "expresar" encuentra "expresaron", etc.)
+CONFIG_TEXTO = literal_column("'spanish'::regconfig")
+
+def consulta_texto(q: str):
+    # websearch_to_tsquery acepta lo que escribe el usuario ("comillas", -excluir, or) sin errores de sintaxis
+    return func.websearch_to_tsquery(CONFIG_TEXTO, q)
+
+def coincide(vector, tsquery):
+    return vector.bool_op("@@")(tsquery)
@@ -1,22 +1,33 @@
-from fastapi import FastAPI, status, Depends, HTTPException, Request
+from fastapi import FastAPI, status, Depends, HTTPException, Request, Response, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
-from schemas.paciente_schema import PacienteCrear, PacienteCreado, PacienteEditar, UnPacienteUsuario, UnPaciente, PacienteBaja, Genero, ResultadoBusqueda
-from schemas.evolucion_schema import EvolucionCrear, EvolucionLeida, EvolucionMarcarErronea, EvolucionGrupalCrear, EvolucionGrupalRespuesta, EvolucionCompleta
-from schemas.sot_schema import SotCrear, SotLeida, SotActualizar, SotCompleta
+from fastapi.responses import JSONResponse, StreamingResponse
+from datetime import date, datetime
+from schemas.paciente_schema import PacienteCrear, PacienteCreado, PacienteEditar, UnPacienteUsuario, UnPaciente, PacienteBaja, Genero, ResultadoBusqueda, ResultadoImportacion, ConsultarPacientes, PacientesConsultados
+from schemas.evolucion_schema import EvolucionCrear, EvolucionLeida, EvolucionMarcarErronea, EvolucionGrupalCrear, EvolucionGrupalRespuesta, TipoEvolucion, EvolucionCompleta, SesionGrupalCompleta, ResultadoBusquedaEvoluciones
+from schemas.actividad_schema import ActividadSemanal
+from schemas.sot_schema import SotCrear, SotLeida, SotActualizar, SotCompleta, ResultadoBusquedaSots
 from schemas.item_dm_schema import ItemDMLeida
-from schemas.diagnostico_multiaxial_schema import DiagnosticoMultiaxialCrear, DiagnosticoMultiaxialLeida
+from schemas.diagnostico_multiaxial_schema import DiagnosticoMultiaxialCrear, DiagnosticoMultiaxialLeida, AnaliticaDiagnosticos, PasoDiagnostico
 from services.paciente_service import PacienteService
-from services.evolucion_service import EvolucionService
+from services.evolucion_service import EvolucionService, profesionales_cache, evoluciones_cache
 from services.sot_service import SotService
 from services.item_dm_service import ItemDMService
 from services.diagnostico_multiaxial_service import DiagnosticoMultiaxialService
+from services.historia_service import HistoriaService
+from services.fhir_export_service import FhirExportService
+from services.actividad_service import ActividadService
+from services.diagnostico_analitica_service import DiagnosticoAnaliticaService
+from services.importacion_service import ImportacionService
+from services.usuario_replica_service import UsuarioReplicaService, USUARIOS_REPLICA_INTERVALO
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.database import get_db, init_db, close_db
-from core.auth import verify_role, verify_role_is_in, get_user_id_authless
+from core.auth import verify_role, verify_role_is_in, get_user_id_authless, get_user_rol, get_token
+from core.paginacion import ModoConteo
+from core.etag import calcular_etag, respuesta_no_modificada
+import asyncio
 
 app = FastAPI(
     title="API Pacientes",
@@ -30,14 +41,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    # Copia local de contacto/baja de usuarios, refrescada desde el feed de cambios
+    if USUARIOS_REPLICA_INTERVALO > 0:
+        app.state.replica_usuarios = asyncio.create_task(UsuarioReplicaService.mantener_replica())
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if getattr(app.state, "replica_usuarios", None):
+        app.state.replica_usuarios.cancel()
     await close_db()
 
 # Errores mas amigables
@@ -48,6 +65,43 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         mensajes = mensajes + ";" + error.pop('loc')[1] + ":" + error.pop('msg')
     return JSONResponse(content=jsonable_encoder({"detail": mensajes}), status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
 
+# Estadisticas de la cache de profesionales (hits/misses)
+@app.get("/cache/profesionales", include_in_schema=False, status_code=200)
+async def estadisticas_cache_profesionales(_token_payload: dict = Depends((verify_role_is_in(["Director", "Coordinador"])))):
+    return profesionales_cache.estadisticas()
+
+@app.get("/cache/evoluciones", include_in_schema=False, status_code=200)
+async def estadisticas_cache_evoluciones(_token_payload: dict = Depends((verify_role_is_in(["Director", "Coordinador"])))):
+    return evoluciones_cache.estadisticas()
+
+# Fuerza una sincronizacion de la copia local de usuarios (normalmente la hace la tarea de fondo)
+@app.post("/replica/usuarios", include_in_schema=False, status_code=200)
+async def sincronizar_replica_usuarios(db: AsyncSession = Depends(get_db), _token_payload: dict = Depends((verify_role_is_in(["Director", "Coordinador", "Secretaria"])))):
+    try:
+        return {"aplicados": await UsuarioReplicaService.sincronizar(db)}
+    except ValueError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+# Exportacion masiva FHIR R4 (Observation/Condition en NDJSON) para el sistema provincial de salud
+@app.post("/exportaciones/fhir", summary="Lanzar exportacion FHIR de evoluciones y diagnosticos", tags=["Exportaciones"], status_code=status.HTTP_202_ACCEPTED)
+async def lanzar_exportacion_fhir(
+    background_tasks: BackgroundTasks,
+    desde: datetime | None = None,
+    hasta: datetime | None = None,
+    _token_payload: dict = Depends((verify_role_is_in(["Director"])))
+):
+    if FhirExportService.ultima_exportacion and FhirExportService.ultima_exportacion["estado"] == "en_curso":
+        raise HTTPException(status_code=409, detail="Ya hay una exportacion en curso")
+    FhirExportService.ultima_exportacion = {"estado": "en_curso", "desde": desde, "hasta": hasta}
+    background_tasks.add_task(FhirExportService.exportar_en_segundo_plano, desde, hasta)
+    return FhirExportService.ultima_exportacion
+
+@app.get("/exportaciones/fhir", summary="Estado de la ultima exportacion FHIR", tags=["Exportaciones"])
+async def estado_exportacion_fhir(_token_payload: dict = Depends((verify_role_is_in(["Director"])))):
+    if FhirExportService.ultima_exportacion is None:
+        raise HTTPException(status_code=404, detail="No se lanzo ninguna exportacion")
+    return FhirExportService.ultima_exportacion
+
 @app.post("/pacientes/", summary="Cargar un Paciente", tags=["Pacientes"], status_code=status.HTTP_201_CREATED)
 # Solo Secretarias pueden
 async def crear_paciente(input: PacienteCrear, db: AsyncSession = Depends(get_db), _token_payload: dict = Depends(verify_role("Secretaria"))) -> PacienteCreado:
@@ -57,6 +111,30 @@ async def crear_paciente(input: PacienteCrear, db: AsyncSession = Depends(get_db
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# Carga masiva: el cuerpo es el archivo (CSV con encabezado o NDJSON, una fila por paciente con los campos de PacienteCrear)
+@app.post("/pacientes/importar", summary="Importar Pacientes desde CSV o NDJSON", tags=["Pacientes"])
+async def importar_pacientes(
+    request: Request,
+    formato: str | None = Query(None, pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
+    _token_payload: dict = Depends(verify_role("Secretaria"))
+) -> ResultadoImportacion:
+    # Sin formato explicito se deduce del Content-Type
+    if formato is None:
+        formato = "ndjson" if "json" in request.headers.get("content-type", "") else "csv"
+    try:
+        return await ImportacionService.importar(await request.body(), formato, db)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Varios pacientes por id en un solo pedido (listas de egreso, selectores de evoluciones grupales)
+@app.post("/pacientes/lookup", summary="Obtener varios Pacientes por ID de Usuario", tags=["Pacientes"])
+async def consultar_pacientes(input: ConsultarPacientes, db: AsyncSession = Depends(get_db), _token_payload: dict = Depends((verify_role_is_in(["Psicologo", "Psiquiatra", "Director", "Coordinador", "Enfermera", "Secretaria"])))) -> PacientesConsultados:
+    try:
+        return await PacienteService.consultar_pacientes(input.ids_usuario, db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # Nuevo endpoint GET para obtener paciente por id usuario
 @app.get("/pacientes/{id_usuario}", summary="Obtener un Paciente por su ID de Usuario", tags=["Pacientes"])
 async def get_paciente(id_usuario: int, db: AsyncSession = Depends(get_db), _token_payload: dict = Depends((verify_role_is_in(["Psicologo", "Psiquiatra", "Director", "Coordinador", "Enfermera", "Secretaria"])))) -> UnPacienteUsuario:
@@ -100,6 +178,21 @@ async def marcar_evolucion_erronea(id_paciente: int, id_evolucion: int, input: E
         raise HTTPException(status_code=404, detail="Evolución no encontrada o el DNI no coincide")
     return evolucion
 
+# Historia clinica completa en un solo pedido (auditorias, derivaciones)
+@app.get("/pacientes/{id_usuario}/historia/export", summary="Exportar la historia clinica completa de un paciente (NDJSON)", tags=["Pacientes"])
+async def exportar_historia(
+    id_usuario: int,
+    db: AsyncSession = Depends(get_db),
+    _token_payload: dict = Depends((verify_role_is_in(["Psicologo", "Psiquiatra", "Coordinador", "Director"])))
+):
+    if not await PacienteService.existe_paciente(id_usuario, db):
+        raise HTTPException(status_code=404, detail="Paciente no encontrado")
+    return StreamingResponse(
+        HistoriaService.exportar_historia(id_usuario, get_token()),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="historia_{id_usuario}.ndjson"'}
+    )
+
 # Endpoint GET para listar evoluciones de un paciente con filtros y paginación
 from typing import List
 from datetime import datetime
@@ -109,6 +202,8 @@ from typing import Any
 @app.get("/pacientes/{id_usuario}/evoluciones", summary="Listar evoluciones de un paciente", tags=["Evoluciones"])
 async def listar_evoluciones(
     id_usuario: int,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     limit: int = 20,
     page: int = 1,
@@ -117,17 +212,18 @@ async def listar_evoluciones(
     tipo: str = None,
     sort: str = "fecha_creacion",
     order: str = "desc",
+    cursor: str | None = None,
+    q: str | None = Query(None, min_length=2, description="Texto a buscar en las observaciones (resultados rankeados)"),
     _token_payload: dict = Depends((verify_role_is_in(["Psicologo", "Psiquiatra", "Coordinador", "Director"])))
 
 ) -> list[EvolucionCompleta]:
     # Verificar que el paciente exista antes de listar evoluciones
-    try:
-        paciente = await PacienteService.get_paciente_por_id(id_usuario, db)
-    except HTTPException:
-        # Propagar HTTPException lanzada por el servicio (por ejemplo 404)
-        raise
-    if paciente is None:
+    if not await PacienteService.existe_paciente(id_usuario, db):
         raise HTTPException(status_code=404, detail="Paciente no encontrado")
+    # Si el cliente ya tiene esta pagina, 304 sin resolver diagnosticos ni autores
+    etag = calcular_etag(await EvolucionService.version_evoluciones(id_usuario, db), request)
+    if (no_modificada := respuesta_no_modificada(request, response, etag)) is not None:
+        return no_modificada
 
     evoluciones = await EvolucionService.listar_evoluciones(
         id_usuario,
@@ -138,54 +234,63 @@ async def listar_evoluciones(
         toDate,
         tipo,
         sort,
-        order
+        order,
+        cursor,
+        q
     )
+    # Cursor para pedir la pagina siguiente sin OFFSET (page se mantiene por compatibilidad).
+    # Los resultados de una busqueda por texto van ordenados por ranking y se paginan con page
+    siguiente = None if q else EvolucionService.siguiente_cursor(evoluciones, limit)
+    if siguiente:
+        response.headers["X-Next-Cursor"] = siguiente
     return evoluciones
 
 # NUEVO ENDPOINT para obtener una evolucion por ID
-@app.get("/pacientes/{id_usuario}/evoluciones/{id_evolucion}", summary="Obtener una evolucion de un paciente", tags=["Evoluciones"])
+# Devuelve el JSON ya serializado (Response); response_model solo documenta la forma en OpenAPI
+@app.get("/pacientes/{id_usuario}/evoluciones/{id_evolucion}", response_model=EvolucionCompleta, summary="Obtener una evolucion de un paciente", tags=["Evoluciones"])
 async def obtener_evolucion(
     id_usuario: int,
     id_evolucion: int,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     _token_payload: dict = Depends((verify_role_is_in(["Psicologo", "Psiquiatra", "Coordinador", "Director"])))
-) -> EvolucionCompleta:
+) -> Response:
     # Verificar que el paciente exista y devolver detalle claro si no
-    try:
-        paciente = await PacienteService.get_paciente_por_id(id_usuario, db)
-    except HTTPException:
-        raise
-    if paciente is None:
+    if not await PacienteService.existe_paciente(id_usuario, db):
         raise HTTPException(status_code=404, detail=f"Paciente {id_usuario} no encontrado")
-
-    evolucion = await EvolucionService.obtener_evolucion(
-        id_usuario,
-        id_evolucion,
-        db
-    )
-    if evolucion is None:
+    version = await EvolucionService.version_evolucion(id_usuario, id_evolucion, db)
+    if version is None:
         raise HTTPException(status_code=404, detail=f"Evolución {id_evolucion} no encontrada para el paciente {id_usuario}")
-    return evolucion
+    etag = calcular_etag(version, request)
+    if (no_modificada := respuesta_no_modificada(request, response, etag)) is not None:
+        return no_modificada
+
+    # Vistas repetidas: el JSON sale armado de la cache, sin diagnostico, autores ni validacion
+    contenido = await EvolucionService.obtener_evolucion_serializada(id_usuario, id_evolucion, version, db)
+    return Response(content=contenido, media_type="application/json", headers={h: response.headers[h] for h in ("ETag", "Cache-Control")})
 
 @app.get("/pacientes/{id_usuario}/sots", summary="Listar SOTs de un paciente", tags=["SOT"])
 async def listar_sots(
     id_usuario: int,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     limit: int = 20,
     page: int = 1,
     fromDate: datetime = None,
     toDate: datetime = None,
     order: str = "desc",
+    cursor: str | None = None,
+    q: str | None = Query(None, min_length=2, description="Texto a buscar en motivo y observacion (resultados rankeados)"),
     _token_payload: dict = Depends((verify_role_is_in(["Psicologo", "Psiquiatra", "Coordinador", "Director"])))
 ) -> list[SotCompleta]:
     # Verificar que el paciente exista antes de listar SOTs
-    try:
-        paciente = await PacienteService.get_paciente_por_id(id_usuario, db)
-    except HTTPException:
-        # Propagar HTTPException lanzada por el servicio (por ejemplo 404)
-        raise
-    if paciente is None:
+    if not await PacienteService.existe_paciente(id_usuario, db):
         raise HTTPException(status_code=404, detail="Paciente no encontrado")
+    etag = calcular_etag(await SotService.version_sots(id_usuario, db), request)
+    if (no_modificada := respuesta_no_modificada(request, response, etag)) is not None:
+        return no_modificada
 
     sots = await SotService.listar_sots(
         id_usuario,
@@ -194,10 +299,78 @@ async def listar_sots(
         page,
         fromDate,
         toDate,
-        order
+        order,
+        cursor,
+        q
     )
+    # Cursor para pedir la pagina siguiente sin OFFSET (page se mantiene por compatibilidad)
+    siguiente = None if q else SotService.siguiente_cursor(sots, limit)
+    if siguiente:
+        response.headers["X-Next-Cursor"] = siguiente
     return sots
 
+# Tablero de actividad clinica: lee el rollup semanal, no recorre evolucion
+@app.get("/actividad/evoluciones", summary="Evoluciones por semana, profesional y tipo", tags=["Actividad"])
+async def actividad_evoluciones(
+    desde: date | None = None,
+    hasta: date | None = None,
+    id_profesional: int | None = None,
+    tipo: TipoEvolucion | None = None,
+    db: AsyncSession = Depends(get_db),
+    _token_payload: dict = Depends((verify_role_is_in(["Director", "Coordinador"])))
+) -> list[ActividadSemanal]:
+    return await ActividadService.listar_actividad(db, desde, hasta, id_profesional, tipo.value if tipo else None)
+
+# Analitica de diagnosticos multiaxiales (tambien como CLI: python -m services.diagnostico_analitica_service)
+@app.get("/diagnosticos/analitica", summary="Frecuencias, co-ocurrencias y cambios de items DM", tags=["DiagnosticoMultiaxial"])
+async def analitica_diagnosticos(
+    desde: datetime | None = None,
+    hasta: datetime | None = None,
+    top: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    _token_payload: dict = Depends((verify_role_is_in(["Director", "Coordinador"])))
+) -> AnaliticaDiagnosticos:
+    return await DiagnosticoAnaliticaService.analizar(db, desde, hasta, top)
+
+@app.get("/pacientes/{id_usuario}/diagnosticos/trayectoria", summary="Cambios del diagnostico de un paciente", tags=["DiagnosticoMultiaxial"])
+async def trayectoria_diagnostico(
+    id_usuario: int,
+    db: AsyncSession = Depends(get_db),
+    _token_payload: dict = Depends((verify_role_is_in(["Psicologo", "Psiquiatra", "Coordinador", "Director"])))
+) -> list[PasoDiagnostico]:
+    if not await PacienteService.existe_paciente(id_usuario, db):
+        raise HTTPException(status_code=404, detail="Paciente no encontrado")
+    return await DiagnosticoAnaliticaService.trayectoria_paciente(id_usuario, db)
+
+# Busqueda de texto en toda la clinica: Director y Coordinador ven todo, el resto solo lo que cargo
+ROLES_BUSQUEDA_CLINICA = ["Director", "Coordinador"]
+
+@app.get("/evoluciones/buscar", summary="Buscar evoluciones por texto en toda la clinica", tags=["Evoluciones"])
+async def buscar_evoluciones(
+    q: str = Query(..., min_length=2, description="Texto a buscar en las observaciones"),
+    limit: int = Query(20, ge=1, le=100),
+    page: int = Query(1, ge=1),
+    conteo: ModoConteo = ModoConteo.exacto,
+    db: AsyncSession = Depends(get_db),
+    _token_payload: dict = Depends((verify_role_is_in(["Psicologo", "Psiquiatra", "Coordinador", "Director"])))
+) -> ResultadoBusquedaEvoluciones:
+    creada_por = None if get_user_rol(_token_payload) in ROLES_BUSQUEDA_CLINICA else get_user_id_authless(_token_payload)
+    resultado = await EvolucionService.buscar_evoluciones(q, db, limit, page, creada_por, conteo)
+    return {**resultado, "limit": limit}
+
+@app.get("/sots/buscar", summary="Buscar SOTs por texto en toda la clinica", tags=["SOT"])
+async def buscar_sots(
+    q: str = Query(..., min_length=2, description="Texto a buscar en motivo y observacion"),
+    limit: int = Query(20, ge=1, le=100),
+    page: int = Query(1, ge=1),
+    conteo: ModoConteo = ModoConteo.exacto,
+    db: AsyncSession = Depends(get_db),
+    _token_payload: dict = Depends((verify_role_is_in(["Psicologo", "Psiquiatra", "Coordinador", "Director"])))
+) -> ResultadoBusquedaSots:
+    creado_por = None if get_user_rol(_token_payload) in ROLES_BUSQUEDA_CLINICA else get_user_id_authless(_token_payload)
+    resultado = await SotService.buscar_sots(q, db, limit, page, creado_por, conteo)
+    return {**resultado, "limit": limit}
+
 # Endpoints para foto de paciente
 from fastapi import Body
 
@@ -250,6 +423,14 @@ async def crear_evoluciones_grupales(
     resp = await EvolucionService.crear_evoluciones_grupales(input, db, get_user_id_authless(_token_payload))
     return resp
 
+@app.get("/evoluciones/grupal/{id_sesion_grupal}", summary="Obtener una sesion grupal con sus pacientes", tags=["Evoluciones"], response_model=SesionGrupalCompleta)
+async def obtener_sesion_grupal(
+    id_sesion_grupal: int,
+    db: AsyncSession = Depends(get_db),
+    _token_payload: dict = Depends(verify_role_is_in(["Psicologo", "Psiquiatra", "Coordinador", "Director"]))
+):
+    return await EvolucionService.obtener_sesion_grupal(id_sesion_grupal, db)
+
 @app.put("/pacientes/{id_usuario}/sots/{id_sot}", summary="Actualizar un SOT", tags=["SOT"], response_model=SotLeida)
 async def actualizar_sot(
     id_usuario: int,
@@ -259,31 +440,50 @@ async def actualizar_sot(
     _token_payload: dict = Depends((verify_role_is_in(["Psicologo", "Psiquiatra", "Director"])))
 ):
     # Verificar que el paciente exista antes de actualizar el SOT
-    try:
-        paciente = await PacienteService.get_paciente_por_id(id_usuario, db)
-    except HTTPException:
-        raise
-    if paciente is None:
+    if not await PacienteService.existe_paciente(id_usuario, db):
         raise HTTPException(status_code=404, detail="Paciente no encontrado")
     sot = await SotService.actualizar_sot(id_usuario, id_sot, input, db, get_user_id_authless(_token_payload))
     return sot
 
 # Endpoint GET para búsqueda de pacientes
-@app.get("/pacientes", summary="Buscar pacientes", tags=["Pacientes"])
+@app.get(
+    "/pacientes",
+    summary="Buscar pacientes",
+    description="Con `ids` (`?ids=3,1,2` o `?ids=3&ids=1`, hasta 500) no se busca: devuelve esos pacientes en el orden pedido "
+                "y los ids que no son pacientes en `faltantes`, igual que POST /pacientes/lookup. Los demas filtros se ignoran.",
+    tags=["Pacientes"]
+)
 async def buscar_pacientes(
     db: AsyncSession = Depends(get_db),
+    ids: list[str] | None = Query(None),
     #nombre: str | None = None,
     #apellido: str | None = None,
     nom_ap_dni: str | None = None,
     anio_ingreso_desde: int | None = None,
     anio_ingreso_hasta: int | None = None,
     genero: Genero | None = None,
+    activo: bool | None = None,
     limit: int = 20,
     page: int = 1,
     order: str = "asc",
     sort: str | None = None,
-    _token_payload: dict = Depends((verify_role_is_in(["Secretaria", "Psicologo", "Psiquiatra", "Coordinador", "Director"])))
-) -> ResultadoBusqueda:
+    conteo: ModoConteo = ModoConteo.exacto,
+    _token_payload: dict = Depends((verify_role_is_in(["Secretaria", "Psicologo", "Psiquiatra", "Coordinador", "Director", "Enfermera"])))
+) -> ResultadoBusqueda | PacientesConsultados:
+    if ids is not None:
+        try:
+            ids_usuario = [int(i) for valor in ids for i in valor.split(",") if i.strip()]
+        except ValueError:
+            raise HTTPException(status_code=422, detail="ids debe ser una lista de enteros")
+        if not 1 <= len(ids_usuario) <= 500:
+            raise HTTPException(status_code=422, detail="ids debe tener entre 1 y 500 elementos")
+        try:
+            return await PacienteService.consultar_pacientes(ids_usuario, db)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    # Enfermeria solo consulta pacientes puntuales (por ids), no busca
+    if get_user_rol(_token_payload) == "Enfermera":
+        raise HTTPException(status_code=403, detail="Acceso denegado. Enfermera solo puede consultar pacientes por ids")
     pacientes = await PacienteService.buscar_pacientes(
         db=db,
         #nombre=nombre,
@@ -292,10 +492,12 @@ async def buscar_pacientes(
         anio_ingreso_desde=anio_ingreso_desde,
         anio_ingreso_hasta=anio_ingreso_hasta,
         genero=genero,
+        activo=activo,
         limit=limit,
         page=page,
         order=order,
         sort=sort,
+        conteo=conteo,
     )
     return {**pacientes, "limit": limit}
 
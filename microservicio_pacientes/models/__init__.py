@@ -3,3 +3,7 @@ from .evolucion import Evolucion
 from .sot import Sot
 from .item_dm import ItemDM
 from .diagnostico_multiaxial import DiagnosticoMultiaxial
+from .sesion_grupal import SesionGrupal
+from .actividad_clinica import ActividadClinicaSemanal
+from .paciente_resumen import PacienteResumen
+from .usuario_replica import UsuarioReplica, UsuarioReplicaFeed
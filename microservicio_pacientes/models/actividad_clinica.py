@@ -0,0 +1,25 @@
+from sqlalchemy import Date, Integer, String, CheckConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from core.database import Base
+from datetime import date
+
+class ActividadClinicaSemanal(Base):
+    # Rollup de evoluciones por semana (lunes), profesional y tipo. Se actualiza en la misma
+    # transaccion que cada alta o marcada erronea, asi los tableros no recorren toda la tabla evolucion
+    __tablename__ = "actividad_clinica_semanal"
+
+    semana: Mapped[date] = mapped_column(Date, primary_key=True)
+    id_profesional: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tipo: Mapped[str] = mapped_column(String, primary_key=True)
+    evoluciones: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    erroneas: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        CheckConstraint(
+            "tipo IN ('individual', 'grupal')",
+            name="check_tipo_actividad"
+        ),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ActividadClinicaSemanal(semana={self.semana}, id_profesional={self.id_profesional}, tipo='{self.tipo}')>"
@@ -15,6 +15,8 @@ class DiagnosticoMultiaxial(Base):
     id_item5: Mapped[str] = mapped_column(String(50), ForeignKey("item_dm.id_item"), nullable=False)
     creado_por: Mapped[int] = mapped_column(Integer, nullable=False)
     fecha_creacion: Mapped[datetime] = mapped_column(TIMESTAMP, server_default=func.now(), nullable=False)
+    # sha256 de (id_item1..5, creado_por); solo lo completan los diagnosticos creados con DM_DEDUPLICAR
+    hash_contenido: Mapped[Optional[str]] = mapped_column(String(64), unique=True, nullable=True)
     evolucion: Mapped[list["Evolucion"]] = relationship(back_populates="diagnostico")
     item_uno: Mapped["ItemDM"] = relationship(
         back_populates="diagnostico_uno",
@@ -1,4 +1,5 @@
 from sqlalchemy import String, Integer, Boolean, Text, TIMESTAMP, ForeignKey, CheckConstraint, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from core.database import Base
 from datetime import datetime
@@ -9,7 +10,8 @@ class Evolucion(Base):
     id_evolucion: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     #dni_paciente: Mapped[str] = mapped_column(String(20), ForeignKey("paciente.dni"), nullable=False)
     id_usuario: Mapped[int] = mapped_column(Integer, ForeignKey("paciente.id_usuario"), nullable=False)
-    observacion: Mapped[str] = mapped_column(Text, nullable=False)
+    # En las evoluciones grupales la observacion vive en sesion_grupal (queda en NULL aca)
+    observacion: Mapped[str | None] = mapped_column(Text, nullable=True)
     id_turno: Mapped[int | None] = mapped_column(Integer, nullable=True)
     tipo: Mapped[str] = mapped_column(String, nullable=False)
     marcada_erronea: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
@@ -19,12 +21,18 @@ class Evolucion(Base):
     creada_por: Mapped[int] = mapped_column(Integer, nullable=False)
     fecha_creacion: Mapped[datetime] = mapped_column(TIMESTAMP, server_default=func.now(), nullable=False)
     id_diagnostico_multiaxial: Mapped[int | None] = mapped_column(Integer, ForeignKey("diagnostico_multiaxial.id_diagnostico_multiaxial"), nullable=True)
+    id_sesion_grupal: Mapped[int | None] = mapped_column(Integer, ForeignKey("sesion_grupal.id_sesion_grupal"), nullable=True)
+    # Vector de busqueda de texto completo; lo mantiene un trigger (migracion 6). deferred: no se trae en cada SELECT
+    busqueda_ts: Mapped[str | None] = mapped_column(TSVECTOR, deferred=True)
     paciente: Mapped['Paciente'] = relationship(
         back_populates="evolucion"
     )
     diagnostico: Mapped['DiagnosticoMultiaxial'] = relationship(
         back_populates="evolucion"
     )
+    sesion_grupal: Mapped['SesionGrupal'] = relationship(
+        back_populates="evoluciones"
+    )
 
     __table_args__ = (
         CheckConstraint(
@@ -1,4 +1,4 @@
-from sqlalchemy import String, Boolean, Date, TIMESTAMP, func
+from sqlalchemy import String, Boolean, Date, Text, TIMESTAMP, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from core.database import Base
 from datetime import datetime, date
@@ -27,9 +27,20 @@ class Paciente(Base):
     # Perfil
     #foto_url: Mapped[str | None] = mapped_column(String(255))
 
+    # Nombre, apellido y DNI normalizados (sin acentos, en minuscula) para la busqueda por trigramas;
+    # la completa el trigger paciente_busqueda (migracion 2)
+    busqueda: Mapped[str | None] = mapped_column(Text)
+
     evolucion: Mapped[list['Evolucion']] = relationship(
         back_populates="paciente"
     )
+    # Se trae con un LEFT JOIN en la misma consulta del paciente (listados sin subconsultas por fila)
+    resumen: Mapped['PacienteResumen'] = relationship(lazy="joined", uselist=False, viewonly=True)
+    # Contacto y baja desde la copia local de usuarios (sin FK: la fila puede llegar antes o despues que el paciente)
+    usuario: Mapped['UsuarioReplica'] = relationship(
+        primaryjoin="Paciente.id_usuario == foreign(UsuarioReplica.id_usuario)",
+        lazy="joined", uselist=False, viewonly=True
+    )
 
     def __repr__(self) -> str:
         return f"<Paciente(dni='{self.dni}', nombre='{self.nombre}', apellido='{self.apellido}')>"
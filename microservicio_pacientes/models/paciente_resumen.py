@@ -0,0 +1,22 @@
+from sqlalchemy import Integer, TIMESTAMP, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from core.database import Base
+from datetime import datetime
+
+class PacienteResumen(Base):
+    # Resumen clinico de cada paciente para listados y la ficha. Se recalcula desde evolucion/sot en la
+    # misma transaccion que las altas de evoluciones/SOTs y las marcadas erroneas (ver PacienteResumenService)
+    __tablename__ = "paciente_resumen"
+
+    id_usuario: Mapped[int] = mapped_column(Integer, ForeignKey("paciente.id_usuario", ondelete="CASCADE"), primary_key=True)
+    # Solo evoluciones no erroneas
+    cantidad_evoluciones: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    fecha_ultima_evolucion: Mapped[datetime | None] = mapped_column(TIMESTAMP, nullable=True)
+    id_ultimo_diagnostico_multiaxial: Mapped[int | None] = mapped_column(Integer, ForeignKey("diagnostico_multiaxial.id_diagnostico_multiaxial"), nullable=True)
+    fecha_ultimo_diagnostico: Mapped[datetime | None] = mapped_column(TIMESTAMP, nullable=True)
+    # Todas las SOTs: no tienen estado abierta/cerrada
+    cantidad_sots: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    fecha_ultima_sot: Mapped[datetime | None] = mapped_column(TIMESTAMP, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<PacienteResumen(id_usuario={self.id_usuario}, cantidad_evoluciones={self.cantidad_evoluciones})>"
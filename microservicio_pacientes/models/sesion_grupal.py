@@ -0,0 +1,23 @@
+from sqlalchemy import Integer, Text, TIMESTAMP, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from core.database import Base
+from datetime import datetime
+
+class SesionGrupal(Base):
+    # Una sesion grupal guarda la observacion una sola vez; cada paciente queda ligado
+    # por una fila de evolucion (tipo 'grupal') que apunta aca y no repite el texto
+    __tablename__ = "sesion_grupal"
+
+    id_sesion_grupal: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    observacion: Mapped[str] = mapped_column(Text, nullable=False)
+    creada_por: Mapped[int] = mapped_column(Integer, nullable=False)
+    fecha_creacion: Mapped[datetime] = mapped_column(TIMESTAMP, server_default=func.now(), nullable=False)
+    # Busqueda de texto sobre la observacion compartida (ver Evolucion.busqueda_ts)
+    busqueda_ts: Mapped[str | None] = mapped_column(TSVECTOR, deferred=True)
+    evoluciones: Mapped[list['Evolucion']] = relationship(
+        back_populates="sesion_grupal"
+    )
+
+    def __repr__(self) -> str:
+        return f"<SesionGrupal(id_sesion_grupal={self.id_sesion_grupal}, creada_por={self.creada_por})>"
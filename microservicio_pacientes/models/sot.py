@@ -1,4 +1,5 @@
 from sqlalchemy import String, Date, Time, Text, Integer, ForeignKey, TIMESTAMP, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column
 from core.database import Base
 from datetime import date, time, datetime
@@ -19,6 +20,8 @@ class Sot(Base):
     modificado_por: Mapped[int | None] = mapped_column(Integer, nullable=True)
     fecha_modificacion: Mapped[datetime | None] = mapped_column(TIMESTAMP, nullable=True)
     modificado: Mapped[bool] = mapped_column(Integer, default=0, nullable=False)
+    # El motivo pesa mas que la observacion al rankear resultados
+    busqueda_ts: Mapped[str | None] = mapped_column(TSVECTOR, deferred=True)
 
     def __repr__(self) -> str:
         return f"<Sot(id_sot={self.id_sot}, dni_paciente='{self.dni_paciente}', fecha='{self.fecha}')>"
@@ -0,0 +1,41 @@
+from sqlalchemy import Integer, BigInteger, String, Text, TIMESTAMP, func
+from sqlalchemy.orm import Mapped, mapped_column
+from core.database import Base
+from datetime import datetime
+
+class UsuarioReplica(Base):
+    # Copia local (eventualmente consistente) de los datos de usuario que necesitan las lecturas de
+    # pacientes: contacto, alta, baja y ultima edicion. Se llena desde el feed de cambios del MS de
+    # usuarios y, en el momento, desde las escrituras que hace este MS (ver UsuarioReplicaService)
+    __tablename__ = "usuario_replica"
+
+    id_usuario: Mapped[int] = mapped_column(Integer, primary_key=True)
+    email: Mapped[str | None] = mapped_column(String(100))
+    telefono: Mapped[str | None] = mapped_column(String(20))
+    fecha_alta: Mapped[datetime | None] = mapped_column(TIMESTAMP)
+    alta_por: Mapped[int | None] = mapped_column(Integer)
+    fecha_baja: Mapped[datetime | None] = mapped_column(TIMESTAMP)
+    baja_por: Mapped[int | None] = mapped_column(Integer)
+    motivo_baja: Mapped[str | None] = mapped_column(Text)
+    fecha_edicion: Mapped[datetime | None] = mapped_column(TIMESTAMP)
+    edicion_por: Mapped[int | None] = mapped_column(Integer)
+    # Version del feed de usuarios (transaccion del ultimo cambio); None si solo se escribio desde aca
+    version: Mapped[int | None] = mapped_column(BigInteger, index=True)
+    sincronizado: Mapped[datetime] = mapped_column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self) -> str:
+        return f"<UsuarioReplica(id_usuario={self.id_usuario}, version={self.version})>"
+
+class UsuarioReplicaFeed(Base):
+    # Posicion en el feed de cambios de usuarios: una sola fila (id = 1). Se guarda aparte para que el
+    # cursor avance por todo lo leido, no solo por las filas que terminaron en usuario_replica
+    __tablename__ = "usuario_replica_feed"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    id_usuario: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Fin de la ultima sincronizacion completa (el feed quedo vacio); lo comparten todos los procesos
+    sincronizado: Mapped[datetime | None] = mapped_column(TIMESTAMP)
+
+    def __repr__(self) -> str:
+        return f"<UsuarioReplicaFeed(version={self.version}, id_usuario={self.id_usuario})>"
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from datetime import date
+from schemas.evolucion_schema import TipoEvolucion
+
+class ActividadSemanal(BaseModel):
+    semana: date  # lunes de la semana
+    id_profesional: int
+    tipo: TipoEvolucion
+    evoluciones: int
+    erroneas: int
+    tasa_erroneas: float
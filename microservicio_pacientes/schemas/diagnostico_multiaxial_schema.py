@@ -36,3 +36,50 @@ class DiagnosticoMultiaxialCompleto(BaseModel):
     item_5: ItemDMBase
 
 
+# Analitica de diagnosticos multiaxiales
+
+class FrecuenciaItem(BaseModel):
+    id_item: str
+    descripcion: str
+    cantidad: int
+    proporcion: float
+
+class FrecuenciasEje(BaseModel):
+    eje: int
+    total: int
+    items: list[FrecuenciaItem]
+
+class CoocurrenciaItems(BaseModel):
+    # Cantidad de diagnosticos que tienen a la vez item_a en eje_a e item_b en eje_b
+    eje_a: int
+    id_item_a: str
+    eje_b: int
+    id_item_b: str
+    cantidad: int
+
+class TransicionItem(BaseModel):
+    desde: str
+    hacia: str
+    cantidad: int
+
+class CambiosEje(BaseModel):
+    # Entre diagnosticos sucesivos de un mismo paciente
+    eje: int
+    cambios: int
+    transiciones: list[TransicionItem]
+
+class AnaliticaDiagnosticos(BaseModel):
+    diagnosticos: int
+    desconocidos: int  # diagnosticos con algun item fuera del catalogo, no se cuentan
+    pacientes: int
+    frecuencias: list[FrecuenciasEje]
+    coocurrencias: list[CoocurrenciaItems]
+    cambios: list[CambiosEje]
+    segundos: float
+
+class PasoDiagnostico(BaseModel):
+    id_evolucion: int
+    id_diagnostico_multiaxial: int
+    fecha: datetime
+    items: list[str]  # id_item de los ejes 1 a 5
+    ejes_cambiados: list[int]  # respecto del diagnostico anterior del paciente
@@ -32,6 +32,7 @@ class EvolucionLeida(EvolucionBase):
     motivo_erronea: str | None = None
     marcada_erronea_por: int | None = None
     id_diagnostico_multiaxial: int | None = None
+    id_sesion_grupal: int | None = None
 
     class Config:
         from_attributes = True
@@ -54,10 +55,17 @@ class EvolucionCompleta(BaseModel):
     tipo: TipoEvolucion
     observacion: str
     id_turno: int | None = None
+    id_sesion_grupal: int | None = None
     diagnostico: DiagnosticoMultiaxialCompleto | None
     creacion: DatosCreacion
     erronea: DatosErronea | None = None
 
+class ResultadoBusquedaEvoluciones(BaseModel):
+    evoluciones: list[EvolucionCompleta]
+    total: int | None = None
+    limit: int
+    hay_mas: bool = False
+
 class EvolucionMarcarErronea(BaseModel):
     motivo_erronea: str | None = None
     # marcada_erronea_por: int Lo llena el backend segun el usuario logueado
@@ -80,5 +88,18 @@ class EvolucionGrupalFallida(BaseModel):
 
 
 class EvolucionGrupalRespuesta(BaseModel):
+    id_sesion_grupal: int | None = None  # None si no se pudo crear ninguna
     creadas: list[EvolucionLeida]
-    fallidas: list[EvolucionGrupalFallida]
\ No newline at end of file
+    fallidas: list[EvolucionGrupalFallida]
+
+
+class IntegranteSesionGrupal(BaseModel):
+    id_usuario: int
+    id_evolucion: int
+    marcada_erronea: bool
+
+class SesionGrupalCompleta(BaseModel):
+    id_sesion_grupal: int
+    observacion: str
+    creacion: DatosCreacion
+    integrantes: list[IntegranteSesionGrupal]
\ No newline at end of file
@@ -1,7 +1,7 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from enum import Enum
 from datetime import date, datetime
-from typing import Union
+from typing import Union, Annotated
 
 class Genero(Enum):
     MUJER = "mujer"
@@ -36,6 +36,17 @@ class Edicion(BaseModel):
     fecha: datetime | None = None
     id_usuario: int | None = None
 
+class ResumenClinico(BaseModel):
+    cantidad_evoluciones: int = 0
+    fecha_ultima_evolucion: datetime | None = None
+    id_ultimo_diagnostico_multiaxial: int | None = None
+    fecha_ultimo_diagnostico: datetime | None = None
+    cantidad_sots: int = 0  # todas las SOTs del paciente: las SOT no tienen estado abierta/cerrada
+    fecha_ultima_sot: datetime | None = None
+
+    class Config:
+        from_attributes = True
+
 class UnPacienteUsuario(BaseModel):
     id_usuario: int
     dni: str
@@ -52,6 +63,7 @@ class UnPacienteUsuario(BaseModel):
     alta: Alta
     baja: Baja | None = None
     edicion: Edicion | None = None
+    resumen: ResumenClinico | None = None  # None si todavia no tiene evoluciones ni SOTs
 
 class UnPaciente(BaseModel):
     id_usuario: int
@@ -63,11 +75,20 @@ class UnPaciente(BaseModel):
     fecha_nacimiento: date | None = None
     fecha_ingreso: date | None = None
     domicilio: str | None = None
+    resumen: ResumenClinico | None = None
+
+class ConsultarPacientes(BaseModel):
+    ids_usuario: Annotated[list[int], Field(min_length=1, max_length=500)]
+
+class PacientesConsultados(BaseModel):
+    pacientes: list[UnPacienteUsuario]  # en el orden pedido
+    faltantes: list[int]  # ids pedidos que no son pacientes
 
 class ResultadoBusqueda(BaseModel):
     pacientes: list[UnPaciente]
-    total: int
+    total: int | None = None  # None cuando se pidio conteo=hay_mas
     limit: int
+    hay_mas: bool = False
 
 class PacienteEditar(BaseModel):
     nombre: str | None = None
@@ -82,3 +103,16 @@ class PacienteEditar(BaseModel):
 
 class PacienteBaja(BaseModel):
     motivo: str
+
+class FilaImportada(BaseModel):
+    fila: int  # numero de fila del archivo (la primera de datos es 1)
+    dni: str | None = None
+    id_usuario: int | None = None
+    error: str | None = None
+
+class ResultadoImportacion(BaseModel):
+    total: int
+    creados: int
+    fallidos: int
+    segundos: float
+    filas: list[FilaImportada]
@@ -54,3 +54,9 @@ class SotCompleta(SotBase):
     hora: time
     creacion: DatosCreacion
     modificacion: DatosModificacion | None = None
+
+class ResultadoBusquedaSots(BaseModel):
+    sots: list[SotCompleta]
+    total: int | None = None
+    limit: int
+    hay_mas: bool = False
@@ -0,0 +1,72 @@
+from models.actividad_clinica import ActividadClinicaSemanal
+from schemas.actividad_schema import ActividadSemanal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import Date, cast, func
+from datetime import date, datetime
+
+class ActividadService:
+
+    @staticmethod
+    async def registrar(
+        db: AsyncSession,
+        id_profesional: int,
+        tipo: str,
+        fecha: datetime | None = None,
+        evoluciones: int = 0,
+        erroneas: int = 0
+    ):
+        """
+        Suma al bucket semanal del profesional. No hace commit: se llama dentro de la transaccion
+        de la escritura que lo origina, asi el rollup nunca queda desfasado de evolucion.
+        Sin fecha se usa now(), que es la misma que toma el server_default de fecha_creacion.
+        """
+        semana = cast(func.date_trunc("week", fecha if fecha is not None else func.now()), Date)
+        stmt = insert(ActividadClinicaSemanal).values(
+            semana=semana,
+            id_profesional=id_profesional,
+            tipo=tipo,
+            evoluciones=evoluciones,
+            erroneas=erroneas
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ActividadClinicaSemanal.semana, ActividadClinicaSemanal.id_profesional, ActividadClinicaSemanal.tipo],
+            set_={
+                "evoluciones": ActividadClinicaSemanal.evoluciones + stmt.excluded.evoluciones,
+                "erroneas": ActividadClinicaSemanal.erroneas + stmt.excluded.erroneas
+            }
+        )
+        await db.execute(stmt)
+
+    @staticmethod
+    async def listar_actividad(
+        db: AsyncSession,
+        desde: date | None = None,
+        hasta: date | None = None,
+        id_profesional: int | None = None,
+        tipo: str | None = None
+    ) -> list[ActividadSemanal]:
+        query = select(ActividadClinicaSemanal)
+        if desde:
+            # Se incluye la semana que contiene a "desde"
+            query = query.where(ActividadClinicaSemanal.semana >= cast(func.date_trunc("week", desde), Date))
+        if hasta:
+            query = query.where(ActividadClinicaSemanal.semana <= hasta)
+        if id_profesional is not None:
+            query = query.where(ActividadClinicaSemanal.id_profesional == id_profesional)
+        if tipo:
+            query = query.where(ActividadClinicaSemanal.tipo == tipo)
+        query = query.order_by(ActividadClinicaSemanal.semana, ActividadClinicaSemanal.id_profesional, ActividadClinicaSemanal.tipo)
+        result = await db.execute(query)
+        return [
+            ActividadSemanal(
+                semana=a.semana,
+                id_profesional=a.id_profesional,
+                tipo=a.tipo,
+                evoluciones=a.evoluciones,
+                erroneas=a.erroneas,
+                tasa_erroneas=a.erroneas / a.evoluciones if a.evoluciones else 0.0
+            )
+            for a in result.scalars().all()
+        ]
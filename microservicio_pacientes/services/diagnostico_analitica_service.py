@@ -0,0 +1,233 @@
+from models.diagnostico_multiaxial import DiagnosticoMultiaxial
+from models.evolucion import Evolucion
+from services.item_dm_service import ItemDMService
+from schemas.diagnostico_multiaxial_schema import (
+    AnaliticaDiagnosticos, FrecuenciasEje, FrecuenciaItem, CoocurrenciaItems, CambiosEje, TransicionItem, PasoDiagnostico
+)
+from core.database import async_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from datetime import datetime
+import numpy as np
+import asyncio
+import json
+import os
+import time
+
+# ============================================================
+# ANALITICA DE DIAGNOSTICOS MULTIAXIALES
+# ============================================================
+# Las cinco columnas de items se leen por bloques con un cursor del servidor y cada bloque se pasa
+# a codigos enteros por eje (searchsorted contra el catalogo ordenado). Frecuencias, co-ocurrencias
+# y transiciones salen de np.bincount sobre esos codigos: no hay bucles de Python por fila.
+
+EJES = 5
+ANALITICA_DM_LOTE = int(os.getenv("ANALITICA_DM_LOTE", "20000"))
+COLUMNAS_ITEMS = [DiagnosticoMultiaxial.id_item1, DiagnosticoMultiaxial.id_item2, DiagnosticoMultiaxial.id_item3,
+                  DiagnosticoMultiaxial.id_item4, DiagnosticoMultiaxial.id_item5]
+
+def codificar(columna, vocabulario: np.ndarray) -> np.ndarray:
+    """Pasa una columna de id_item a su posicion en el vocabulario ordenado del eje; -1 si no esta."""
+    columna = np.asarray(columna, dtype=str)
+    if len(vocabulario) == 0:
+        return np.full(len(columna), -1, dtype=np.int64)
+    posiciones = np.minimum(np.searchsorted(vocabulario, columna), len(vocabulario) - 1)
+    return np.where(vocabulario[posiciones] == columna, posiciones, -1)
+
+class AcumuladorDiagnosticos:
+    """Cuentas acumuladas bloque a bloque; la memoria depende del catalogo, no de la tabla."""
+
+    def __init__(self, vocabularios: list[np.ndarray]):
+        self.vocabularios = vocabularios
+        self.tamanios = [len(v) for v in vocabularios]
+        self.diagnosticos = 0
+        self.desconocidos = 0
+        self.frecuencias = [np.zeros(n, dtype=np.int64) for n in self.tamanios]
+        # Matriz de co-ocurrencia de cada par de ejes, aplanada (fila * columnas + columna)
+        self.coocurrencias = {
+            (a, b): np.zeros(self.tamanios[a] * self.tamanios[b], dtype=np.int64)
+            for a in range(EJES) for b in range(a + 1, EJES)
+        }
+        self.pacientes = 0
+        self.cambios = np.zeros(EJES, dtype=np.int64)
+        self.transiciones = [np.zeros(n * n, dtype=np.int64) for n in self.tamanios]
+        # Ultima fila del bloque anterior, para no perder el cambio que cae justo en el corte
+        self._previo: tuple[np.ndarray, np.ndarray] | None = None
+
+    def codificar_bloque(self, columnas) -> np.ndarray:
+        return np.stack([codificar(columnas[k], self.vocabularios[k]) for k in range(EJES)], axis=1)
+
+    def acumular_diagnosticos(self, codigos: np.ndarray):
+        validos = (codigos >= 0).all(axis=1)
+        self.diagnosticos += len(codigos)
+        self.desconocidos += int((~validos).sum())
+        codigos = codigos[validos]
+        for k in range(EJES):
+            self.frecuencias[k] += np.bincount(codigos[:, k], minlength=self.tamanios[k])
+        for (a, b), matriz in self.coocurrencias.items():
+            matriz += np.bincount(codigos[:, a] * self.tamanios[b] + codigos[:, b], minlength=len(matriz))
+
+    def acumular_sucesiones(self, usuarios: np.ndarray, codigos: np.ndarray):
+        """Filas ordenadas por paciente y fecha; compara cada diagnostico con el anterior del mismo paciente."""
+        if self._previo is None:
+            self.pacientes += 1 if len(usuarios) else 0
+        else:
+            usuarios = np.concatenate([self._previo[0], usuarios])
+            codigos = np.concatenate([self._previo[1], codigos])
+        mismo_paciente = usuarios[1:] == usuarios[:-1]
+        self.pacientes += int((~mismo_paciente).sum())
+        anteriores, siguientes = codigos[:-1], codigos[1:]
+        for k in range(EJES):
+            a, b = anteriores[:, k], siguientes[:, k]
+            cambio = mismo_paciente & (a != b) & (a >= 0) & (b >= 0)
+            self.cambios[k] += int(cambio.sum())
+            self.transiciones[k] += np.bincount(a[cambio] * self.tamanios[k] + b[cambio], minlength=len(self.transiciones[k]))
+        if len(usuarios):
+            self._previo = (usuarios[-1:], codigos[-1:])
+
+    def resultado(self, top: int, segundos: float) -> AnaliticaDiagnosticos:
+        catalogo = ItemDMService.catalogo
+        frecuencias = []
+        for k in range(EJES):
+            total = int(self.frecuencias[k].sum())
+            orden = np.argsort(-self.frecuencias[k], kind="stable")
+            frecuencias.append(FrecuenciasEje(eje=k + 1, total=total, items=[
+                FrecuenciaItem(
+                    id_item=str(self.vocabularios[k][i]),
+                    descripcion=catalogo[str(self.vocabularios[k][i])].descripcion,
+                    cantidad=int(self.frecuencias[k][i]),
+                    proporcion=float(self.frecuencias[k][i] / total) if total else 0.0
+                )
+                for i in orden
+            ]))
+
+        # Los top pares con mas co-ocurrencias entre todas las matrices
+        pares = []
+        for (a, b), matriz in self.coocurrencias.items():
+            no_nulos = np.flatnonzero(matriz)
+            pares += [(int(matriz[i]), a, b, i) for i in no_nulos[np.argsort(-matriz[no_nulos], kind="stable")[:top]]]
+        pares.sort(key=lambda p: -p[0])
+        coocurrencias = [
+            CoocurrenciaItems(
+                eje_a=a + 1, id_item_a=str(self.vocabularios[a][i // self.tamanios[b]]),
+                eje_b=b + 1, id_item_b=str(self.vocabularios[b][i % self.tamanios[b]]),
+                cantidad=cantidad
+            )
+            for cantidad, a, b, i in pares[:top]
+        ]
+
+        cambios = []
+        for k in range(EJES):
+            matriz = self.transiciones[k]
+            no_nulos = np.flatnonzero(matriz)
+            no_nulos = no_nulos[np.argsort(-matriz[no_nulos], kind="stable")[:top]]
+            cambios.append(CambiosEje(eje=k + 1, cambios=int(self.cambios[k]), transiciones=[
+                TransicionItem(
+                    desde=str(self.vocabularios[k][i // self.tamanios[k]]),
+                    hacia=str(self.vocabularios[k][i % self.tamanios[k]]),
+                    cantidad=int(matriz[i])
+                )
+                for i in no_nulos
+            ]))
+
+        return AnaliticaDiagnosticos(
+            diagnosticos=self.diagnosticos,
+            desconocidos=self.desconocidos,
+            pacientes=self.pacientes,
+            frecuencias=frecuencias,
+            coocurrencias=coocurrencias,
+            cambios=cambios,
+            segundos=round(segundos, 3)
+        )
+
+
+class DiagnosticoAnaliticaService:
+
+    @staticmethod
+    def vocabularios() -> list[np.ndarray]:
+        return [
+            np.array(sorted(i.id_item for i in ItemDMService.catalogo.values() if i.eje == eje), dtype=str)
+            for eje in range(1, EJES + 1)
+        ]
+
+    @staticmethod
+    async def analizar(
+        db: AsyncSession,
+        desde: datetime | None = None,
+        hasta: datetime | None = None,
+        top: int = 20,
+        lote: int = ANALITICA_DM_LOTE
+    ) -> AnaliticaDiagnosticos:
+        inicio = time.monotonic()
+        await ItemDMService.refrescar_catalogo(db)
+        acumulador = AcumuladorDiagnosticos(DiagnosticoAnaliticaService.vocabularios())
+
+        def filtrar(query, fecha):
+            if desde:
+                query = query.where(fecha >= desde)
+            if hasta:
+                query = query.where(fecha <= hasta)
+            return query.execution_options(yield_per=lote)
+
+        # Frecuencias y co-ocurrencias: cada diagnostico una vez, por su fecha de creacion
+        result = await db.stream(filtrar(select(*COLUMNAS_ITEMS), DiagnosticoMultiaxial.fecha_creacion))
+        async for bloque in result.partitions():
+            acumulador.acumular_diagnosticos(acumulador.codificar_bloque(list(zip(*bloque))))
+
+        # Cambios: diagnosticos de cada paciente en el orden de sus evoluciones (las erroneas no cuentan).
+        # El rango va sobre la fecha de la evolucion: con DM_DEDUPLICAR un diagnostico reutilizado
+        # conserva la fecha de cuando se creo por primera vez
+        query = (
+            select(Evolucion.id_usuario, *COLUMNAS_ITEMS)
+            .join(DiagnosticoMultiaxial, Evolucion.id_diagnostico_multiaxial == DiagnosticoMultiaxial.id_diagnostico_multiaxial)
+            .where(Evolucion.marcada_erronea == False)
+            .order_by(Evolucion.id_usuario, Evolucion.fecha_creacion, Evolucion.id_evolucion)
+        )
+        result = await db.stream(filtrar(query, Evolucion.fecha_creacion))
+        async for bloque in result.partitions():
+            columnas = list(zip(*bloque))
+            acumulador.acumular_sucesiones(np.asarray(columnas[0], dtype=np.int64), acumulador.codificar_bloque(columnas[1:]))
+
+        return acumulador.resultado(top, time.monotonic() - inicio)
+
+    @staticmethod
+    async def trayectoria_paciente(id_usuario: int, db: AsyncSession) -> list[PasoDiagnostico]:
+        query = (
+            select(Evolucion.id_evolucion, Evolucion.fecha_creacion, DiagnosticoMultiaxial.id_diagnostico_multiaxial, *COLUMNAS_ITEMS)
+            .join(DiagnosticoMultiaxial, Evolucion.id_diagnostico_multiaxial == DiagnosticoMultiaxial.id_diagnostico_multiaxial)
+            .where(Evolucion.id_usuario == id_usuario, Evolucion.marcada_erronea == False)
+            .order_by(Evolucion.fecha_creacion, Evolucion.id_evolucion)
+        )
+        filas = (await db.execute(query)).all()
+        if not filas:
+            return []
+        items = np.array([fila[3:] for fila in filas], dtype=str)
+        # Fila i: ejes que cambiaron respecto de la fila i-1 (la primera no tiene anterior)
+        cambiados = np.vstack([np.zeros((1, EJES), dtype=bool), items[1:] != items[:-1]])
+        return [
+            PasoDiagnostico(
+                id_evolucion=fila.id_evolucion,
+                id_diagnostico_multiaxial=fila.id_diagnostico_multiaxial,
+                fecha=fila.fecha_creacion,
+                items=list(fila[3:]),
+                ejes_cambiados=(np.flatnonzero(cambio) + 1).tolist()
+            )
+            for fila, cambio in zip(filas, cambiados)
+        ]
+
+
+if __name__ == "__main__":
+    # python -m services.diagnostico_analitica_service [--desde 2025-01-01] [--hasta 2025-12-31] [--top 20]
+    import argparse
+    parser = argparse.ArgumentParser(description="Frecuencias, co-ocurrencias y cambios de items de diagnosticos multiaxiales")
+    parser.add_argument("--desde", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--hasta", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--lote", type=int, default=ANALITICA_DM_LOTE)
+    args = parser.parse_args()
+
+    async def main():
+        async with async_session() as db:
+            return await DiagnosticoAnaliticaService.analizar(db, args.desde, args.hasta, args.top, args.lote)
+
+    print(json.dumps(asyncio.run(main()).model_dump(mode="json"), indent=2, ensure_ascii=False))
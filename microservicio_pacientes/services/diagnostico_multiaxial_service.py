@@ -1,11 +1,24 @@
 from models.diagnostico_multiaxial import DiagnosticoMultiaxial
-from models.item_dm import ItemDM
+from services.item_dm_service import ItemDMService
 from schemas.diagnostico_multiaxial_schema import DiagnosticoMultiaxialCrear, DiagnosticoMultiaxialLeida
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
 from datetime import datetime
+import hashlib
+import os
+
+# Con dedup, un diagnostico con los mismos cinco items y el mismo autor que uno existente reutiliza
+# esa fila en vez de insertar otra: la tabla crece con los diagnosticos distintos, no con las evoluciones
+DM_DEDUPLICAR = os.getenv("DM_DEDUPLICAR", "false").lower() == "true"
 
 class DiagnosticoMultiaxialService:
+    @staticmethod
+    def hash_contenido(input: DiagnosticoMultiaxialCrear) -> str:
+        # Debe coincidir con el concat_ws('|', ...) de la migracion 9
+        partes = [input.id_item1, input.id_item2, input.id_item3, input.id_item4, input.id_item5, str(input.creado_por)]
+        return hashlib.sha256("|".join(partes).encode("utf-8")).hexdigest()
+
     @staticmethod
     async def listar_diagnosticos(db: AsyncSession):
         result = await db.execute(select(DiagnosticoMultiaxial))
@@ -24,8 +37,8 @@ class DiagnosticoMultiaxialService:
         ]
         
         for id_item, eje_esperado in items_ids:
-            result = await db.execute(select(ItemDM).where(ItemDM.id_item == id_item))
-            item = result.scalar_one_or_none()
+            # Se valida contra el catalogo en memoria, sin ir a la BD
+            item = await ItemDMService.obtener_item(id_item, db)
             
             if not item:
                 raise ValueError(f"El item '{id_item}' no existe en la base de datos")
@@ -33,6 +46,9 @@ class DiagnosticoMultiaxialService:
             if item.eje != eje_esperado:
                 raise ValueError(f"El item '{id_item}' pertenece al eje {item.eje}, pero se esperaba el eje {eje_esperado}")
         
+        if DM_DEDUPLICAR:
+            return await DiagnosticoMultiaxialService.obtener_o_crear(input, db)
+
         diagnostico = DiagnosticoMultiaxial(
             **input.model_dump(),
             fecha_creacion=datetime.utcnow()
@@ -42,4 +58,27 @@ class DiagnosticoMultiaxialService:
         await db.refresh(diagnostico)
         # return DiagnosticoMultiaxialLeida.from_orm(diagnostico)
         #devolvemos el id
-        return diagnostico.id_diagnostico_multiaxial
\ No newline at end of file
+        return diagnostico.id_diagnostico_multiaxial
+
+    @staticmethod
+    async def obtener_o_crear(input: DiagnosticoMultiaxialCrear, db: AsyncSession) -> int:
+        hash_contenido = DiagnosticoMultiaxialService.hash_contenido(input)
+        # Caso comun (se repite el diagnostico anterior): una lectura por el indice unico y nada mas
+        id_existente = await db.scalar(
+            select(DiagnosticoMultiaxial.id_diagnostico_multiaxial).where(DiagnosticoMultiaxial.hash_contenido == hash_contenido)
+        )
+        if id_existente is not None:
+            return id_existente
+        # Si otra transaccion lo inserta entre la lectura y este insert, el conflicto se resuelve releyendo
+        id_nuevo = await db.scalar(
+            insert(DiagnosticoMultiaxial)
+            .values(**input.model_dump(), fecha_creacion=datetime.utcnow(), hash_contenido=hash_contenido)
+            .on_conflict_do_nothing(index_elements=[DiagnosticoMultiaxial.hash_contenido])
+            .returning(DiagnosticoMultiaxial.id_diagnostico_multiaxial)
+        )
+        await db.commit()
+        if id_nuevo is None:
+            id_nuevo = await db.scalar(
+                select(DiagnosticoMultiaxial.id_diagnostico_multiaxial).where(DiagnosticoMultiaxial.hash_contenido == hash_contenido)
+            )
+        return id_nuevo
@@ -1,43 +1,176 @@
 from models.evolucion import Evolucion
 from models.paciente import Paciente
-from models.item_dm import ItemDM
 from models.diagnostico_multiaxial import DiagnosticoMultiaxial
-from schemas.evolucion_schema import EvolucionCrear, EvolucionLeida, EvolucionGrupalCrear, EvolucionGrupalRespuesta, EvolucionGrupalFallida, EvolucionCompleta
+from models.sesion_grupal import SesionGrupal
+from schemas.item_dm_schema import ItemDMLeida
+from schemas.evolucion_schema import EvolucionCrear, EvolucionLeida, EvolucionGrupalCrear, EvolucionGrupalRespuesta, EvolucionGrupalFallida, EvolucionCompleta, SesionGrupalCompleta
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload 
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 from fastapi import HTTPException
 from core.auth import get_token
+from core.cache import CacheTTL, AUSENTE
+from core.paginacion import codificar_cursor, decodificar_cursor, ModoConteo, paginar
+from core.texto import consulta_texto, coincide
+from services.actividad_service import ActividadService
+from services.paciente_resumen_service import PacienteResumenService
 import httpx
+import os
+
+# Cache de nombres de profesionales (casi nunca cambian), compartida por todo el proceso
+PROFESIONALES_CACHE_TTL = float(os.getenv("PROFESIONALES_CACHE_TTL", "600"))
+PROFESIONALES_CACHE_TTL_NEGATIVO = float(os.getenv("PROFESIONALES_CACHE_TTL_NEGATIVO", "60"))
+profesionales_cache = CacheTTL(maxsize=int(os.getenv("PROFESIONALES_CACHE_MAX", "1024")), ttl=PROFESIONALES_CACHE_TTL)
+# JSON ya armado de cada EvolucionCompleta (id_evolucion -> (version, bytes)). Una evolucion solo cambia
+# al marcarse erronea, y eso cambia su version: lo cacheado se sirve solo si la version sigue igual.
+# La version no cubre los nombres de los autores (de la evolucion, del marcado y del diagnostico) del
+# JSON: si un profesional cambia su nombre, las evoluciones cacheadas lo muestran viejo hasta
+# EVOLUCIONES_CACHE_TTL (1h por defecto)
+evoluciones_cache = CacheTTL(maxsize=int(os.getenv("EVOLUCIONES_CACHE_MAX", "2048")), ttl=float(os.getenv("EVOLUCIONES_CACHE_TTL", "3600")))
 
 class EvolucionService:
 
     @staticmethod
-    async def buscar_datos_basicos_usuario(id_usuario: int):
-        # Datos basicos: id, nombre completo
-        # Primero verifico si es admin
+    async def buscar_datos_basicos_usuarios(ids_usuario, token: str | None = None) -> dict[int, dict]:
+        # Datos basicos (id, nombre completo) de todos los usuarios de una pagina.
+        # Primero se usa la cache del proceso; lo que falte se resuelve en una sola llamada a usuarios.
+        # token: el del pedido, si se llama fuera de el (p. ej. desde una respuesta en streaming)
+        ids = list({id_usuario for id_usuario in ids_usuario if id_usuario is not None})
+        profesionales = {}
+        faltantes = []
+        for id_usuario in ids:
+            datos = profesionales_cache.get(id_usuario)
+            if datos is AUSENTE:
+                faltantes.append(id_usuario)
+            elif datos is None:
+                # Cache negativa: ya sabemos que no es personal
+                raise ValueError("No existe personal con el id indicado")
+            else:
+                profesionales[id_usuario] = datos
+        if not faltantes:
+            return profesionales
+        headers = {"Authorization": f"Bearer {token if token is not None else get_token()}"}
         async with httpx.AsyncClient() as client:
-            response = await client.get(f'http://usuarios:8003/personal/usuario_base/es_admin/{id_usuario}') 
+            response = await client.post('http://usuarios:8003/personal/usuario_base/consulta', json={"ids_usuario": faltantes}, headers=headers)
             if response.status_code != 200:
                 raise ValueError(response.json()['detail'])
             r = response.json()
-            if r['admin']:
-                datos = {
-                    "nombre_completo": "Administrador",
-                    "id_usuario": id_usuario
-                }
-            else:
-                headers = {"Authorization": f"Bearer {get_token()}"}
-                response = await client.get(f'http://usuarios:8003/personal/{id_usuario}', headers=headers) 
-                if response.status_code != 200:
-                    raise ValueError(response.json()['detail'])
-                r = response.json()
-                datos = {
-                    "nombre_completo": f'{r['nombre']} {r['apellido']}',
-                    "id_usuario": id_usuario
-                }
-            return datos
+        encontrados = {u['id_usuario']: u for u in r}
+        for id_usuario in faltantes:
+            u = encontrados.get(id_usuario)
+            if u is None or u['nombre_completo'] is None:
+                profesionales_cache.set(id_usuario, None, PROFESIONALES_CACHE_TTL_NEGATIVO)
+                continue
+            datos = {
+                "nombre_completo": u['nombre_completo'],
+                "id_usuario": u['id_usuario']
+            }
+            # El admin no es personal pero nunca cambia: se cachea igual que un profesional
+            profesionales_cache.set(id_usuario, datos)
+            profesionales[id_usuario] = datos
+        # Por logica del negocio los autores si o si son personal (o bien admin)
+        if len(profesionales) != len(ids):
+            raise ValueError("No existe personal con el id indicado")
+        return profesionales
+
+    @staticmethod
+    async def buscar_datos_basicos_usuario(id_usuario: int):
+        profesionales = await EvolucionService.buscar_datos_basicos_usuarios([id_usuario])
+        return profesionales[id_usuario]
+
+    @staticmethod
+    def ids_autores_evolucion(e: Evolucion) -> list[int]:
+        # Usuarios involucrados en la carga, la marcada erronea y el diagnostico de una evolucion
+        ids = [e.creada_por]
+        if e.marcada_erronea:
+            ids.append(e.marcada_erronea_por)
+        if e.id_diagnostico_multiaxial:
+            ids.append(e.diagnostico.creado_por)
+        return ids
+
+    @staticmethod
+    async def version_evoluciones(id_usuario: int, db: AsyncSession) -> str:
+        # Cambia con cada alta o marcada erronea; un solo agregado sobre el indice por paciente
+        from sqlalchemy import func
+        result = await db.execute(
+            select(
+                func.count(),
+                func.max(Evolucion.id_evolucion),
+                func.max(Evolucion.fecha_marcada_erronea),
+                func.count().filter(Evolucion.marcada_erronea)
+            ).where(Evolucion.id_usuario == id_usuario)
+        )
+        return "evoluciones:" + ":".join(str(v) for v in result.one())
+
+    @staticmethod
+    async def version_evolucion(id_usuario: int, id_evolucion: int, db: AsyncSession) -> str | None:
+        result = await db.execute(
+            select(Evolucion.marcada_erronea, Evolucion.fecha_marcada_erronea)
+            .where(Evolucion.id_evolucion == id_evolucion, Evolucion.id_usuario == id_usuario)
+        )
+        fila = result.one_or_none()
+        return None if fila is None else f"evolucion:{id_evolucion}:" + ":".join(str(v) for v in fila)
+
+    @staticmethod
+    def armar_evolucion_completa(e: Evolucion, profesionales_bd: dict) -> EvolucionCompleta:
+        # Los usuarios involucrados ya vienen resueltos en profesionales_bd.
+        # Estos usuarios por logica del negocio si o si seran profesionales (o bien admin)
+        datos_creacion = {
+            "nombre": profesionales_bd[e.creada_por]['nombre_completo'],
+            "id_usuario": profesionales_bd[e.creada_por]['id_usuario'],
+            "fecha": e.fecha_creacion
+        }
+
+        if e.marcada_erronea:
+            datos_erronea = {
+                "nombre": profesionales_bd[e.marcada_erronea_por]['nombre_completo'],
+                "id_usuario": profesionales_bd[e.marcada_erronea_por]['id_usuario'],
+                "fecha": e.fecha_marcada_erronea,
+                "motivo": e.motivo_erronea
+            }
+        else:
+            datos_erronea = None
+        # El diagnostico y sus items ya vienen cargados en la misma consulta de la evolucion
+        if e.id_diagnostico_multiaxial:
+            diagnostico = {
+                "id_diagnostico_multiaxial": e.id_diagnostico_multiaxial,
+                "creacion": {
+                    "nombre": profesionales_bd[e.diagnostico.creado_por]['nombre_completo'],
+                    "id_usuario": profesionales_bd[e.diagnostico.creado_por]['id_usuario'],
+                    "fecha": e.fecha_creacion
+                },
+                "item_1": ItemDMLeida.from_orm(e.diagnostico.item_uno),
+                "item_2": ItemDMLeida.from_orm(e.diagnostico.item_dos),
+                "item_3": ItemDMLeida.from_orm(e.diagnostico.item_tres),
+                "item_4": ItemDMLeida.from_orm(e.diagnostico.item_cuatro),
+                "item_5": ItemDMLeida.from_orm(e.diagnostico.item_cinco)
+            }
+        else:
+            diagnostico = None
+        evolucion = {
+            **e.__dict__,
+            # Las grupales toman la observacion compartida de su sesion
+            "observacion": e.observacion if e.sesion_grupal is None else e.sesion_grupal.observacion,
+            "creacion": datos_creacion,
+            "erronea": datos_erronea,
+            "diagnostico": diagnostico
+        }
+        return EvolucionCompleta(**evolucion)
+
+    @staticmethod
+    def consulta_evoluciones():
+        # Evolucion + su DiagnosticoMultiaxial + los 5 ItemDM en una unica sentencia (LEFT OUTER JOINs),
+        # asi la cantidad de idas a la BD no depende del tamanio de la pagina ni de cuantas tengan DM
+        diagnostico = joinedload(Evolucion.diagnostico)
+        return select(Evolucion).options(
+            joinedload(Evolucion.sesion_grupal),
+            diagnostico.joinedload(DiagnosticoMultiaxial.item_uno),
+            diagnostico.joinedload(DiagnosticoMultiaxial.item_dos),
+            diagnostico.joinedload(DiagnosticoMultiaxial.item_tres),
+            diagnostico.joinedload(DiagnosticoMultiaxial.item_cuatro),
+            diagnostico.joinedload(DiagnosticoMultiaxial.item_cinco)
+        )
 
     @staticmethod
     async def listar_evoluciones(
@@ -49,89 +182,109 @@ class EvolucionService:
         to_date: datetime = None,
         tipo: str = None,
         sort: str = "fecha_creacion",
-        order: str = "desc"
+        order: str = "desc",
+        cursor: str | None = None,
+        q: str | None = None
     ) -> list[EvolucionCompleta]:
-        from sqlalchemy import and_, desc, asc
-        query = select(Evolucion).options(selectinload(Evolucion.diagnostico))
+        from sqlalchemy import desc, asc, tuple_
+        query = EvolucionService.consulta_evoluciones()
         query = query.where(Evolucion.id_usuario == id_usuario)
+        ranking = None
+        if q:
+            if cursor:
+                raise HTTPException(status_code=400, detail="La busqueda por texto se pagina con page, no con cursor")
+            query, ranking = EvolucionService.filtrar_por_texto(query, q, Evolucion.id_usuario == id_usuario)
         if from_date:
             query = query.where(Evolucion.fecha_creacion >= from_date)
         if to_date:
             query = query.where(Evolucion.fecha_creacion <= to_date)
         if tipo:
             query = query.where(Evolucion.tipo == tipo)
-        sort_column = Evolucion.fecha_creacion if sort == "fecha_creacion" else Evolucion.id_evolucion
-        query = query.order_by(asc(sort_column) if order == "asc" else desc(sort_column))
-        offset = (page - 1) * limit
-        query = query.offset(offset).limit(limit)
+        # El id desempata evoluciones con la misma fecha, asi el orden (y el cursor) es estable
+        if sort == "fecha_creacion":
+            clave = (Evolucion.fecha_creacion, Evolucion.id_evolucion)
+        else:
+            clave = (Evolucion.id_evolucion,)
+        if ranking is not None:
+            # Con texto, primero las que mejor coinciden
+            query = query.order_by(desc(ranking))
+        query = query.order_by(*[asc(c) if order == "asc" else desc(c) for c in clave])
+        if cursor:
+            # Paginado por clave: se continua despues de la ultima evolucion devuelta
+            fecha_cursor, id_cursor = decodificar_cursor(cursor)
+            valores = (fecha_cursor, id_cursor) if sort == "fecha_creacion" else (id_cursor,)
+            posicion = tuple_(*clave)
+            query = query.where(posicion > tuple_(*valores) if order == "asc" else posicion < tuple_(*valores))
+            if sort == "fecha_creacion":
+                # Redundante con la comparacion de tuplas, pero es la que usa Postgres para descartar particiones
+                query = query.where(Evolucion.fecha_creacion >= fecha_cursor if order == "asc" else Evolucion.fecha_creacion <= fecha_cursor)
+        else:
+            offset = (page - 1) * limit
+            query = query.offset(offset)
+        query = query.limit(limit)
         result = await db.execute(query)
         evoluciones = result.scalars().all()
-        lista_evoluciones = []
-        items_dm_bd = {}
-        profesionales_bd = {}
-        for e in evoluciones:
-            # Busco los usuarios involucrados en las cargas y marcadas erroenas,
-            # Estos usuarios por logica del negocio si o si seran profesionales (o bien admin)
-            # si los datos ya se recolectaron de la BD, no los vuelvo a buscar
-            if e.creada_por not in profesionales_bd:
-                profesionales_bd[e.creada_por] = await EvolucionService.buscar_datos_basicos_usuario(e.creada_por)
-            datos_creacion = {
-                "nombre": profesionales_bd[e.creada_por]['nombre_completo'],
-                "id_usuario": profesionales_bd[e.creada_por]['id_usuario'],
-                "fecha": e.fecha_creacion
-            }
+        # Junto todos los autores de la pagina y los resuelvo en un solo lote
+        profesionales_bd = await EvolucionService.buscar_datos_basicos_usuarios(
+            id_autor for e in evoluciones for id_autor in EvolucionService.ids_autores_evolucion(e)
+        )
+        return [EvolucionService.armar_evolucion_completa(e, profesionales_bd) for e in evoluciones]
 
-            if e.marcada_erronea:
-                if e.marcada_erronea_por not in profesionales_bd:
-                    profesionales_bd[e.marcada_erronea_por] = await EvolucionService.buscar_datos_basicos_usuario(e.marcada_erronea_por)
-                datos_erronea = {
-                    "nombre": profesionales_bd[e.marcada_erronea_por]['nombre_completo'],
-                    "id_usuario": profesionales_bd[e.marcada_erronea_por]['id_usuario'],
-                    "fecha": e.fecha_marcada_erronea,
-                    "motivo": e.motivo_erronea
-                }
-            else:
-                datos_erronea = None
-            # Busco los items del diagnostico, si ya estan los datos recolectados de la BD, no los busco
-            if e.id_diagnostico_multiaxial:
-                for item in [e.diagnostico.id_item1, e.diagnostico.id_item2, e.diagnostico.id_item3, e.diagnostico.id_item4, e.diagnostico.id_item5]:
-                    if item not in items_dm_bd:
-                        #voy a la BD a buscarlo
-                        result = await db.execute(select(ItemDM).where(ItemDM.id_item == item))
-                        datos_item = result.scalar_one_or_none()
-                        items_dm_bd[item] = {
-                            "id_item": item,
-                            "eje": datos_item.eje,
-                            "descripcion": datos_item.descripcion
-                        }
-                
-                if e.diagnostico.creado_por not in profesionales_bd:
-                    profesionales_bd[e.diagnostico.creado_por] = await EvolucionService.buscar_datos_basicos_usuario(e.diagnostico.creado_por)
-                    datos_creacion = {
-                        "nombre": profesionales_bd[e.diagnostico.creado_por]['nombre_completo'],
-                        "id_usuario": profesionales_bd[e.diagnostico.creado_por]['id_usuario'],
-                        "fecha": e.fecha_creacion
-                    }
+    @staticmethod
+    def filtrar_por_texto(query, q: str, *condiciones):
+        """
+        Restringe la consulta a evoluciones cuyo texto (propio, o el de su sesion grupal) coincide con q
+        y devuelve (query, ranking). Cada rama del UNION usa su indice GIN; las condiciones extra
+        (paciente, autor) se aplican dentro de las ramas para que achiquen la busqueda.
+        """
+        from sqlalchemy import func, union
+        tsquery = consulta_texto(q)
+        coincidentes = union(
+            select(Evolucion.id_evolucion).where(coincide(Evolucion.busqueda_ts, tsquery), *condiciones),
+            select(Evolucion.id_evolucion)
+            .join(SesionGrupal, Evolucion.id_sesion_grupal == SesionGrupal.id_sesion_grupal)
+            .where(coincide(SesionGrupal.busqueda_ts, tsquery), *condiciones)
+        )
+        query = (
+            query.where(Evolucion.id_evolucion.in_(coincidentes))
+            .outerjoin(SesionGrupal, Evolucion.id_sesion_grupal == SesionGrupal.id_sesion_grupal)
+        )
+        # Las grupales tienen su texto en la sesion; las individuales, en la evolucion
+        ranking = func.ts_rank(func.coalesce(SesionGrupal.busqueda_ts, Evolucion.busqueda_ts), tsquery)
+        return query, ranking
 
-                diagnostico = {
-                    "id_diagnostico_multiaxial": e.id_diagnostico_multiaxial,
-                    "creacion": datos_creacion,
-                    "item_1": items_dm_bd[e.diagnostico.id_item1],
-                    "item_2": items_dm_bd[e.diagnostico.id_item2],
-                    "item_3": items_dm_bd[e.diagnostico.id_item3],
-                    "item_4": items_dm_bd[e.diagnostico.id_item4],
-                    "item_5": items_dm_bd[e.diagnostico.id_item5]
-                }
-            else:
-                diagnostico = None
-            evolucion = {
-                **e.__dict__,
-                "creacion": datos_creacion,
-                "erronea": datos_erronea,
-                "diagnostico": diagnostico
-            }
-            lista_evoluciones.append(EvolucionCompleta(**evolucion))
-        return lista_evoluciones
+    @staticmethod
+    async def buscar_evoluciones(
+        q: str,
+        db: AsyncSession,
+        limit: int = 20,
+        page: int = 1,
+        creada_por: int | None = None,
+        conteo: ModoConteo = ModoConteo.exacto
+    ) -> dict:
+        # Busqueda en todas las evoluciones de la clinica (o solo las de un autor), rankeada y paginada
+        from sqlalchemy import desc
+        condiciones = [Evolucion.creada_por == creada_por] if creada_por is not None else []
+        query = EvolucionService.consulta_evoluciones().where(*condiciones)
+        query, ranking = EvolucionService.filtrar_por_texto(query, q, *condiciones)
+        query = query.order_by(desc(ranking), desc(Evolucion.fecha_creacion), desc(Evolucion.id_evolucion))
+        evoluciones, total, hay_mas = await paginar(db, query, limit, (page - 1) * limit, conteo)
+        profesionales_bd = await EvolucionService.buscar_datos_basicos_usuarios(
+            id_autor for e in evoluciones for id_autor in EvolucionService.ids_autores_evolucion(e)
+        )
+        return {
+            "evoluciones": [EvolucionService.armar_evolucion_completa(e, profesionales_bd) for e in evoluciones],
+            "total": total,
+            "hay_mas": hay_mas
+        }
+
+    @staticmethod
+    def siguiente_cursor(evoluciones: list[EvolucionCompleta], limit: int) -> str | None:
+        # Solo hay pagina siguiente si la actual vino completa
+        if not evoluciones or len(evoluciones) < limit:
+            return None
+        ultima = evoluciones[-1]
+        return codificar_cursor(ultima.creacion.fecha, ultima.id_evolucion)
 
     # NUEVO 10/11
     @staticmethod
@@ -140,7 +293,7 @@ class EvolucionService:
         id_evolucion: int,
         db: AsyncSession
     ) -> EvolucionCompleta:
-        query = select(Evolucion).options(selectinload(Evolucion.diagnostico))
+        query = EvolucionService.consulta_evoluciones()
         query = query.where(Evolucion.id_usuario == id_usuario)
         query = query.where(Evolucion.id_evolucion == id_evolucion)
         result = await db.execute(query) 
@@ -148,79 +301,26 @@ class EvolucionService:
         if e is None:
             raise HTTPException(status_code=404, detail="Evolucion no encontrada")
 
-        items_dm_bd = {}
-        profesionales_bd = {}
-        if e.creada_por not in profesionales_bd:
-            profesionales_bd[e.creada_por] = await EvolucionService.buscar_datos_basicos_usuario(e.creada_por)
-        datos_creacion = {
-            "nombre": profesionales_bd[e.creada_por]['nombre_completo'],
-            "id_usuario": profesionales_bd[e.creada_por]['id_usuario'],
-            "fecha": e.fecha_creacion
-        }
-
-        if e.marcada_erronea:
-            if e.marcada_erronea_por not in profesionales_bd:
-                profesionales_bd[e.marcada_erronea_por] = await EvolucionService.buscar_datos_basicos_usuario(e.marcada_erronea_por)
-            datos_erronea = {
-                "nombre": profesionales_bd[e.marcada_erronea_por]['nombre_completo'],
-                "id_usuario": profesionales_bd[e.marcada_erronea_por]['id_usuario'],
-                "fecha": e.fecha_marcada_erronea,
-                "motivo": e.motivo_erronea
-            }
-        else:
-            datos_erronea = None
-        # Busco los items del diagnostico, si ya estan los datos recolectados de la BD, no los busco
-        if e.id_diagnostico_multiaxial:
-            for item in [e.diagnostico.id_item1, e.diagnostico.id_item2, e.diagnostico.id_item3, e.diagnostico.id_item4, e.diagnostico.id_item5]:
-                if item not in items_dm_bd:
-                    #voy a la BD a buscarlo
-                    result = await db.execute(select(ItemDM).where(ItemDM.id_item == item))
-                    datos_item = result.scalar_one_or_none()
-                    items_dm_bd[item] = {
-                        "id_item": item,
-                        "eje": datos_item.eje,
-                        "descripcion": datos_item.descripcion
-                    }
-            
-            if e.diagnostico.creado_por not in profesionales_bd:
-                profesionales_bd[e.diagnostico.creado_por] = await EvolucionService.buscar_datos_basicos_usuario(e.diagnostico.creado_por)
-                datos_creacion = {
-                    "nombre": profesionales_bd[e.diagnostico.creado_por]['nombre_completo'],
-                    "id_usuario": profesionales_bd[e.diagnostico.creado_por]['id_usuario'],
-                    "fecha": e.fecha_creacion
-                }
+        profesionales_bd = await EvolucionService.buscar_datos_basicos_usuarios(EvolucionService.ids_autores_evolucion(e))
+        return EvolucionService.armar_evolucion_completa(e, profesionales_bd)
 
-            diagnostico = {
-                "id_diagnostico_multiaxial": e.id_diagnostico_multiaxial,
-                "creacion": datos_creacion,
-                "item_1": items_dm_bd[e.diagnostico.id_item1],
-                "item_2": items_dm_bd[e.diagnostico.id_item2],
-                "item_3": items_dm_bd[e.diagnostico.id_item3],
-                "item_4": items_dm_bd[e.diagnostico.id_item4],
-                "item_5": items_dm_bd[e.diagnostico.id_item5]
-            }
-        else:
-            diagnostico = None
-        evolucion = {
-            **e.__dict__,
-            "creacion": datos_creacion,
-            "erronea": datos_erronea,
-            "diagnostico": diagnostico
-        }
-        return EvolucionCompleta(**evolucion)
+    @staticmethod
+    def cachear_evolucion(evolucion: EvolucionCompleta, version: str) -> bytes:
+        contenido = evolucion.model_dump_json().encode("utf-8")
+        evoluciones_cache.set(evolucion.id_evolucion, (version, contenido))
+        return contenido
 
     @staticmethod
-    async def marcar_erronea_con_dni(dni_paciente: str, id_evolucion: int, motivo_erronea: str | None, marcada_erronea_por: int, db: AsyncSession):
-        result = await db.execute(select(Evolucion).where(Evolucion.id_evolucion == id_evolucion, Evolucion.dni_paciente == dni_paciente))
-        evolucion = result.scalar_one_or_none()
-        if evolucion is None:
-            return None
-        evolucion.marcada_erronea = True
-        evolucion.motivo_erronea = motivo_erronea
-        evolucion.marcada_erronea_por = marcada_erronea_por
-        await db.commit()
-        await db.refresh(evolucion)
-        return evolucion
+    async def obtener_evolucion_serializada(id_usuario: int, id_evolucion: int, version: str, db: AsyncSession) -> bytes:
+        """
+        JSON de la EvolucionCompleta. `version` es la de version_evolucion, que ya confirmo que la
+        evolucion es de este paciente; si coincide con la cacheada no se arma nada de nuevo.
+        """
+        cacheada = evoluciones_cache.get(id_evolucion, None)
+        if cacheada is not None and cacheada[0] == version:
+            return cacheada[1]
+        evolucion = await EvolucionService.obtener_evolucion(id_usuario, id_evolucion, db)
+        return EvolucionService.cachear_evolucion(evolucion, version)
 
     async def marcar_erronea_con_id_usuario(id_usuario: int, id_evolucion: int, motivo_erronea: str | None, db: AsyncSession, idDuenio: int | str = 1):
         result = await db.execute(select(Evolucion).where(Evolucion.id_evolucion == id_evolucion, Evolucion.id_usuario == id_usuario))
@@ -236,11 +336,16 @@ class EvolucionService:
         evolucion.motivo_erronea = motivo_erronea
         evolucion.fecha_marcada_erronea = datetime.now()
         evolucion.marcada_erronea_por = idDuenio
+        await ActividadService.registrar(db, evolucion.creada_por, evolucion.tipo, fecha=evolucion.fecha_creacion, erroneas=1)
+        await PacienteResumenService.recalcular(db, [evolucion.id_usuario])
         await db.commit()
         #await db.refresh(evolucion)
         #return evolucion
         # Agregado para obtener los datos limpios y listos para el frontend
-        return await EvolucionService.obtener_evolucion(id_usuario, id_evolucion, db)
+        completa = await EvolucionService.obtener_evolucion(id_usuario, id_evolucion, db)
+        # Write-through: la proxima vista ya encuentra la version marcada en cache
+        EvolucionService.cachear_evolucion(completa, await EvolucionService.version_evolucion(id_usuario, id_evolucion, db))
+        return completa
 
     @staticmethod
     async def crear_evolucion(id_usuario: int, input: EvolucionCrear, db: AsyncSession, idDuenio: int | str = 1): #-> EvolucionLeida:
@@ -300,6 +405,8 @@ class EvolucionService:
         
         evolucion = Evolucion(**evolucion_data)
         db.add(evolucion)
+        await ActividadService.registrar(db, idDuenio, "individual", evoluciones=1)
+        await PacienteResumenService.recalcular(db, [id_usuario])
         await db.commit()
         await db.refresh(evolucion)
         #return EvolucionLeida.from_orm(evolucion) Devolvemos unicamente el ID
@@ -309,7 +416,8 @@ class EvolucionService:
     async def crear_evoluciones_grupales(input: EvolucionGrupalCrear, db: AsyncSession, idDuenio: int | str = 1) -> EvolucionGrupalRespuesta:
         from datetime import datetime
         from models.paciente import Paciente
-        creadas_models: list[Evolucion] = []
+        from sqlalchemy import insert
+        filas: list[dict] = []
         fallidas: list[EvolucionGrupalFallida] = []
         now = datetime.utcnow()
 
@@ -323,28 +431,78 @@ class EvolucionService:
             if id_usuario not in existentes:
                 fallidas.append(EvolucionGrupalFallida(id_usuario=id_usuario, motivo="Paciente no encontrado"))
                 continue
-            evolucion = Evolucion(
-                id_usuario=id_usuario,
-                observacion=input.observacion,
-                #id_turno=None,
-                tipo="grupal",
-                creada_por=idDuenio,
-                fecha_creacion=now,
-                #id_diagnostico_multiaxial=None
-            )
-            db.add(evolucion)
-            creadas_models.append(evolucion)
+            filas.append({
+                "id_usuario": id_usuario,
+                "tipo": "grupal",
+                "creada_por": idDuenio,
+                "fecha_creacion": now,
+            })
 
         # Si ninguna válida, no hacemos commit con inserts vacíos
-        if creadas_models:
-            await db.commit()
-            for e in creadas_models:
-                await db.refresh(e)
+        if not filas:
+            return EvolucionGrupalRespuesta(creadas=[], fallidas=fallidas)
+
+        # La observacion se guarda una sola vez en la sesion; cada evolucion solo liga al paciente
+        id_sesion_grupal = await db.scalar(
+            insert(SesionGrupal)
+            .values(observacion=input.observacion, creada_por=idDuenio, fecha_creacion=now)
+            .returning(SesionGrupal.id_sesion_grupal)
+        )
+        for fila in filas:
+            fila["id_sesion_grupal"] = id_sesion_grupal
+        # Un solo INSERT de varias filas; RETURNING trae solo lo generado por la BD (el resto ya se conoce)
+        result = await db.execute(
+            insert(Evolucion).values(filas).returning(Evolucion.id_evolucion, Evolucion.id_usuario, Evolucion.fecha_creacion)
+        )
+        creadas = sorted(
+            (
+                EvolucionLeida(
+                    **row._mapping,
+                    observacion=input.observacion,
+                    tipo="grupal",
+                    creada_por=idDuenio,
+                    id_sesion_grupal=id_sesion_grupal
+                )
+                for row in result.all()
+            ),
+            key=lambda e: e.id_evolucion
+        )
+        await ActividadService.registrar(db, idDuenio, "grupal", fecha=now, evoluciones=len(filas))
+        await PacienteResumenService.recalcular(db, [f["id_usuario"] for f in filas])
+        await db.commit()
 
         return EvolucionGrupalRespuesta(
-            creadas=[EvolucionLeida.from_orm(e) for e in creadas_models],
+            id_sesion_grupal=id_sesion_grupal,
+            creadas=creadas,
             fallidas=fallidas
         )
+
+    @staticmethod
+    async def obtener_sesion_grupal(id_sesion_grupal: int, db: AsyncSession) -> SesionGrupalCompleta:
+        # La sesion y sus evoluciones en una sola consulta (PK + indice por id_sesion_grupal)
+        result = await db.execute(
+            select(SesionGrupal)
+            .options(joinedload(SesionGrupal.evoluciones))
+            .where(SesionGrupal.id_sesion_grupal == id_sesion_grupal)
+        )
+        sesion = result.unique().scalar_one_or_none()
+        if sesion is None:
+            raise HTTPException(status_code=404, detail="Sesion grupal no encontrada")
+
+        profesionales_bd = await EvolucionService.buscar_datos_basicos_usuarios([sesion.creada_por])
+        return SesionGrupalCompleta(
+            id_sesion_grupal=sesion.id_sesion_grupal,
+            observacion=sesion.observacion,
+            creacion={
+                "nombre": profesionales_bd[sesion.creada_por]['nombre_completo'],
+                "id_usuario": profesionales_bd[sesion.creada_por]['id_usuario'],
+                "fecha": sesion.fecha_creacion
+            },
+            integrantes=[
+                {"id_usuario": e.id_usuario, "id_evolucion": e.id_evolucion, "marcada_erronea": e.marcada_erronea}
+                for e in sorted(sesion.evoluciones, key=lambda e: e.id_evolucion)
+            ]
+        )
     
     @staticmethod
     async def marcar_erronea(id_evolucion: int, motivo_erronea: str | None, marcada_erronea_por: int, db: AsyncSession):
@@ -352,9 +510,15 @@ class EvolucionService:
         evolucion = result.scalar_one_or_none()
         if evolucion is None:
             return None
+        # Ya estaba marcada: no se vuelve a contar en la actividad ni en el resumen
+        if evolucion.marcada_erronea:
+            return evolucion
         evolucion.marcada_erronea = True
         evolucion.motivo_erronea = motivo_erronea
         evolucion.marcada_erronea_por = marcada_erronea_por
+        await ActividadService.registrar(db, evolucion.creada_por, evolucion.tipo, fecha=evolucion.fecha_creacion, erroneas=1)
+        await PacienteResumenService.recalcular(db, [evolucion.id_usuario])
         await db.commit()
+        evoluciones_cache.invalidar(id_evolucion)
         await db.refresh(evolucion)
         return evolucion
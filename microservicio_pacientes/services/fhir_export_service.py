@@ -0,0 +1,204 @@
+from models.evolucion import Evolucion
+from services.item_dm_service import ItemDMService
+from core.database import async_session
+from sqlalchemy.future import select
+from sqlalchemy.orm import joinedload
+from datetime import datetime
+import asyncio
+import json
+import os
+import time
+
+# ============================================================
+# EXPORTACION MASIVA FHIR R4 (NDJSON)
+# ============================================================
+# Evolucion -> Observation, cada eje del DiagnosticoMultiaxial -> Condition.
+# Un productor lee evoluciones con un cursor del servidor y las pasa por una cola acotada a un
+# consumidor que las serializa y escribe en archivos por bloques, asi la lectura de la BD se
+# superpone con la serializacion y la escritura, y la memoria no depende del tamanio de las tablas.
+
+FHIR_EXPORT_DIR = os.getenv("FHIR_EXPORT_DIR", "exportaciones/fhir")
+FHIR_EXPORT_LOTE = int(os.getenv("FHIR_EXPORT_LOTE", "1000"))
+FHIR_EXPORT_LINEAS_POR_ARCHIVO = int(os.getenv("FHIR_EXPORT_LINEAS_POR_ARCHIVO", "50000"))
+SISTEMA_ITEM_DM = "urn:crz:item-dm"
+SISTEMA_EVOLUCION = "urn:crz:evolucion"
+
+class ArchivoPorBloques:
+    """Escribe lineas NDJSON de un tipo de recurso partiendolas en archivos de a N lineas."""
+
+    def __init__(self, carpeta: str, recurso: str, lineas_por_archivo: int):
+        self.carpeta = carpeta
+        self.recurso = recurso
+        self.lineas_por_archivo = lineas_por_archivo
+        self.archivos: list[str] = []
+        self.lineas = 0
+        self._actual = None
+        self._en_actual = 0
+
+    def _escribir(self, lineas: list[str]):
+        # Corre en un hilo aparte (asyncio.to_thread) para no frenar el loop con el disco
+        for linea in lineas:
+            if self._actual is None or self._en_actual >= self.lineas_por_archivo:
+                self.cerrar()
+                ruta = os.path.join(self.carpeta, f"{self.recurso}-{len(self.archivos) + 1:04d}.ndjson")
+                self._actual = open(ruta, "w", encoding="utf-8")
+                self.archivos.append(ruta)
+                self._en_actual = 0
+            self._actual.write(linea)
+            self._en_actual += 1
+        self.lineas += len(lineas)
+
+    async def escribir(self, lineas: list[str]):
+        if lineas:
+            await asyncio.to_thread(self._escribir, lineas)
+
+    def cerrar(self):
+        if self._actual is not None:
+            self._actual.close()
+            self._actual = None
+
+
+class FhirExportService:
+    # Estado de la ultima exportacion lanzada desde la API (una sola a la vez por proceso)
+    ultima_exportacion: dict | None = None
+
+    @staticmethod
+    def observation(e: Evolucion) -> dict:
+        observacion = e.observacion if e.sesion_grupal is None else e.sesion_grupal.observacion
+        recurso = {
+            "resourceType": "Observation",
+            "id": f"evolucion-{e.id_evolucion}",
+            "identifier": [{"system": SISTEMA_EVOLUCION, "value": str(e.id_evolucion)}],
+            "status": "entered-in-error" if e.marcada_erronea else "final",
+            "category": [{"text": f"Evolucion {e.tipo}"}],
+            # LOINC 11506-3: Progress note
+            "code": {"coding": [{"system": "http://loinc.org", "code": "11506-3", "display": "Progress note"}]},
+            "subject": {"reference": f"Patient/{e.id_usuario}"},
+            "effectiveDateTime": e.fecha_creacion.isoformat(),
+            "performer": [{"reference": f"Practitioner/{e.creada_por}"}],
+            "valueString": observacion,
+        }
+        if e.marcada_erronea and e.motivo_erronea:
+            recurso["note"] = [{"text": e.motivo_erronea}]
+        return recurso
+
+    @staticmethod
+    def conditions(e: Evolucion) -> list[dict]:
+        dm = e.diagnostico
+        recursos = []
+        for eje, id_item in enumerate([dm.id_item1, dm.id_item2, dm.id_item3, dm.id_item4, dm.id_item5], start=1):
+            item = ItemDMService.catalogo.get(id_item)
+            recursos.append({
+                "resourceType": "Condition",
+                "id": f"dm-{dm.id_diagnostico_multiaxial}-eje{eje}",
+                "verificationStatus": {"coding": [{
+                    "system": "http://terminology.hl7.org/CodeSystem/condition-ver-status",
+                    "code": "entered-in-error" if e.marcada_erronea else "confirmed"
+                }]},
+                "category": [{"text": f"Eje {eje}"}],
+                "code": {
+                    "coding": [{"system": SISTEMA_ITEM_DM, "code": id_item, "display": item.descripcion if item else None}],
+                    "text": item.descripcion if item else id_item
+                },
+                "subject": {"reference": f"Patient/{e.id_usuario}"},
+                "recordedDate": dm.fecha_creacion.isoformat(),
+                "recorder": {"reference": f"Practitioner/{dm.creado_por}"},
+                "evidence": [{"detail": [{"reference": f"Observation/evolucion-{e.id_evolucion}"}]}],
+            })
+        return recursos
+
+    @staticmethod
+    async def exportar(
+        desde: datetime | None = None,
+        hasta: datetime | None = None,
+        carpeta: str | None = None,
+        lote: int = FHIR_EXPORT_LOTE,
+        lineas_por_archivo: int = FHIR_EXPORT_LINEAS_POR_ARCHIVO,
+        informar=print
+    ) -> dict:
+        carpeta = carpeta or os.path.join(FHIR_EXPORT_DIR, datetime.now().strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(carpeta, exist_ok=True)
+        observations = ArchivoPorBloques(carpeta, "Observation", lineas_por_archivo)
+        conditions = ArchivoPorBloques(carpeta, "Condition", lineas_por_archivo)
+        # Acotada: si la escritura se atrasa, el productor espera en vez de acumular lotes en memoria
+        cola: asyncio.Queue = asyncio.Queue(maxsize=4)
+        inicio = time.monotonic()
+        filas = 0
+
+        async with async_session() as db:
+            await ItemDMService.revisar(db)
+
+            async def producir():
+                query = (
+                    select(Evolucion)
+                    .options(joinedload(Evolucion.diagnostico), joinedload(Evolucion.sesion_grupal))
+                    .order_by(Evolucion.id_evolucion)
+                    .execution_options(yield_per=lote)
+                )
+                if desde:
+                    query = query.where(Evolucion.fecha_creacion >= desde)
+                if hasta:
+                    query = query.where(Evolucion.fecha_creacion <= hasta)
+                try:
+                    result = await db.stream(query)
+                    async for particion in result.scalars().partitions():
+                        await cola.put(particion)
+                finally:
+                    await cola.put(None)
+
+            productor = asyncio.create_task(producir())
+            diagnosticos_exportados = set()
+            try:
+                while (particion := await cola.get()) is not None:
+                    lineas_obs, lineas_cond = [], []
+                    for e in particion:
+                        lineas_obs.append(json.dumps(FhirExportService.observation(e), ensure_ascii=False) + "\n")
+                        # Un DM puede quedar referenciado por mas de una evolucion: se exporta una vez
+                        if e.id_diagnostico_multiaxial and e.id_diagnostico_multiaxial not in diagnosticos_exportados:
+                            diagnosticos_exportados.add(e.id_diagnostico_multiaxial)
+                            lineas_cond += [json.dumps(c, ensure_ascii=False) + "\n" for c in FhirExportService.conditions(e)]
+                    await observations.escribir(lineas_obs)
+                    await conditions.escribir(lineas_cond)
+                    filas += len(particion)
+                    segundos = time.monotonic() - inicio
+                    informar(f"📤 {filas} evoluciones exportadas ({filas / segundos:.0f} filas/s)")
+                await productor
+            finally:
+                if not productor.done():
+                    productor.cancel()
+                observations.cerrar()
+                conditions.cerrar()
+
+        segundos = time.monotonic() - inicio
+        return {
+            "carpeta": carpeta,
+            "evoluciones": filas,
+            "observations": observations.lineas,
+            "conditions": conditions.lineas,
+            "archivos": observations.archivos + conditions.archivos,
+            "segundos": round(segundos, 3),
+            "filas_por_segundo": round(filas / segundos, 1) if segundos else None,
+        }
+
+    @staticmethod
+    async def exportar_en_segundo_plano(desde: datetime | None, hasta: datetime | None):
+        FhirExportService.ultima_exportacion = {"estado": "en_curso", "desde": desde, "hasta": hasta}
+        try:
+            resultado = await FhirExportService.exportar(desde, hasta, informar=lambda _: None)
+            FhirExportService.ultima_exportacion = {"estado": "terminada", "desde": desde, "hasta": hasta, **resultado}
+        except Exception as e:
+            FhirExportService.ultima_exportacion = {"estado": "fallida", "desde": desde, "hasta": hasta, "detalle": str(e)}
+
+
+if __name__ == "__main__":
+    # python -m services.fhir_export_service [--desde 2025-01-01] [--hasta 2025-12-31] [--carpeta ...]
+    import argparse
+    parser = argparse.ArgumentParser(description="Exporta evoluciones y diagnosticos como FHIR R4 NDJSON")
+    parser.add_argument("--desde", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--hasta", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--carpeta", default=None)
+    parser.add_argument("--lote", type=int, default=FHIR_EXPORT_LOTE)
+    parser.add_argument("--lineas-por-archivo", type=int, default=FHIR_EXPORT_LINEAS_POR_ARCHIVO)
+    args = parser.parse_args()
+    resultado = asyncio.run(FhirExportService.exportar(args.desde, args.hasta, args.carpeta, args.lote, args.lineas_por_archivo))
+    print(json.dumps(resultado, indent=2, default=str))
@@ -0,0 +1,77 @@
+from models.evolucion import Evolucion
+from models.paciente import Paciente
+from models.sot import Sot
+from schemas.paciente_schema import UnPaciente
+from services.evolucion_service import EvolucionService
+from services.sot_service import SotService
+from core.database import async_session
+from sqlalchemy.future import select
+import json
+import os
+
+# Filas que se traen por vuelta del cursor del servidor; cada lote resuelve sus autores en un solo pedido
+# (cada evolucion aporta hasta 3 autores y usuarios acepta hasta 500 ids por consulta)
+HISTORIA_EXPORT_LOTE = int(os.getenv("HISTORIA_EXPORT_LOTE", "100"))
+
+class HistoriaService:
+
+    @staticmethod
+    def linea(tipo_registro: str, datos: dict) -> str:
+        return json.dumps({"tipo_registro": tipo_registro, **datos}, ensure_ascii=False, default=str) + "\n"
+
+    @staticmethod
+    async def exportar_historia(id_usuario: int, token: str):
+        """
+        Genera la historia clinica completa del paciente como NDJSON (una linea JSON por registro):
+        primero el paciente, despues todas sus evoluciones (con su diagnostico) y SOTs en orden
+        cronologico, y al final una linea "fin" con los totales. Si algo falla a mitad de camino
+        se emite una linea "error" en lugar de "fin", asi quien consume sabe que quedo incompleta.
+        token es el del pedido, tomado antes de empezar a enviar: get_token() es global del proceso y
+        mientras dura el envio otro pedido lo puede pisar.
+        """
+        # Sesion propia: el generador sigue corriendo mientras se envia la respuesta,
+        # cuando la sesion de get_db ya se cerro
+        async with async_session() as db:
+            paciente = await db.scalar(select(Paciente).where(Paciente.id_usuario == id_usuario))
+            if paciente is None:
+                yield HistoriaService.linea("error", {"detalle": "Paciente no encontrado"})
+                return
+            yield HistoriaService.linea("paciente", UnPaciente(**paciente.__dict__).model_dump(mode="json"))
+
+            totales = {"evoluciones": 0, "sots": 0}
+            try:
+                # Cursor del lado del servidor: la memoria usada no depende del largo de la historia
+                query = (
+                    EvolucionService.consulta_evoluciones()
+                    .where(Evolucion.id_usuario == id_usuario)
+                    .order_by(Evolucion.fecha_creacion, Evolucion.id_evolucion)
+                    .execution_options(yield_per=HISTORIA_EXPORT_LOTE)
+                )
+                result = await db.stream(query)
+                async for lote in result.scalars().partitions():
+                    profesionales_bd = await EvolucionService.buscar_datos_basicos_usuarios(
+                        (id_autor for e in lote for id_autor in EvolucionService.ids_autores_evolucion(e)), token
+                    )
+                    for e in lote:
+                        evolucion = EvolucionService.armar_evolucion_completa(e, profesionales_bd)
+                        yield HistoriaService.linea("evolucion", evolucion.model_dump(mode="json"))
+                    totales["evoluciones"] += len(lote)
+
+                query = (
+                    select(Sot)
+                    .where(Sot.id_usuario_paciente == id_usuario)
+                    .order_by(Sot.fecha_creacion, Sot.id_sot)
+                    .execution_options(yield_per=HISTORIA_EXPORT_LOTE)
+                )
+                result = await db.stream(query)
+                async for lote in result.scalars().partitions():
+                    profesionales_bd = await EvolucionService.buscar_datos_basicos_usuarios(
+                        (id_autor for s in lote for id_autor in SotService.ids_autores_sot(s)), token
+                    )
+                    for s in lote:
+                        yield HistoriaService.linea("sot", SotService.armar_sot_completa(s, profesionales_bd).model_dump(mode="json"))
+                    totales["sots"] += len(lote)
+            except Exception as e:
+                yield HistoriaService.linea("error", {"detalle": str(e), **totales})
+                return
+            yield HistoriaService.linea("fin", totales)
@@ -0,0 +1,159 @@
+from models.paciente import Paciente
+from schemas.paciente_schema import PacienteCrear, PacienteBaja, FilaImportada, ResultadoImportacion
+from services.paciente_service import PacienteService
+from services.usuario_replica_service import UsuarioReplicaService
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from sqlalchemy import String, any_, bindparam
+from pydantic import ValidationError
+import csv
+import io
+import json
+import os
+import time
+
+# ============================================================
+# IMPORTACION MASIVA DE PACIENTES (CSV o NDJSON)
+# ============================================================
+# Todas las filas se validan antes de tocar nada. Las validas se procesan por bloques: un pedido
+# al MS de usuarios por bloque (/personal/usuario_base/lote) y un INSERT multi-fila en paciente
+# con un commit por bloque. Cada fila del archivo tiene su resultado en el informe.
+
+IMPORTACION_LOTE = int(os.getenv("IMPORTACION_LOTE", "500"))  # el MS de usuarios acepta hasta 500 por pedido
+IMPORTACION_MAX_FILAS = int(os.getenv("IMPORTACION_MAX_FILAS", "20000"))
+
+class ImportacionService:
+
+    @staticmethod
+    def leer_filas(contenido: bytes, formato: str) -> list[dict | str]:
+        """Filas del archivo como dicts; si una linea NDJSON no se puede leer queda el mensaje de error."""
+        texto = contenido.decode("utf-8-sig")
+        if formato == "ndjson":
+            filas = []
+            for linea in texto.splitlines():
+                if not linea.strip():
+                    continue
+                try:
+                    fila = json.loads(linea)
+                    filas.append(fila if isinstance(fila, dict) else "La linea no es un objeto JSON")
+                except json.JSONDecodeError as e:
+                    filas.append(f"JSON invalido: {e.msg}")
+            return filas
+        lector = csv.DictReader(io.StringIO(texto), delimiter=";" if ";" in texto.split("\n", 1)[0] else ",")
+        # Celdas vacias como None, asi los opcionales no fallan (por ejemplo un email vacio)
+        return [
+            {k.strip(): (v.strip() or None) if isinstance(v, str) else v for k, v in fila.items() if k}
+            for fila in lector
+        ]
+
+    @staticmethod
+    def validar(fila: dict | str) -> PacienteCrear | str:
+        if isinstance(fila, str):
+            return fila
+        try:
+            return PacienteCrear.model_validate(fila)
+        except ValidationError as e:
+            return ";".join(f"{'.'.join(str(l) for l in error['loc'])}:{error['msg']}" for error in e.errors())
+
+    @staticmethod
+    async def importar(contenido: bytes, formato: str, db: AsyncSession, sembrado: bool = False) -> ResultadoImportacion:
+        inicio = time.monotonic()
+        filas = ImportacionService.leer_filas(contenido, formato)
+        if not filas:
+            raise ValueError("El archivo no tiene filas")
+        if len(filas) > IMPORTACION_MAX_FILAS:
+            raise ValueError(f"El archivo tiene {len(filas)} filas, el maximo es {IMPORTACION_MAX_FILAS}")
+
+        informe = [FilaImportada(fila=n) for n in range(1, len(filas) + 1)]
+        pacientes: dict[int, PacienteCrear] = {}
+        dnis: dict[str, int] = {}
+        for i, fila in enumerate(filas):
+            paciente = ImportacionService.validar(fila)
+            if isinstance(paciente, str):
+                informe[i].dni = fila.get("dni") if isinstance(fila, dict) else None
+                informe[i].error = paciente
+                continue
+            informe[i].dni = paciente.dni
+            if paciente.dni in dnis:
+                informe[i].error = f"DNI repetido en el archivo (fila {dnis[paciente.dni] + 1})"
+                continue
+            dnis[paciente.dni] = i
+            pacientes[i] = paciente
+
+        # DNIs que ya estan cargados, en una sola consulta
+        if dnis:
+            result = await db.execute(
+                select(Paciente.dni).where(Paciente.dni == any_(bindparam("dnis", list(dnis), type_=ARRAY(String))))
+            )
+            for dni in result.scalars().all():
+                informe[dnis[dni]].error = "Ya existe un paciente con ese DNI"
+                pacientes.pop(dnis[dni])
+
+        indices = list(pacientes)
+        for desde in range(0, len(indices), IMPORTACION_LOTE):
+            await ImportacionService.importar_bloque(indices[desde:desde + IMPORTACION_LOTE], pacientes, informe, db, sembrado)
+
+        creados = sum(1 for f in informe if f.id_usuario is not None)
+        return ResultadoImportacion(
+            total=len(informe),
+            creados=creados,
+            fallidos=len(informe) - creados,
+            segundos=round(time.monotonic() - inicio, 3),
+            filas=informe
+        )
+
+    @staticmethod
+    async def importar_bloque(bloque: list[int], pacientes: dict[int, PacienteCrear], informe: list[FilaImportada], db: AsyncSession, sembrado: bool):
+        try:
+            usuarios = await PacienteService.crear_usuarios_lote([
+                {
+                    "nombre": pacientes[i].nombre,
+                    "apellido": pacientes[i].apellido,
+                    "telefono": pacientes[i].telefono,
+                    "email": pacientes[i].email,
+                    "sembrado": sembrado
+                }
+                for i in bloque
+            ])
+        except Exception as e:
+            for i in bloque:
+                informe[i].error = f"Alta de usuario fallida: {e}"
+            return
+
+        filas = []
+        for creado in usuarios:
+            i = bloque[creado["indice"]]
+            if creado["id_usuario"] is None:
+                informe[i].error = creado["error"]
+                continue
+            datos = pacientes[i].model_dump(exclude={"telefono", "email"})
+            datos["genero"] = datos["genero"].value
+            datos["id_usuario"] = creado["id_usuario"]
+            filas.append((i, datos))
+        if not filas:
+            return
+
+        # Si otro alta tomo el DNI despues de la verificacion, esa fila no se inserta y se informa
+        result = await db.execute(
+            insert(Paciente)
+            .values([datos for _, datos in filas])
+            .on_conflict_do_nothing(index_elements=[Paciente.dni])
+            .returning(Paciente.dni)
+        )
+        insertados = set(result.scalars().all())
+        await UsuarioReplicaService.aplicar(db, [
+            UsuarioReplicaService.alta(datos["id_usuario"], pacientes[i].email, pacientes[i].telefono)
+            for i, datos in filas if datos["dni"] in insertados
+        ])
+        await db.commit()
+        for i, datos in filas:
+            if datos["dni"] in insertados:
+                informe[i].id_usuario = datos["id_usuario"]
+            else:
+                informe[i].error = "Ya existe un paciente con ese DNI"
+                # El usuario ya se habia creado: se da de baja para no dejarlo suelto
+                try:
+                    await PacienteService.delete_paciente(datos["id_usuario"], PacienteBaja(motivo="Importacion: DNI duplicado"), db)
+                except Exception as e:
+                    informe[i].error += f"; el usuario {datos['id_usuario']} quedo activo y no se pudo dar de baja: {getattr(e, 'detail', e)}"
@@ -2,10 +2,67 @@ from models.item_dm import ItemDM
 from schemas.item_dm_schema import ItemDMLeida
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy import func
+from types import MappingProxyType
+import os
+import time
+
+# Tiempo minimo entre recargas provocadas por un item desconocido (evita ir a la BD por cada id invalido)
+REFRESCO_MINIMO_SEGUNDOS = 30
+# Cada cuanto se compara la huella de item_dm con la del catalogo en memoria; 0 revisa en cada lectura.
+# Cubre las ediciones que no pasan por este proceso (otro worker, SQL a mano)
+ITEM_DM_REVISION_SEGUNDOS = float(os.getenv("ITEM_DM_REVISION_SEGUNDOS", "60"))
 
 class ItemDMService:
+    # Catalogo completo de ItemDM en memoria (id_item -> ItemDMLeida). Es inmutable:
+    # cada recarga arma un mapa nuevo y lo reemplaza entero, subiendo la version si cambio algo.
+    # Quien escribe item_dm desde este proceso llama a refrescar_catalogo; el resto lo detecta revisar
+    catalogo = MappingProxyType({})
+    version = 0
+    huella: str | None = None
+    _ultimo_refresco = 0.0
+    _ultima_revision = 0.0
+
     @staticmethod
-    async def listar_items(db: AsyncSession):
+    def consulta_huella():
+        # Una sola fila con el md5 de todo el catalogo: la tabla es chica y no tiene columna de modificacion
+        fila = func.concat_ws("|", ItemDM.id_item, ItemDM.eje, ItemDM.descripcion)
+        return select(func.md5(func.coalesce(func.string_agg(fila, aggregate_order_by("\n", ItemDM.id_item)), "")))
+
+    @staticmethod
+    async def refrescar_catalogo(db: AsyncSession) -> int:
         result = await db.execute(select(ItemDM))
-        items = result.scalars().all()
-        return [ItemDMLeida.from_orm(item) for item in items]
+        nuevo = {item.id_item: ItemDMLeida.from_orm(item) for item in result.scalars().all()}
+        ItemDMService.huella = await db.scalar(ItemDMService.consulta_huella())
+        ItemDMService._ultimo_refresco = ItemDMService._ultima_revision = time.monotonic()
+        if nuevo != dict(ItemDMService.catalogo):
+            ItemDMService.catalogo = MappingProxyType(nuevo)
+            ItemDMService.version += 1
+        return ItemDMService.version
+
+    @staticmethod
+    async def revisar(db: AsyncSession) -> int:
+        """Recarga el catalogo si esta vacio o si item_dm cambio desde la ultima recarga (a lo sumo cada ITEM_DM_REVISION_SEGUNDOS)."""
+        if not ItemDMService.catalogo:
+            return await ItemDMService.refrescar_catalogo(db)
+        if time.monotonic() - ItemDMService._ultima_revision >= ITEM_DM_REVISION_SEGUNDOS:
+            ItemDMService._ultima_revision = time.monotonic()
+            if await db.scalar(ItemDMService.consulta_huella()) != ItemDMService.huella:
+                await ItemDMService.refrescar_catalogo(db)
+        return ItemDMService.version
+
+    @staticmethod
+    async def obtener_item(id_item: str, db: AsyncSession) -> ItemDMLeida | None:
+        await ItemDMService.revisar(db)
+        item = ItemDMService.catalogo.get(id_item)
+        if item is None and time.monotonic() - ItemDMService._ultimo_refresco > REFRESCO_MINIMO_SEGUNDOS:
+            # Puede ser un item cargado despues de la ultima recarga
+            await ItemDMService.refrescar_catalogo(db)
+            item = ItemDMService.catalogo.get(id_item)
+        return item
+
+    @staticmethod
+    async def listar_items(db: AsyncSession):
+        await ItemDMService.revisar(db)
+        return list(ItemDMService.catalogo.values())
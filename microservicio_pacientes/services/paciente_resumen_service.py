@@ -0,0 +1,58 @@
+from models.paciente_resumen import PacienteResumen
+from models.evolucion import Evolucion
+from models.sot import Sot
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import func, update
+
+class PacienteResumenService:
+    # Ninguna de estas funciones hace commit: se llaman dentro de la transaccion de la escritura
+    # que las origina, asi el resumen nunca queda desfasado de evolucion/sot
+
+    @staticmethod
+    async def recalcular(db: AsyncSession, ids_usuario: list[int]):
+        """
+        Vuelve a calcular el resumen de los pacientes desde evolucion y sot (solo sus filas, por los
+        indices de id_usuario). No suma ni resta: llamarla de mas o reintentar una escritura deja el
+        mismo resultado. Se llama despues de agregar o marcar las filas, en la misma transaccion.
+        """
+        ids = sorted(set(ids_usuario))
+        if not ids:
+            return
+        await db.flush()
+        # Primero se crean o bloquean las filas, en orden fijo (dos sesiones grupales con pacientes en
+        # comun no se cruzan). El calculo va en otra sentencia: asi su snapshot ya incluye lo que
+        # commiteo quien tenia la fila, y dos escrituras concurrentes no se pisan el conteo
+        await db.execute(
+            insert(PacienteResumen)
+            .values([{"id_usuario": i, "cantidad_evoluciones": 0, "cantidad_sots": 0} for i in ids])
+            .on_conflict_do_nothing(index_elements=[PacienteResumen.id_usuario])
+        )
+        await db.execute(
+            select(PacienteResumen.id_usuario)
+            .where(PacienteResumen.id_usuario.in_(ids))
+            .order_by(PacienteResumen.id_usuario)
+            .with_for_update()
+        )
+        validas = (Evolucion.id_usuario == PacienteResumen.id_usuario) & (Evolucion.marcada_erronea == False)
+        ultimo_dm = (
+            select(Evolucion.id_diagnostico_multiaxial)
+            .where(validas, Evolucion.id_diagnostico_multiaxial.is_not(None))
+            .order_by(Evolucion.fecha_creacion.desc(), Evolucion.id_evolucion.desc())
+            .limit(1)
+        )
+        sots = Sot.id_usuario_paciente == PacienteResumen.id_usuario
+        await db.execute(
+            update(PacienteResumen)
+            .where(PacienteResumen.id_usuario.in_(ids))
+            .values(
+                cantidad_evoluciones=select(func.count()).where(validas).scalar_subquery(),
+                fecha_ultima_evolucion=select(func.max(Evolucion.fecha_creacion)).where(validas).scalar_subquery(),
+                id_ultimo_diagnostico_multiaxial=ultimo_dm.scalar_subquery(),
+                fecha_ultimo_diagnostico=ultimo_dm.with_only_columns(Evolucion.fecha_creacion).scalar_subquery(),
+                cantidad_sots=select(func.count()).where(sots).scalar_subquery(),
+                fecha_ultima_sot=select(func.max(Sot.fecha_creacion)).where(sots).scalar_subquery(),
+            )
+            .execution_options(synchronize_session=False)
+        )
@@ -1,4 +1,5 @@
 from models.paciente import Paciente
+from models.usuario_replica import UsuarioReplica
 from schemas.paciente_schema import PacienteCrear, PacienteCreado, PacienteEditar, UnPaciente, PacienteBaja, Genero
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -7,6 +8,13 @@ import httpx
 from datetime import date
 from fastapi import HTTPException
 from core.auth import get_token
+from core.paginacion import ModoConteo, paginar
+from core.cache import CacheTTL
+from services.usuario_replica_service import UsuarioReplicaService
+import os
+
+# Ids de pacientes que ya se sabe que existen; solo se guardan positivos para que un alta se vea enseguida
+pacientes_existentes = CacheTTL(maxsize=int(os.getenv("PACIENTES_CACHE_MAX", "4096")), ttl=float(os.getenv("PACIENTES_CACHE_TTL", "60")))
 
 class PacienteService:
     @staticmethod
@@ -58,6 +66,16 @@ class PacienteService:
             r = response.json()
             return r['id_usuario']
 
+    @staticmethod
+    async def crear_usuarios_lote(usuarios: list[dict]) -> list[dict]:
+        # Un solo pedido al MS de usuarios para todo el lote; devuelve {indice, id_usuario, error} por usuario
+        async with httpx.AsyncClient(timeout=120) as client:
+            headers = {"Authorization": f"Bearer {get_token()}"}
+            response = await client.post('http://usuarios:8003/personal/usuario_base/lote', json={"usuarios": usuarios}, headers=headers)
+            if response.status_code != 200:
+                raise ValueError(response.json()['detail'])
+            return response.json()
+
     @staticmethod
     async def crear_paciente(input: PacienteCrear, db: AsyncSession, sembrado: bool = False) -> PacienteCreado:
         # Convertir los datos del schema, convirtiendo el Enum a string
@@ -70,6 +88,7 @@ class PacienteService:
         datos['genero'] = datos['genero'].value  # Convertir Enum a string
         paciente = Paciente(**datos, id_usuario = id_usuario)
         db.add(paciente)
+        await UsuarioReplicaService.aplicar(db, [UsuarioReplicaService.alta(id_usuario, input.email, input.telefono)])
         await db.commit()
         await db.refresh(paciente)
         return PacienteCreado(id_usuario=paciente.id_usuario)
@@ -99,6 +118,7 @@ class PacienteService:
         email = datos_paciente.pop("email")
         telefono = datos_paciente.pop("telefono")
         datos_usuario = await PacienteService.actualizar_datos_paciente_usuario(id_usuario, email, telefono)
+        await UsuarioReplicaService.aplicar(db, [{**datos_usuario, "id_usuario": id_usuario}])
         # Actualizar los campos del paciente
         for field, value in input.dict().items():
             if value is not None:
@@ -117,7 +137,11 @@ class PacienteService:
             if response.status_code != 200:
                 raise HTTPException(status_code=400, detail=response.json()['detail'])
             r = response.json()
-            return r
+        # La baja se ve enseguida en la copia local (fecha y autor exactos, sin esperar al feed)
+        usuario = await PacienteService.buscar_datos_usuario_paciente(id_usuario)
+        await UsuarioReplicaService.aplicar(db, [{**usuario, "id_usuario": id_usuario}])
+        await db.commit()
+        return r
 
 
     @staticmethod
@@ -137,15 +161,68 @@ class PacienteService:
             r = response.json()
             return r
 
+    @staticmethod
+    async def consultar_datos_usuarios(ids_usuario: list[int]) -> dict[int, dict]:
+        # Contacto y alta/baja/edicion de muchos usuarios en un solo pedido al MS de usuarios
+        async with httpx.AsyncClient() as client:
+            headers = {"Authorization": f"Bearer {get_token()}"}
+            response = await client.post('http://usuarios:8003/personal/usuario_base/consulta', json={"ids_usuario": ids_usuario}, headers=headers)
+            if response.status_code != 200:
+                raise ValueError(response.json()['detail'])
+            return {u['id_usuario']: u for u in response.json()}
+
+    @staticmethod
+    async def consultar_pacientes(ids_usuario: list[int], db: AsyncSession) -> dict:
+        """
+        Varios pacientes con sus datos de usuario en una consulta (paciente + copia local de usuarios).
+        Solo los que todavia no estan en la copia (o todos, si el feed esta atrasado) se piden a
+        usuarios, en un unico pedido.
+        Respeta el orden pedido; los ids que no son pacientes (o no tienen usuario) van en faltantes.
+        """
+        result = await db.execute(select(Paciente).where(Paciente.id_usuario.in_(set(ids_usuario))))
+        pacientes = {p.id_usuario: p for p in result.unique().scalars().all()}
+        vigente = await UsuarioReplicaService.vigente(db)
+        usuarios = {p.id_usuario: UsuarioReplicaService.datos_usuario(p.usuario) for p in pacientes.values() if vigente and p.usuario is not None}
+        sin_copia = [id_usuario for id_usuario in pacientes if id_usuario not in usuarios]
+        if sin_copia:
+            traidos = await PacienteService.consultar_datos_usuarios(sin_copia)
+            await UsuarioReplicaService.aplicar(db, list(traidos.values()))
+            await db.commit()
+            usuarios.update(traidos)
+        encontrados, faltantes = [], []
+        for id_usuario in ids_usuario:
+            paciente, usuario = pacientes.get(id_usuario), usuarios.get(id_usuario)
+            if paciente is None or usuario is None:
+                faltantes.append(id_usuario)
+                continue
+            pacientes_existentes.set(id_usuario, True)
+            contacto = {k: usuario.get(k) for k in ("email", "telefono", "alta", "baja", "edicion")}
+            encontrados.append({**paciente.__dict__, **contacto})
+        return {"pacientes": encontrados, "faltantes": faltantes}
+
+    @staticmethod
+    async def existe_paciente(id_usuario: int, db: AsyncSession) -> bool:
+        # Solo consulta la clave primaria de paciente, sin pedir datos de contacto a usuarios
+        if pacientes_existentes.get(id_usuario, False):
+            return True
+        existe = await db.scalar(select(Paciente.id_usuario).where(Paciente.id_usuario == id_usuario)) is not None
+        if existe:
+            pacientes_existentes.set(id_usuario, True)
+        return existe
+
     @staticmethod
     async def get_paciente_por_id(id_usuario: int, db: AsyncSession):
         result = await db.execute(select(Paciente).where(Paciente.id_usuario == id_usuario))
         paciente = result.scalar_one_or_none()
         if paciente is None:
             raise HTTPException(status_code=404, detail="Paciente no encontrado")
-        # Ahora buscamos los datos del usuario
+        # Datos del usuario desde la copia local; si todavia no llego (alta reciente) o el feed esta
+        # atrasado, se piden y se guardan
+        if paciente.usuario is not None and await UsuarioReplicaService.vigente(db):
+            return {**paciente.__dict__, **UsuarioReplicaService.datos_usuario(paciente.usuario)}
         usuario = await PacienteService.buscar_datos_usuario_paciente(id_usuario)
-        #dato_paciente = dict(paciente)['Paciente']
+        await UsuarioReplicaService.aplicar(db, [{**usuario, "id_usuario": id_usuario}])
+        await db.commit()
         return {**paciente.__dict__, **usuario}
 
     @staticmethod
@@ -157,12 +234,14 @@ class PacienteService:
         anio_ingreso_desde: int | None = None,
         anio_ingreso_hasta: int | None = None,
         genero: Genero | None = None,
+        activo: bool | None = None,
         limit: int = 20,
         page: int = 1,
         order: str = "asc",
         sort: str | None = None,
+        conteo: ModoConteo = ModoConteo.exacto,
     ):
-        from sqlalchemy import and_, or_, func, cast, Integer, asc, desc
+        from sqlalchemy import and_, or_, func, asc, desc
         # Clamp limit to [1,20]
         if limit is None or limit <= 0:
             limit = 20
@@ -172,7 +251,6 @@ class PacienteService:
             page = 1
         offset = (page - 1) * limit
         query = select(Paciente)
-        count = select(func.count()).select_from(Paciente)
         conditions = []
         condiciones_datos_basicos = []
         #if nombre:
@@ -183,26 +261,46 @@ class PacienteService:
         #    apellido = apellido.strip()
         #    if apellido:
         #        conditions.append(Paciente.apellido.ilike(f"%{apellido}%"))
+        ranking = None
+        dni_completo = None
         if nom_ap_dni:
-             datos_basicos_persona = nom_ap_dni.split()
-             for dato in datos_basicos_persona:
-                condiciones_datos_basicos.append(Paciente.nombre.ilike(f"%{dato}%"))
-                condiciones_datos_basicos.append(Paciente.apellido.ilike(f"%{dato}%"))
-                condiciones_datos_basicos.append(Paciente.dni.ilike(f"%{dato}%"))
+            # El termino se normaliza con la misma funcion SQL que llena paciente.busqueda
+            termino = await db.scalar(select(func.normalizar_busqueda(nom_ap_dni)))
+            datos = termino.split()
+            if len(datos) == 1 and datos[0].isdigit() and len(datos[0]) >= 8:
+                dni_completo = datos[0]
+            for dato in datos:
+                # Coincidencia parcial sobre la columna normalizada (indice GIN de trigramas); incluye el DNI,
+                # asi una parte del DNI sigue encontrando al paciente
+                escapado = dato.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                condiciones_datos_basicos.append(Paciente.busqueda.like(f"%{escapado}%", escape="\\"))
+            # Mejores coincidencias primero
+            ranking = func.similarity(Paciente.busqueda, termino)
+        # Los filtros por año se reescriben como rango de fechas para poder usar el indice de fecha_ingreso
         if anio_ingreso_desde:
-            conditions.append(cast(func.extract('year', Paciente.fecha_ingreso), Integer) >= anio_ingreso_desde)
+            conditions.append(Paciente.fecha_ingreso >= date(anio_ingreso_desde, 1, 1))
         if anio_ingreso_hasta:
-            conditions.append(cast(func.extract('year', Paciente.fecha_ingreso), Integer) <= anio_ingreso_hasta)
+            conditions.append(Paciente.fecha_ingreso < date(anio_ingreso_hasta + 1, 1, 1))
         if genero:
             genero = genero.value
             conditions.append(Paciente.genero == genero)
+        if activo is not None:
+            # La baja esta en la copia local de usuarios; sin fila en la copia se lo toma como activo
+            query = query.outerjoin(UsuarioReplica, UsuarioReplica.id_usuario == Paciente.id_usuario)
+            conditions.append(UsuarioReplica.fecha_baja.is_(None) if activo else UsuarioReplica.fecha_baja.is_not(None))
+        if dni_completo:
+            # Se busco un DNI completo: primero por el indice unico de dni; si esta, es el unico resultado
+            exacto = (await db.execute(query.where(Paciente.dni == dni_completo, *conditions))).unique().scalars().first()
+            if exacto is not None:
+                return {
+                    "pacientes": [exacto] if offset == 0 else [],
+                    "total": None if conteo == ModoConteo.hay_mas else 1,
+                    "hay_mas": False
+                }
         if condiciones_datos_basicos:
             query = query.where(or_(*condiciones_datos_basicos).self_group())
-            count = count.where(or_(*condiciones_datos_basicos).self_group())
         if conditions:
             query = query.where(and_(*conditions))
-            count = count.where(and_(*conditions))
-        total = await db.scalar(count)
         # Mapear sort a columnas reales (nombres en español)
         sort_map = {
             'nombre': Paciente.nombre,
@@ -210,19 +308,24 @@ class PacienteService:
             'fecha_ingreso': Paciente.fecha_ingreso,
             #'fecha_nacimiento': Paciente.fecha_nacimiento,
         }
-        sort_col = sort_map.get(sort, Paciente.apellido)
-        if order == "asc":
-            query = query.order_by(asc(sort_col))
+        if ranking is not None and sort not in sort_map:
+            # Sin un orden pedido explicitamente, se ordena por calidad de la coincidencia
+            query = query.order_by(desc(ranking), asc(Paciente.apellido))
         else:
-            query = query.order_by(desc(sort_col))
-        query = query.offset(offset).limit(limit)
-        result = await db.execute(query)
-        return {"pacientes": result.scalars().all(), "total": total}
+            sort_col = sort_map.get(sort, Paciente.apellido)
+            if order == "asc":
+                query = query.order_by(asc(sort_col))
+            else:
+                query = query.order_by(desc(sort_col))
+        pacientes, total, hay_mas = await paginar(db, query, limit, offset, conteo)
+        return {"pacientes": pacientes, "total": total, "hay_mas": hay_mas}
 
     @staticmethod
     async def refresh(db: AsyncSession):
         # Elimino de la BD
         stmt = delete(Paciente).where(Paciente.id_usuario > 10)
         result = await db.execute(stmt)
+        await db.execute(delete(UsuarioReplica).where(UsuarioReplica.id_usuario > 10))
         await db.commit()
+        pacientes_existentes.limpiar()
         return {"resultado": "ok"}
\ No newline at end of file
@@ -6,7 +6,10 @@ from sqlalchemy.exc import NoResultFound
 from models.paciente import Paciente
 from datetime import datetime
 from services.evolucion_service import EvolucionService
+from services.paciente_resumen_service import PacienteResumenService
 from fastapi import HTTPException
+from core.paginacion import codificar_cursor, decodificar_cursor, ModoConteo, paginar
+from core.texto import consulta_texto, coincide
 
 class SotService:
 
@@ -18,50 +21,112 @@ class SotService:
         page: int = 1,
         from_date: datetime = None,
         to_date: datetime = None,
-        order: str = "desc"
+        order: str = "desc",
+        cursor: str | None = None,
+        q: str | None = None
     ) -> list[SotCompleta]:
-        from sqlalchemy import and_, desc, asc
+        from sqlalchemy import and_, desc, asc, tuple_, func
         query = select(Sot).where(Sot.id_usuario_paciente == id_usuario)
+        if q:
+            if cursor:
+                raise HTTPException(status_code=400, detail="La busqueda por texto se pagina con page, no con cursor")
+            tsquery = consulta_texto(q)
+            query = query.where(coincide(Sot.busqueda_ts, tsquery)).order_by(desc(func.ts_rank(Sot.busqueda_ts, tsquery)))
         if from_date:
             query = query.where(Sot.fecha_creacion >= from_date)
         if to_date:
             query = query.where(Sot.fecha_creacion <= to_date)
-        sort_column = Sot.fecha_creacion
-        query = query.order_by(asc(sort_column) if order == "asc" else desc(sort_column))
-        offset = (page - 1) * limit
-        query = query.offset(offset).limit(limit)
+        # El id desempata SOTs con la misma fecha, asi el orden (y el cursor) es estable
+        clave = (Sot.fecha_creacion, Sot.id_sot)
+        query = query.order_by(*[asc(c) if order == "asc" else desc(c) for c in clave])
+        if cursor:
+            # Paginado por clave: se continua despues del ultimo SOT devuelto
+            posicion = tuple_(*clave)
+            valores = tuple_(*decodificar_cursor(cursor))
+            query = query.where(posicion > valores if order == "asc" else posicion < valores)
+        else:
+            offset = (page - 1) * limit
+            query = query.offset(offset)
+        query = query.limit(limit)
         result = await db.execute(query)
         sots = result.scalars().all()
-        lista_sots = []
-        profesionales_bd = {}
-        for s in sots:
-            if s.creado_por not in profesionales_bd:
-                profesionales_bd[s.creado_por] = await EvolucionService.buscar_datos_basicos_usuario(s.creado_por)
-            datos_creacion = {
-                "nombre": profesionales_bd[s.creado_por]['nombre_completo'],
-                "id_usuario": profesionales_bd[s.creado_por]['id_usuario'],
-                "fecha": s.fecha_creacion
-            }
+        # Junto todos los autores de la pagina y los resuelvo en un solo lote
+        profesionales_bd = await EvolucionService.buscar_datos_basicos_usuarios(
+            id_autor for s in sots for id_autor in SotService.ids_autores_sot(s)
+        )
+        return [SotService.armar_sot_completa(s, profesionales_bd) for s in sots]
+
+    @staticmethod
+    async def version_sots(id_usuario: int, db: AsyncSession) -> str:
+        # Cambia con cada alta o modificacion de un SOT del paciente
+        from sqlalchemy import func
+        result = await db.execute(
+            select(func.count(), func.max(Sot.id_sot), func.max(Sot.fecha_modificacion))
+            .where(Sot.id_usuario_paciente == id_usuario)
+        )
+        return "sots:" + ":".join(str(v) for v in result.one())
 
-            if s.modificado:
-                if s.modificado_por not in profesionales_bd:
-                    profesionales_bd[s.modificado_por] = await EvolucionService.buscar_datos_basicos_usuario(s.modificado_por)
-                datos_modificacion = {
-                    "nombre": profesionales_bd[s.modificado_por]['nombre_completo'],
-                    "id_usuario": profesionales_bd[s.modificado_por]['id_usuario'],
-                    "fecha": s.fecha_modificacion,
-                    "motivo": s.motivo_modificado
-                }
-            else:
-                datos_modificacion = None
+    @staticmethod
+    def ids_autores_sot(s: Sot) -> list[int]:
+        return [s.creado_por, s.modificado_por] if s.modificado else [s.creado_por]
 
-            sot = {
-                **s.__dict__,
-                "creacion": datos_creacion,
-                "modificacion": datos_modificacion
+    @staticmethod
+    def armar_sot_completa(s: Sot, profesionales_bd: dict) -> SotCompleta:
+        datos_creacion = {
+            "nombre": profesionales_bd[s.creado_por]['nombre_completo'],
+            "id_usuario": profesionales_bd[s.creado_por]['id_usuario'],
+            "fecha": s.fecha_creacion
+        }
+
+        if s.modificado:
+            datos_modificacion = {
+                "nombre": profesionales_bd[s.modificado_por]['nombre_completo'],
+                "id_usuario": profesionales_bd[s.modificado_por]['id_usuario'],
+                "fecha": s.fecha_modificacion,
+                "motivo": s.motivo_modificado
             }
-            lista_sots.append(SotCompleta(**sot))
-        return lista_sots
+        else:
+            datos_modificacion = None
+
+        sot = {
+            **s.__dict__,
+            "creacion": datos_creacion,
+            "modificacion": datos_modificacion
+        }
+        return SotCompleta(**sot)
+
+    @staticmethod
+    async def buscar_sots(
+        q: str,
+        db: AsyncSession,
+        limit: int = 20,
+        page: int = 1,
+        creado_por: int | None = None,
+        conteo: ModoConteo = ModoConteo.exacto
+    ) -> dict:
+        from sqlalchemy import desc, func
+        tsquery = consulta_texto(q)
+        query = select(Sot).where(coincide(Sot.busqueda_ts, tsquery))
+        if creado_por is not None:
+            query = query.where(Sot.creado_por == creado_por)
+        query = query.order_by(desc(func.ts_rank(Sot.busqueda_ts, tsquery)), desc(Sot.fecha_creacion), desc(Sot.id_sot))
+        sots, total, hay_mas = await paginar(db, query, limit, (page - 1) * limit, conteo)
+        profesionales_bd = await EvolucionService.buscar_datos_basicos_usuarios(
+            id_autor for s in sots for id_autor in SotService.ids_autores_sot(s)
+        )
+        return {
+            "sots": [SotService.armar_sot_completa(s, profesionales_bd) for s in sots],
+            "total": total,
+            "hay_mas": hay_mas
+        }
+
+    @staticmethod
+    def siguiente_cursor(sots: list[SotCompleta], limit: int) -> str | None:
+        # Solo hay pagina siguiente si la actual vino completa
+        if not sots or len(sots) < limit:
+            return None
+        ultimo = sots[-1]
+        return codificar_cursor(ultimo.creacion.fecha, ultimo.id_sot)
 
     @staticmethod
     async def crear_sot(id_usuario: int, sot_data: SotCrear, db: AsyncSession, idDuenio: int | str = 1) -> Sot:
@@ -72,6 +137,7 @@ class SotService:
             raise NoResultFound(f"Paciente no encontrado")
         nuevo_sot = Sot(**sot_data.model_dump(), id_usuario_paciente = id_usuario, creado_por=idDuenio, fecha_creacion=datetime.utcnow())
         db.add(nuevo_sot)
+        await PacienteResumenService.recalcular(db, [id_usuario])
         await db.commit()
         await db.refresh(nuevo_sot)
         return nuevo_sot
@@ -0,0 +1,161 @@
+from models.usuario_replica import UsuarioReplica, UsuarioReplicaFeed
+from core.database import async_session
+from core.auth import get_token_servicio
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import func, or_
+from datetime import datetime, timedelta
+import asyncio
+import httpx
+import os
+
+# ============================================================
+# COPIA LOCAL DE USUARIOS (contacto, alta, baja)
+# ============================================================
+# Las lecturas de pacientes salen de usuario_replica en vez de pedirle cada usuario al MS de usuarios.
+# La tabla se mantiene con el feed GET /personal/usuario_base/cambios (que ya trae solo pacientes),
+# recorrido por (version, id_usuario) desde el cursor guardado en usuario_replica_feed; ademas, lo
+# que se escribe desde aca (altas, ediciones, bajas) se copia en el momento para que se vea sin
+# esperar al feed. El feed se lee con el token de servicio del MS (get_token_servicio), nunca con el
+# de un usuario. Si la ultima sincronizacion completa (usuario_replica_feed.sincronizado, compartida
+# por todos los procesos) es mas vieja que USUARIOS_REPLICA_ATRASO_MAX, la copia no se usa para leer
+# y los datos se vuelven a pedir a usuarios hasta que el feed se recupere.
+
+USUARIOS_REPLICA_INTERVALO = float(os.getenv("USUARIOS_REPLICA_INTERVALO", "30"))  # segundos; 0 desactiva
+USUARIOS_REPLICA_LOTE = int(os.getenv("USUARIOS_REPLICA_LOTE", "500"))
+USUARIOS_REPLICA_ATRASO_MAX = float(os.getenv("USUARIOS_REPLICA_ATRASO_MAX", "300"))  # segundos
+
+def _fecha(valor) -> datetime | None:
+    # Las fechas llegan como texto ISO en el JSON de usuarios
+    return datetime.fromisoformat(valor) if isinstance(valor, str) else valor
+
+class UsuarioReplicaService:
+
+    @staticmethod
+    def fila(usuario: dict) -> dict:
+        """Pasa un usuario con la forma del MS de usuarios (alta/baja/edicion anidados) a una fila de usuario_replica."""
+        alta = usuario.get("alta") or {}
+        baja = usuario.get("baja") or {}
+        edicion = usuario.get("edicion") or {}
+        return {
+            "id_usuario": usuario["id_usuario"],
+            "email": usuario.get("email"),
+            "telefono": usuario.get("telefono"),
+            "fecha_alta": _fecha(alta.get("fecha")),
+            "alta_por": alta.get("id_usuario"),
+            "fecha_baja": _fecha(baja.get("fecha")),
+            "baja_por": baja.get("id_usuario"),
+            "motivo_baja": baja.get("motivo"),
+            "fecha_edicion": _fecha(edicion.get("fecha")),
+            "edicion_por": edicion.get("id_usuario"),
+            "version": usuario.get("version"),
+        }
+
+    @staticmethod
+    async def vigente(db: AsyncSession) -> bool:
+        """True si el feed se sincronizo hace menos de USUARIOS_REPLICA_ATRASO_MAX (la copia se puede leer)."""
+        result = await db.execute(
+            select(UsuarioReplicaFeed.id).where(
+                UsuarioReplicaFeed.id == 1,
+                UsuarioReplicaFeed.sincronizado > func.now() - timedelta(seconds=USUARIOS_REPLICA_ATRASO_MAX)
+            )
+        )
+        return result.scalar() is not None
+
+    @staticmethod
+    async def _guardar_cursor(db: AsyncSession, cursor: tuple[int, int], completo: bool):
+        """Upsert de la fila del cursor. No hace commit; va en la misma transaccion que el lote aplicado."""
+        valores = {"version": cursor[0], "id_usuario": cursor[1]}
+        if completo:
+            valores["sincronizado"] = func.now()
+        stmt = insert(UsuarioReplicaFeed).values(id=1, **valores)
+        await db.execute(stmt.on_conflict_do_update(index_elements=[UsuarioReplicaFeed.id], set_=valores))
+
+    @staticmethod
+    def alta(id_usuario: int, email: str | None, telefono: str | None) -> dict:
+        """Usuario recien creado desde este MS, para copiarlo sin esperar al feed (que despues completa quien lo dio de alta)."""
+        return {"id_usuario": id_usuario, "email": email, "telefono": telefono, "alta": {"fecha": datetime.now()}}
+
+    @staticmethod
+    def datos_usuario(replica: UsuarioReplica) -> dict:
+        """Los mismos datos que devuelve GET /personal/usuario_base/{id}, armados desde la copia local."""
+        return {
+            "email": replica.email,
+            "telefono": replica.telefono,
+            "alta": {"fecha": replica.fecha_alta, "id_usuario": replica.alta_por},
+            "baja": {"fecha": replica.fecha_baja, "id_usuario": replica.baja_por, "motivo": replica.motivo_baja},
+            "edicion": {"fecha": replica.fecha_edicion, "id_usuario": replica.edicion_por},
+        }
+
+    @staticmethod
+    async def aplicar(db: AsyncSession, usuarios: list[dict]):
+        """
+        Upsert de usuarios en la copia local. No hace commit. Un cambio del feed no pisa una version
+        mas nueva ya guardada; lo escrito desde aca (sin version) siempre se aplica y conserva la version.
+        """
+        if not usuarios:
+            return
+        filas = {u["id_usuario"]: UsuarioReplicaService.fila(u) for u in usuarios}
+        stmt = insert(UsuarioReplica).values([filas[i] for i in sorted(filas)])
+        columnas = [c for c in filas[next(iter(filas))] if c not in ("id_usuario", "version")]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UsuarioReplica.id_usuario],
+            set_={
+                **{c: stmt.excluded[c] for c in columnas},
+                "version": func.coalesce(stmt.excluded.version, UsuarioReplica.version),
+                "sincronizado": func.now(),
+            },
+            where=or_(
+                stmt.excluded.version.is_(None),
+                UsuarioReplica.version.is_(None),
+                stmt.excluded.version >= UsuarioReplica.version
+            )
+        )
+        await db.execute(stmt)
+
+    @staticmethod
+    async def sincronizar(db: AsyncSession) -> int:
+        """
+        Trae del feed de usuarios todo lo posterior al cursor guardado y lo aplica en lotes; cada lote
+        se commitea junto con el cursor, asi un corte a mitad de camino retoma desde ahi.
+        Devuelve cuantos cambios aplico.
+        """
+        result = await db.execute(
+            select(UsuarioReplicaFeed.version, UsuarioReplicaFeed.id_usuario).where(UsuarioReplicaFeed.id == 1)
+        )
+        cursor = tuple(result.first() or (0, 0))
+        aplicados = 0
+        async with httpx.AsyncClient() as client:
+            headers = {"Authorization": f"Bearer {await get_token_servicio()}"}
+            while True:
+                response = await client.get(
+                    'http://usuarios:8003/personal/usuario_base/cambios',
+                    params={"desde_version": cursor[0], "desde_id": cursor[1], "limite": USUARIOS_REPLICA_LOTE},
+                    headers=headers
+                )
+                if response.status_code != 200:
+                    raise ValueError(response.json()['detail'])
+                cambios = response.json()
+                await UsuarioReplicaService.aplicar(db, cambios)
+                if cambios:
+                    cursor = (cambios[-1]["version"], cambios[-1]["id_usuario"])
+                completo = len(cambios) < USUARIOS_REPLICA_LOTE
+                await UsuarioReplicaService._guardar_cursor(db, cursor, completo)
+                await db.commit()
+                aplicados += len(cambios)
+                if completo:
+                    return aplicados
+
+    @staticmethod
+    async def mantener_replica():
+        """Tarea de fondo: sincroniza al arrancar y despues cada USUARIOS_REPLICA_INTERVALO segundos."""
+        while True:
+            try:
+                async with async_session() as db:
+                    aplicados = await UsuarioReplicaService.sincronizar(db)
+                if aplicados:
+                    print(f"👥 Copia de usuarios: {aplicados} cambios aplicados")
+            except Exception as e:
+                print(f"⚠️ No se pudo sincronizar la copia de usuarios: {e}")
+            await asyncio.sleep(USUARIOS_REPLICA_INTERVALO)
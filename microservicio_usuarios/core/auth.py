@@ -182,6 +182,20 @@ def verify_role_is_in(rol_requerido: List[str]):
         return token_payload
     return check_role
 
+def verify_servicio(scope: str):
+    """
+    Dependencia de FastAPI para endpoints internos entre MS: solo acepta tokens de servicio
+    (Auth0 client credentials) que tengan el scope indicado. Los tokens de usuario no pasan.
+    """
+    def check_servicio(token_payload: dict = Depends(verify_token)):
+        if token_payload.get("gty") != "client-credentials" or scope not in token_payload.get("scope", "").split():
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Acceso denegado. Se requiere un token de servicio con scope: {scope}"
+            )
+        return token_payload
+    return check_servicio
+
 def get_mgmt_api():
     return os.getenv("AUTH0_MGMT_API")
 
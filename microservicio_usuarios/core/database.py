@@ -149,6 +149,30 @@ async def poblar_con_datos_base(session: AsyncSession):
         email="jsotopsiq@gmail.com"
     ), session, True)
 
+# Feed de cambios de usuario (lo consumen otros MS para su copia local de contacto y baja).
+# Un trigger guarda en version_cambio el id de la transaccion que escribio la fila, asi cualquier
+# camino (ORM, UPDATE masivo, SQL a mano) queda registrado. El feed solo entrega versiones menores
+# al xmin del snapshot actual: todas esas transacciones ya terminaron y ninguna fila con una
+# version menor puede aparecer despues, por mas que los commits lleguen en otro orden.
+SENTENCIAS_FEED_CAMBIOS = [
+    "ALTER TABLE usuario ADD COLUMN IF NOT EXISTS version_cambio BIGINT",
+    "CREATE INDEX IF NOT EXISTS ix_usuario_version_cambio ON usuario (version_cambio, id_usuario)",
+    """
+    CREATE OR REPLACE FUNCTION usuario_version_cambio() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.version_cambio := pg_current_xact_id()::text::bigint;
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE TRIGGER usuario_version_cambio BEFORE INSERT OR UPDATE ON usuario
+    FOR EACH ROW EXECUTE FUNCTION usuario_version_cambio()
+    """,
+    # Filas anteriores al feed: el trigger les pone la version de esta transaccion
+    "UPDATE usuario SET version_cambio = 0 WHERE version_cambio IS NULL",
+]
+
 async def init_db():
     # Ensure the database exists before creating tables
     await create_database_if_not_exists()
@@ -161,6 +185,8 @@ async def init_db():
 
         await conn.run_sync(Base.metadata.create_all)
         print("📦 Tables created successfully.")
+        for sentencia in SENTENCIAS_FEED_CAMBIOS:
+            await conn.exec_driver_sql(sentencia)
     async with async_session() as session:
         result = await session.execute(text("SELECT * FROM usuario LIMIT 1"))
         exists = result.scalar() is not None
@@ -1,13 +1,13 @@
-from fastapi import FastAPI, status, Depends, HTTPException, Response
+from fastapi import FastAPI, status, Depends, HTTPException, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
 from schemas.profesional_schema import CrearPersonal, PersonalCreado, BusquedaPersonal, TipoPersonal, Genero, UnPersonal, DetalleBaja, EditarPersonal
-from schemas.usuario_schema import CargarUsuarioBase, UnUsuario, EditarUsuarioBase, DesactivarUsuarioBase
+from schemas.usuario_schema import CargarUsuarioBase, CargarUsuariosBaseLote, UsuarioLoteCreado, UnUsuario, EditarUsuarioBase, DesactivarUsuarioBase, ConsultarUsuarios, UsuarioConsultado, CambioUsuario
 from services.profesional_service import ProfesionalService, OrdenarPor
 from services.usuario_service import UsuarioService
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.database import get_db, init_db, close_db
 from datetime import datetime
-from core.auth import get_user_rol, get_user_id, verify_token, verify_role, verify_role_is_in, get_user_id_authless
+from core.auth import get_user_rol, get_user_id, verify_token, verify_role, verify_role_is_in, verify_servicio, get_user_id_authless
 
 app = FastAPI(
     title="API Usuarios",
@@ -86,6 +86,11 @@ async def es_admin(id_usuario: int, db:AsyncSession = Depends(get_db)):
     esAdmin = await UsuarioService.usuario_es_admin(db, id_usuario)
     return {"admin": esAdmin}
 
+#interno: datos basicos de muchos usuarios en una sola consulta (nombre, admin, contacto, baja)
+@app.post("/personal/usuario_base/consulta", include_in_schema=False, status_code=200)
+async def consultar_usuarios(input: ConsultarUsuarios, db:AsyncSession = Depends(get_db), _token_payload: dict = Depends((verify_role_is_in(["Secretaria", "Director", "Psiquiatra", "Psicologo", "Coordinador", "Enfermera"])))) -> list[UsuarioConsultado]:
+    return await UsuarioService.consultar_usuarios(db, input.ids_usuario)
+
 @app.post("/personal/usuario_base", include_in_schema=False, status_code=201)
 async def crear_usuario(input: CargarUsuarioBase, db:AsyncSession = Depends(get_db), _token_payload: dict = Depends(verify_role("Secretaria"))) -> PersonalCreado:
     print(f"Mis IDS: {get_user_id_authless(_token_payload)} o {get_user_id(_token_payload)}")
@@ -93,6 +98,17 @@ async def crear_usuario(input: CargarUsuarioBase, db:AsyncSession = Depends(get_
     await UsuarioService.asignar_rol_auth0(id, input.rol)
     return {"id_usuario": id}
 
+#interno: alta de muchos usuarios base en un pedido (importacion masiva de pacientes); informa el resultado de cada uno
+@app.post("/personal/usuario_base/lote", include_in_schema=False, status_code=200)
+async def crear_usuarios_lote(input: CargarUsuariosBaseLote, db:AsyncSession = Depends(get_db), _token_payload: dict = Depends(verify_role("Secretaria"))) -> list[UsuarioLoteCreado]:
+    return await UsuarioService.crear_usuarios_lote(db, input.usuarios, get_user_id_authless(_token_payload))
+
+#interno: feed de cambios de usuarios pacientes (alta, contacto, baja) para la copia local del MS de pacientes.
+# Lo lee un proceso de fondo con su propio token de servicio, no con el de un usuario
+@app.get("/personal/usuario_base/cambios", include_in_schema=False, status_code=200)
+async def listar_cambios_usuarios(desde_version: int = 0, desde_id: int = 0, limite: int = Query(500, ge=1, le=2000), db:AsyncSession = Depends(get_db), _token_payload: dict = Depends(verify_servicio("read:usuarios_cambios"))) -> list[CambioUsuario]:
+    return await UsuarioService.listar_cambios(db, desde_version, desde_id, limite)
+
 @app.get("/personal/usuario_base/{id_usuario}", include_in_schema=False, status_code=200)
 async def obtener_usuario(id_usuario: int, db:AsyncSession = Depends(get_db), _token_payload: dict = Depends((verify_role_is_in(["Secretaria", "Director", "Psiquiatra", "Psicologo", "Coordinador", "Enfermera", "Paciente"])))) -> UnUsuario:
     try:
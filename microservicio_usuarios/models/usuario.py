@@ -1,10 +1,14 @@
-from sqlalchemy import String, Integer, ForeignKey, Text, func, DateTime
+from sqlalchemy import String, Integer, BigInteger, ForeignKey, Text, func, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from core.database import Base
 from datetime import datetime
 
 class Usuario(Base):
     __tablename__ = "usuario"
+    __table_args__ = (
+        # Feed de cambios: se recorre por (version_cambio, id_usuario)
+        Index("ix_usuario_version_cambio", "version_cambio", "id_usuario"),
+    )
     # Aca van las columnas
     id_usuario: Mapped[int] = mapped_column(primary_key=True, index=True)
     username: Mapped[str] = mapped_column(String(20), unique=True)
@@ -18,6 +22,8 @@ class Usuario(Base):
     creado_por: Mapped[int | None] = mapped_column(Integer, ForeignKey("usuario.id_usuario"))
     ultima_edicion: Mapped[datetime | None]
     editado_por: Mapped[int | None] = mapped_column(Integer, ForeignKey("usuario.id_usuario"))
+    # Transaccion (pg_current_xact_id) que hizo el ultimo cambio; la pone un trigger, ver core/database.py
+    version_cambio: Mapped[int | None] = mapped_column(BigInteger)
     profesional: Mapped["Profesional"] = relationship(
         back_populates="usuario",
         cascade="all, delete-orphan",
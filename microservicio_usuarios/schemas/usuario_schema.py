@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, StringConstraints
+from pydantic import BaseModel, EmailStr, StringConstraints, Field
 from typing import Annotated, Literal
 from datetime import datetime
 
@@ -11,6 +11,14 @@ class CargarUsuarioBase(BaseModel):
     sembrado: bool = False
     rol: str = "Paciente"
 
+class CargarUsuariosBaseLote(BaseModel):
+    usuarios: Annotated[list[CargarUsuarioBase], Field(min_length=1, max_length=500)]
+
+class UsuarioLoteCreado(BaseModel):
+    indice: int  # posicion en la lista pedida
+    id_usuario: int | None = None
+    error: str | None = None
+
 class EditarUsuarioBase(BaseModel):
     email: EmailStr | Literal[""] | None = None
     telefono: Annotated[str, StringConstraints(strip_whitespace=True, min_length=8, max_length=20)] | Literal[""] | None = None
@@ -27,6 +35,31 @@ class UnUsuario(BaseModel):
     baja: Baja | None = None
     edicion: Edicion | None = None
 
+class ConsultarUsuarios(BaseModel):
+    ids_usuario: Annotated[list[int], Field(min_length=1, max_length=500)]
+
+class UsuarioConsultado(BaseModel):
+    id_usuario: int
+    admin: bool
+    nombre: str | None = None
+    apellido: str | None = None
+    nombre_completo: str | None = None # Solo para personal (o "Administrador")
+    tipo: str | None = None
+    email: EmailStr | None = None
+    telefono: str | None = None
+    alta: Alta
+    baja: Baja | None = None
+    edicion: Edicion | None = None
+
+class CambioUsuario(BaseModel):
+    id_usuario: int
+    email: EmailStr | None = None
+    telefono: str | None = None
+    alta: Alta
+    baja: Baja | None = None
+    edicion: Edicion | None = None
+    version: int  # junto con id_usuario, cursor para pedir los cambios siguientes
+
 class Alta(BaseModel):
     fecha: datetime
     id_usuario: int | None = None
@@ -1,12 +1,21 @@
 from models.usuario import Usuario
-from models.profesional import Profesional
+from models.profesional import Profesional, Clinico, Administrativo
 from datetime import date, datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import update, select, null, delete, text
+from sqlalchemy import update, select, null, delete, text, func, any_, bindparam, insert, or_, tuple_, cast
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.types import Integer, String, BigInteger, Text
 from fastapi import HTTPException
+from schemas.usuario_schema import CargarUsuarioBase
+import asyncio
 import httpx
+import os
 from core.auth import get_roleid, get_mgmt_api, _get_auth0_config
 
+# Altas simultaneas en Auth0 durante una carga por lote (la Management API limita los pedidos por segundo)
+AUTH0_CONCURRENCIA = int(os.getenv("AUTH0_CONCURRENCIA", "10"))
+
 class UsuarioService:
 
     @staticmethod
@@ -64,6 +73,19 @@ class UsuarioService:
             print(f'auth0 rol salio bien:')
             return {}
 
+    @staticmethod
+    async def borrar_usuario_auth0(id_usuario: str):
+        AUTH0_DOMAIN, _ = _get_auth0_config()
+        headers = {"Authorization": f"Bearer {get_mgmt_api()}"}
+        async with httpx.AsyncClient() as client:
+            response = await client.delete(f'https://{AUTH0_DOMAIN}/api/v2/users/auth0|{id_usuario}', headers=headers)
+            if response.status_code != 204:
+                print(f'error en auth0: {response.json()}')
+                raise HTTPException(
+                    status_code=400,
+                    detail="Error en auth0..."
+                )
+
     @staticmethod
     async def crear_usuario(db: AsyncSession, nombre:str, apellido:str, email:str | None = None, telefono:str | None = None, sembrado: bool = False, idDuenio: int | str = 1):
         username = UsuarioService.generar_username(nombre, apellido)
@@ -90,6 +112,106 @@ class UsuarioService:
             await UsuarioService.cargar_usuario_en_auth0(usuarioBD.id_usuario, email, username, username, nombre, apellido, telefono)
         return usuarioBD.id_usuario
 
+    @staticmethod
+    async def crear_usuarios_lote(db: AsyncSession, usuarios: list[CargarUsuarioBase], idDuenio: int | str = 1) -> list[dict]:
+        """
+        Alta de muchos usuarios base: se validan todos juntos (una consulta para emails/telefonos ya
+        usados y otra para usernames), se insertan con un solo INSERT y despues se dan de alta en
+        Auth0 con concurrencia acotada. Si Auth0 rechaza alguno, ese usuario se borra de la BD.
+        Devuelve un resultado por usuario, en el mismo orden del pedido.
+        """
+        resultados = [{"indice": i, "id_usuario": None, "error": None} for i in range(len(usuarios))]
+        emails = [u.email for u in usuarios if u.email]
+        telefonos = [u.telefono for u in usuarios if u.telefono]
+        result = await db.execute(
+            select(Usuario.email, Usuario.telefono).where(or_(
+                Usuario.email == any_(bindparam('emails', emails, type_=ARRAY(String))),
+                Usuario.telefono == any_(bindparam('telefonos', telefonos, type_=ARRAY(String)))
+            ))
+        )
+        usados = {dato for fila in result.all() for dato in fila if dato is not None}
+
+        validos = []
+        for i, u in enumerate(usuarios):
+            if not u.email:
+                resultados[i]["error"] = "Es obligatorio el email"
+            elif u.email in usados:
+                resultados[i]["error"] = f"El email {u.email} ya esta en uso"
+            elif u.telefono and u.telefono in usados:
+                resultados[i]["error"] = f"El telefono {u.telefono} ya esta en uso"
+            else:
+                # Tambien descarta repetidos dentro del mismo lote
+                usados.update(dato for dato in (u.email, u.telefono) if dato)
+                validos.append(i)
+        if not validos:
+            return resultados
+
+        # El username es nombre+apellido+dia+mes: en un lote se repite seguido, se le agrega un numero
+        bases = [UsuarioService.generar_username(usuarios[i].nombre, usuarios[i].apellido) for i in validos]
+        result = await db.execute(
+            select(Usuario.username).where(Usuario.username.like(any_(bindparam('bases', [f"{b}%" for b in set(bases)], type_=ARRAY(String)))))
+        )
+        tomados = set(result.scalars().all())
+        filas = []
+        for i, base in zip(validos, bases):
+            username, n = base, 1
+            while username in tomados:
+                username, n = f"{base}{n}", n + 1
+            tomados.add(username)
+            filas.append({
+                "email": usuarios[i].email,
+                "telefono": usuarios[i].telefono,
+                "username": username,
+                "password": username,
+                "fecha_creacion": datetime.now(),
+                "creado_por": idDuenio
+            })
+        try:
+            result = await db.execute(insert(Usuario).returning(Usuario.id_usuario, sort_by_parameter_order=True), filas)
+            ids = result.scalars().all()
+            await db.commit()
+        except IntegrityError:
+            # Otro alta tomo un email/telefono/username entre la validacion y el insert
+            await db.rollback()
+            for i in validos:
+                resultados[i]["error"] = "Conflicto con un alta simultanea, reintentar"
+            return resultados
+        for i, id_usuario in zip(validos, ids):
+            resultados[i]["id_usuario"] = id_usuario
+
+        semaforo = asyncio.Semaphore(AUTH0_CONCURRENCIA)
+        # Los sembrados ya existen en Auth0 (no se cargan), pero igual se les asigna el rol
+        async def alta_auth0(i: int, fila: dict):
+            u = usuarios[i]
+            id_usuario = resultados[i]["id_usuario"]
+            cargado = False
+            async with semaforo:
+                try:
+                    if not u.sembrado:
+                        await UsuarioService.cargar_usuario_en_auth0(id_usuario, u.email, fila["username"], fila["username"], u.nombre, u.apellido, u.telefono)
+                        cargado = True
+                    await UsuarioService.asignar_rol_auth0(id_usuario, u.rol)
+                    return None
+                except Exception as e:
+                    motivo = getattr(e, "detail", str(e))
+                    if not cargado:
+                        return i, motivo
+                    # Fallo el rol con el usuario ya cargado: se saca de Auth0 junto con la fila de la BD
+                    try:
+                        await UsuarioService.borrar_usuario_auth0(id_usuario)
+                    except Exception as e_borrado:
+                        motivo += f" (y no se pudo borrar auth0|{id_usuario} de Auth0: {getattr(e_borrado, 'detail', str(e_borrado))}; borrarlo a mano)"
+                    return i, motivo
+        fallidos = [f for f in await asyncio.gather(*(alta_auth0(i, fila) for i, fila in zip(validos, filas))) if f is not None]
+        if fallidos:
+            ids_fallidos = [resultados[i]["id_usuario"] for i, _ in fallidos]
+            await db.execute(delete(Usuario).where(Usuario.id_usuario == any_(bindparam('ids', ids_fallidos, type_=ARRAY(Integer)))))
+            await db.commit()
+            for i, motivo in fallidos:
+                resultados[i]["id_usuario"] = None
+                resultados[i]["error"] = f"Alta en Auth0 fallida: {motivo}"
+        return resultados
+
     @staticmethod
     async def desactivar_usuario(id_usuario: int, motivo: str, db: AsyncSession, idDuenio: int | str = 1) -> bool:
         query = select(Usuario)
@@ -214,6 +336,92 @@ class UsuarioService:
         }
         return datos
 
+    @staticmethod
+    async def consultar_usuarios(db: AsyncSession, ids_usuario: list[int]):
+        # Una sola consulta para todos los ids: usuario + (si es personal) sus datos y su tipo
+        query = select(Usuario, Profesional.nombre, Profesional.apellido, func.coalesce(Clinico.tipo, Administrativo.rol).label('tipo')).join(Profesional, Usuario.profesional, isouter=True).join(Clinico, Profesional.clinico, isouter=True).join(Administrativo, Profesional.administrativo, isouter=True)
+        query = query.where(Usuario.id_usuario == any_(bindparam('ids_usuario', list(set(ids_usuario)), type_=ARRAY(Integer))))
+        result = await db.execute(query)
+        encontrados = {}
+        for fila in result.mappings().all():
+            usuario = fila.Usuario
+            admin = usuario.username == "admin"
+            if admin:
+                nombre_completo = "Administrador"
+            elif fila.nombre is not None:
+                nombre_completo = f"{fila.nombre} {fila.apellido}"
+            else:
+                nombre_completo = None
+            encontrados[usuario.id_usuario] = {
+                "id_usuario": usuario.id_usuario,
+                "admin": admin,
+                "nombre": fila.nombre,
+                "apellido": fila.apellido,
+                "nombre_completo": nombre_completo,
+                "tipo": fila.tipo,
+                "email": usuario.email,
+                "telefono": usuario.telefono,
+                "alta": {
+                    "fecha": usuario.fecha_creacion,
+                    "id_usuario": usuario.creado_por,
+                },
+                "baja": {
+                    "fecha": usuario.fecha_baja,
+                    "id_usuario": usuario.baja_por,
+                    "motivo": usuario.motivo_baja
+                },
+                "edicion": {
+                    "fecha": usuario.ultima_edicion,
+                    "id_usuario": usuario.editado_por
+                }
+            }
+        # Se respeta el orden pedido; los ids inexistentes simplemente no aparecen
+        return [encontrados[id_usuario] for id_usuario in dict.fromkeys(ids_usuario) if id_usuario in encontrados]
+
+    @staticmethod
+    async def listar_cambios(db: AsyncSession, desde_version: int = 0, desde_id: int = 0, limite: int = 500):
+        """
+        Usuarios pacientes modificados despues del cursor (desde_version, desde_id), en orden de version.
+        Solo entrega versiones de transacciones ya terminadas (ver SENTENCIAS_FEED_CAMBIOS en core/database.py),
+        asi quien consume el feed puede avanzar el cursor sin perderse cambios. El personal (con fila en
+        profesional) y el admin no salen: sus datos de contacto no se copian a otros MS.
+        """
+        xmin = cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
+        query = (
+            select(Usuario)
+            .where(
+                tuple_(Usuario.version_cambio, Usuario.id_usuario) > tuple_(desde_version, desde_id),
+                Usuario.version_cambio < xmin,
+                Usuario.username != "admin",
+                ~select(Profesional.id_usuario).where(Profesional.id_usuario == Usuario.id_usuario).exists()
+            )
+            .order_by(Usuario.version_cambio, Usuario.id_usuario)
+            .limit(limite)
+        )
+        result = await db.execute(query)
+        return [
+            {
+                "id_usuario": usuario.id_usuario,
+                "email": usuario.email,
+                "telefono": usuario.telefono,
+                "alta": {
+                    "fecha": usuario.fecha_creacion,
+                    "id_usuario": usuario.creado_por,
+                },
+                "baja": {
+                    "fecha": usuario.fecha_baja,
+                    "id_usuario": usuario.baja_por,
+                    "motivo": usuario.motivo_baja
+                },
+                "edicion": {
+                    "fecha": usuario.ultima_edicion,
+                    "id_usuario": usuario.editado_por
+                },
+                "version": usuario.version_cambio
+            }
+            for usuario in result.scalars().all()
+        ]
+
     @staticmethod
     async def usuario_es_admin(db: AsyncSession, id_usuario: int):
         query = select(Usuario).where(Usuario.id_usuario == id_usuario)